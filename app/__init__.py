@@ -9,9 +9,6 @@ from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_talisman import Talisman
 import os
-import logging
-from logging.handlers import RotatingFileHandler
-import sys
 
 # Initialize extensions
 db = SQLAlchemy()
@@ -46,6 +43,32 @@ def create_app(config_name=None):
     cache.init_app(app)
     limiter.init_app(app)
     
+    from app.live import live_updates
+    live_updates.init_app(app)
+    
+    from app.throttle import login_throttle
+    login_throttle.init_app(app)
+    
+    from app.hours import hours_updates
+    hours_updates.init_app(app)
+    
+    from app.audit import audit_writer
+    audit_writer.init_app(app)
+    
+    from app.metrics import metrics, instrument_cache
+    metrics.init_app(app)
+    instrument_cache(app, cache, metrics)
+    
+    from app.profiling import request_profiler
+    request_profiler.init_app(app)
+    
+    from app.instrumentation import request_instrumentation
+    request_instrumentation.init_app(app)
+    
+    # Schema checks are cached and only run from explicit startup steps
+    from app.schema import schema_gate
+    schema_gate.init_app(app)
+    
     # Initialize security (Talisman) for production
     if not app.debug:
         talisman.init_app(app, 
@@ -66,6 +89,11 @@ def create_app(config_name=None):
     login_manager.login_message_category = 'info'
     login_manager.session_protection = 'strong'
     
+    # Load the current user from the user session cache
+    from app.user_cache import load_user, configure_user_cache
+    configure_user_cache(app)
+    login_manager.user_loader(load_user)
+    
     # Configure logging
     configure_logging(app)
     
@@ -76,6 +104,10 @@ def create_app(config_name=None):
     app.register_blueprint(employee.bp)
     app.register_blueprint(api.bp)
     
+    # Register CLI commands
+    from app.cli import register_commands
+    register_commands(app)
+    
     # Register error handlers
     register_error_handlers(app)
     
@@ -92,57 +124,12 @@ def create_app(config_name=None):
     def health_check():
         return {'status': 'healthy', 'app': 'Manufacturing Workload Manager'}, 200
     
-    # Database initialization check for Railway (run once during app creation)
-    def init_database_check():
-        """Initialize database schema if running on Railway"""
-        if os.environ.get('RAILWAY_ENVIRONMENT') or os.environ.get('DATABASE_URL'):
-            try:
-                from sqlalchemy import text
-                # Quick check if original_hours column exists
-                result = db.session.execute(text("""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name = 'assignments' AND column_name = 'original_hours'
-                """))
-                
-                if not result.fetchone():
-                    print("⚠️  Database schema incomplete, running initialization...")
-                    import subprocess
-                    subprocess.run([sys.executable, 'railway_init.py'], check=True)
-                    print("✅ Database initialization completed via fallback")
-                else:
-                    print("✅ Database schema check passed")
-                    
-            except Exception as init_error:
-                print(f"⚠️  Database initialization check failed: {init_error}")
-                # Don't crash the app, just log the error
-    
-    # Run database check during app creation (Flask 2.3+ compatible)
-    with app.app_context():
-        init_database_check()
-    
     return app
 
 def configure_logging(app):
     """Configure application logging"""
-    if not app.debug and not app.testing:
-        # Create logs directory if it doesn't exist
-        if not os.path.exists('logs'):
-            os.mkdir('logs')
-        
-        # Configure file handler
-        file_handler = RotatingFileHandler('logs/manufacturing_app.log', 
-                                         maxBytes=10240000, backupCount=10)
-        file_handler.setFormatter(logging.Formatter(
-            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'))
-        
-        # Set log level from config
-        log_level = getattr(logging, app.config.get('LOG_LEVEL', 'INFO'))
-        file_handler.setLevel(log_level)
-        app.logger.addHandler(file_handler)
-        
-        app.logger.setLevel(log_level)
-        app.logger.info('Manufacturing App startup')
+    from app.structured_logging import configure_logging_pipeline
+    configure_logging_pipeline(app)
 
 def register_error_handlers(app):
     """Register error handlers"""
@@ -168,6 +155,17 @@ def register_error_handlers(app):
     @app.errorhandler(CSRFError)
     def handle_csrf_error(e):
         return {'error': 'CSRF token missing or invalid'}, 400
+    
+    @app.errorhandler(StaleDataError)
+    def conflict_error(e):
+        db.session.rollback()
+        app.logger.warning(f'Concurrent update conflict: {e}')
+        return {'error': 'Conflict: the record was changed by someone else, reload and try again'}, 409
+    
+    @app.errorhandler(PasswordHashingBusy)
+    def password_hashing_busy(e):
+        db.session.rollback()
+        return {'error': 'Server busy, please try again shortly'}, 503, {'Retry-After': '5'}
 
 def register_context_processors(app):
     """Register context processors for templates"""
@@ -185,4 +183,6 @@ def register_context_processors(app):
         return {'now': datetime.utcnow()}
 
 # Import for error handling
-from flask_wtf.csrf import CSRFError 
\ No newline at end of file
+from flask_wtf.csrf import CSRFError
+from sqlalchemy.orm.exc import StaleDataError
+from app.passwords import PasswordHashingBusy 
\ No newline at end of file
@@ -0,0 +1,217 @@
+"""
+Audit trail for the Manufacturing Workload Management App
+
+Activity records (logins, assignment and status changes) are buffered in
+memory on the request thread and written to the audit_log table in bulk
+INSERTs by a background thread per process, once AUDIT_BATCH_SIZE records
+are waiting or every AUDIT_FLUSH_INTERVAL seconds. Assignment and project
+changes are recorded from the changes_committed signal, so only committed
+work is audited.
+
+While the database is unreachable, records are kept for the next flush, up
+to AUDIT_MAX_BUFFER. A batch the database rejects is split in halves until
+the offending records are isolated; those are logged and dropped so they
+cannot stall the trail. Both kinds of loss are counted in the
+audit_records_dropped_total metric.
+"""
+
+import atexit
+import os
+import threading
+import weakref
+from datetime import datetime
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import insert, inspect
+from sqlalchemy.exc import OperationalError, InterfaceError
+from app import db
+from app.metrics import metrics, series
+from app.models import AuditLog, User
+from app.changes import changes_committed, changes_for
+
+class AuditWriter:
+    """Flask extension buffering audit records and flushing them in batches
+
+    Each app keeps its own buffer and flush thread in app.extensions, so
+    records always go to the database of the app that produced them.
+    """
+
+    def __init__(self, app=None):
+        self._apps = weakref.WeakSet()
+        atexit.register(self._flush_apps)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['audit_writer'] = {
+            'buffer': [],
+            'lock': threading.Lock(),
+            'wakeup': threading.Event(),
+            'thread_pid': None,
+        }
+        self._apps.add(app)
+
+    @property
+    def state(self):
+        return current_app.extensions['audit_writer']
+
+    def record(self, action, user_id=None, target_type=None, target_id=None, details=None):
+        """Queue one audit record; never touches the database on the calling thread"""
+        if (not has_app_context() or 'audit_writer' not in current_app.extensions
+                or not current_app.config.get('AUDIT_ENABLED', True)):
+            return
+
+        entry = {
+            'user_id': user_id,
+            'action': action,
+            'target_type': target_type,
+            'target_id': target_id,
+            'details': details,
+            'ip_address': None,
+            'request_id': None,
+            'created_at': datetime.utcnow(),
+        }
+        if has_request_context():
+            entry['ip_address'] = request.remote_addr
+            # assign_request_id already vets the header; never let a long id get the row rejected
+            request_id = g.get('request_id')
+            entry['request_id'] = request_id[:AuditLog.request_id.type.length] if request_id else None
+
+        if not current_app.config.get('AUDIT_ASYNC', True):
+            self._write([entry])
+            return
+
+        state = self.state
+        with state['lock']:
+            state['buffer'].append(entry)
+            full = len(state['buffer']) >= current_app.config.get('AUDIT_BATCH_SIZE', 100)
+        self._ensure_thread()
+        if full:
+            state['wakeup'].set()
+
+    def _ensure_thread(self):
+        """Flush thread for this app and process; started lazily so preloaded apps fork cleanly"""
+        state = self.state
+        if state['thread_pid'] == os.getpid():
+            return
+        with state['lock']:
+            if state['thread_pid'] != os.getpid():
+                threading.Thread(target=self._run, args=(current_app._get_current_object(),),
+                                 name='audit-writer', daemon=True).start()
+                state['thread_pid'] = os.getpid()
+
+    def _run(self, app):
+        state = app.extensions['audit_writer']
+        interval = app.config.get('AUDIT_FLUSH_INTERVAL', 2)
+        while True:
+            state['wakeup'].wait(interval)
+            state['wakeup'].clear()
+            with app.app_context():
+                self.flush()
+
+    def _flush_apps(self):
+        for app in list(self._apps):
+            with app.app_context():
+                self.flush()
+
+    def flush(self):
+        """Write every buffered record of the current app now"""
+        state = self.state
+        with state['lock']:
+            entries, state['buffer'] = state['buffer'], []
+        if entries:
+            self._write(entries)
+
+    def _insert(self, entries):
+        with db.engine.begin() as connection:
+            connection.execute(insert(AuditLog.__table__), entries)
+
+    def _write(self, entries):
+        try:
+            self._insert(entries)
+        except (OperationalError, InterfaceError) as e:
+            # The database is unreachable, not the records at fault; retry them next flush
+            self._requeue(entries)
+            current_app.logger.error(f'Audit flush of {len(entries)} records failed: {e}')
+        except Exception as e:
+            if len(entries) > 1:
+                # Isolate the rejected records so the rest of the batch is written
+                middle = len(entries) // 2
+                self._write(entries[:middle])
+                self._write(entries[middle:])
+                return
+            metrics.inc(series('audit_records_dropped_total', reason='rejected'))
+            entry = entries[0]
+            current_app.logger.error(f"Dropped audit record {entry['action']} by user {entry['user_id']} "
+                                     f"on {entry['target_type']} {entry['target_id']}: {e}")
+
+    def _requeue(self, entries):
+        """Put records back in front of the buffer, dropping the oldest beyond AUDIT_MAX_BUFFER"""
+        state = self.state
+        max_buffer = current_app.config.get('AUDIT_MAX_BUFFER', 10000)
+        with state['lock']:
+            buffer = entries + state['buffer']
+            overflow = max(0, len(buffer) - max_buffer)
+            state['buffer'] = buffer[overflow:]
+        if overflow:
+            metrics.inc(series('audit_records_dropped_total', reason='overflow'), overflow)
+            current_app.logger.error(f'Audit buffer full; dropped the {overflow} oldest records')
+
+audit_writer = AuditWriter()
+
+def audit_trail(user_id=None, start=None, end=None, action=None, target_type=None, target_id=None, limit=100):
+    """Audit records newest first, filtered by acting user, action, target and time range"""
+    query = AuditLog.query
+    if user_id is not None:
+        query = query.filter(AuditLog.user_id == user_id)
+    if action:
+        query = query.filter(AuditLog.action == action)
+    if target_type:
+        query = query.filter(AuditLog.target_type == target_type)
+    if target_id is not None:
+        query = query.filter(AuditLog.target_id == target_id)
+    if start:
+        query = query.filter(AuditLog.created_at >= start)
+    if end:
+        query = query.filter(AuditLog.created_at < end)
+    return query.order_by(AuditLog.created_at.desc(), AuditLog.id.desc()).limit(limit).all()
+
+def _acting_user_id():
+    # Only use a user Flask-Login already loaded; subscribers must not query
+    user = g.get('_login_user') if has_request_context() else None
+    if not isinstance(user, User):
+        return None
+    # The commit expired the instance; read the id without refreshing it
+    identity = inspect(user).identity
+    return identity[0] if identity else None
+
+@changes_committed.connect
+def audit_committed_changes(sender, changes):
+    if 'audit_writer' not in current_app.extensions:
+        return
+    actor = _acting_user_id()
+
+    for change in changes_for(changes, 'assignments'):
+        details = {
+            'project_id': change['project_id'],
+            'employee_id': change['user_id'],
+            'status': change['status'],
+            'hours_remaining': change['hours_remaining'],
+        }
+        if change['op'] == 'insert':
+            action = 'assignment_created'
+        elif change['op'] == 'delete':
+            action = 'assignment_deleted'
+        elif change['user_id'] != change['previous_user_id']:
+            action = 'assignment_reassigned'
+            details['previous_employee_id'] = change['previous_user_id']
+        elif change['status'] != change['previous_status']:
+            action = 'assignment_status_changed'
+            details['previous_status'] = change['previous_status']
+        else:
+            continue
+        audit_writer.record(action, user_id=actor, target_type='assignment', target_id=change['id'], details=details)
+
+    for change in changes_for(changes, 'projects'):
+        if change['op'] == 'update' and change['status'] != change['previous_status']:
+            audit_writer.record('project_status_changed', user_id=actor, target_type='project', target_id=change['id'],
+                                details={'status': change['status'], 'previous_status': change['previous_status']})
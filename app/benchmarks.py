@@ -0,0 +1,330 @@
+"""
+Benchmark harness for the Manufacturing Workload Management App
+
+Measures latency and SQL query counts for the hot endpoints and services
+against whatever dataset the configured database holds (see
+`flask generate-data`). Results are written as JSON so runs from different
+commits can be compared with `flask benchmark --compare`.
+
+The import, sync and auto-assign benchmarks commit rows, so they only run
+against a testing app or with allow_writes (`--allow-writes`), which says
+the configured database is a scratch copy. Rolling them back instead would
+time savepoints rather than the commits production pays for.
+"""
+
+import io
+import json
+import statistics
+import subprocess
+import time
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, func
+from app import db, limiter
+from app.models import User, Project, Assignment, SkillsMatrix, Vacation
+
+class QueryCounter:
+    """Count statements executed on the app's engine while active"""
+
+    def __init__(self):
+        self.count = 0
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(db.engine, 'before_cursor_execute', self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(db.engine, 'before_cursor_execute', self._before_cursor_execute)
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+# What a benchmark callable returns when an iteration did what it measures;
+# an HTTP error, redirect or exception means the timing and query count are not
+# the page's
+SUCCESS_STATUSES = (200, 'ok')
+
+# Benchmarks that commit rows to the benchmarked database
+MUTATING_BENCHMARKS = ('auto_assign_project', 'import_projects', 'import_skills', 'import_vacations', 'sync_database')
+
+class BenchmarkRunner:
+    """Run named benchmarks and collect latency and query statistics"""
+
+    def __init__(self, iterations=5, import_rows=500, password=None, allow_writes=False, echo=print):
+        self.iterations = iterations
+        self.import_rows = import_rows
+        self.password = password
+        self.allow_writes = allow_writes
+        self.echo = echo
+        self.app = current_app._get_current_object()
+        self.client = None
+        self.run_id = datetime.utcnow().strftime('%Y%m%d%H%M%S')
+
+    def setup(self):
+        """Turn CSRF and rate limits off; returns the state teardown() restores"""
+        saved = (self.app.config.get('WTF_CSRF_ENABLED', True), limiter.enabled)
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        limiter.enabled = False
+        return saved
+
+    def login(self):
+        """Log an admin in on a test client"""
+        admin = User.query.filter_by(role='admin', is_active=True).order_by(User.id).first()
+        if admin is None:
+            raise RuntimeError('No active admin user; generate a dataset first')
+        password = self.password or f"{admin.username.split('_')[0]}-password"
+
+        self.client = self.app.test_client()
+        response = self.client.post('/auth/login', data={'email': admin.email, 'password': password})
+        if response.status_code != 302:
+            raise RuntimeError(f'Could not log in as {admin.email}; pass --password')
+        db.session.remove()
+
+    def measure(self, name, func):
+        """Call func once per iteration; func receives the iteration number"""
+        timings, queries, statuses = [], [], set()
+        for iteration in range(self.iterations):
+            with QueryCounter() as counter:
+                started = time.perf_counter()
+                try:
+                    status = func(iteration)
+                except Exception as exc:
+                    # e.g. a missing template when the app propagates exceptions
+                    status = type(exc).__name__
+                    db.session.rollback()
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(counter.count)
+            statuses.add(status)
+            db.session.remove()
+
+        result = {
+            'iterations': self.iterations,
+            'min_ms': round(min(timings), 2),
+            'median_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(_percentile(timings, 95), 2),
+            'mean_ms': round(statistics.mean(timings), 2),
+            'queries': max(queries),
+            'status': sorted(str(status) for status in statuses),
+            'failed': any(status not in SUCCESS_STATUSES for status in statuses),
+        }
+        self.echo(f"{name:<28} median {result['median_ms']:>10.2f} ms  p95 {result['p95_ms']:>10.2f} ms  "
+                  f"queries {result['queries']:>7}  status {','.join(result['status'])}"
+                  f"{'  FAILED' if result['failed'] else ''}")
+        return result
+
+    def _get(self, path):
+        return lambda iteration: self.client.get(path).status_code
+
+    def _upload(self, path, build_csv):
+        def run(iteration):
+            data = {'file': (io.BytesIO(build_csv(iteration).encode()), 'benchmark.csv')}
+            return self.client.post(path, data=data, content_type='multipart/form-data').status_code
+        return run
+
+    def _projects_csv(self, iteration):
+        start = date.today() + timedelta(days=30)
+        lines = ['project_number,model_type,customer_country,estimated_hours,assembly_start_date,deadline']
+        for row in range(self.import_rows):
+            model_type = ('PAH', 'PPH', 'REF')[row % 3]
+            country = 'USA' if row % 2 else 'GERMANY'
+            lines.append(f'BENCH-{self.run_id}-{iteration}-{row:05d},{model_type},{country},40,{start},{start + timedelta(days=21)}')
+        return '\n'.join(lines)
+
+    def _sample_usernames(self):
+        return [username for (username,) in db.session.query(User.username).filter(
+            User.role == 'employee'
+        ).order_by(User.id).limit(self.import_rows)]
+
+    def _skills_csv(self, iteration):
+        # Re-import existing skills unchanged so repeated runs keep the dataset stable
+        skills = db.session.query(
+            User.username, SkillsMatrix.machine_type, SkillsMatrix.skill_level, SkillsMatrix.efficiency_factor
+        ).join(SkillsMatrix, SkillsMatrix.user_id == User.id).order_by(SkillsMatrix.id).limit(self.import_rows)
+        lines = ['username,machine_type,skill_level,efficiency_factor']
+        for username, machine_type, skill_level, efficiency_factor in skills:
+            lines.append(f'{username},{machine_type},{skill_level},{efficiency_factor}')
+        return '\n'.join(lines)
+
+    def _vacations_csv(self, iteration):
+        start = date.today() + timedelta(days=200 + iteration)
+        lines = ['username,start_date,end_date']
+        for username in self._sample_usernames():
+            lines.append(f'{username},{start},{start + timedelta(days=2)}')
+        return '\n'.join(lines)
+
+    def _suitable_employees(self):
+        from app.routes.admin import get_suitable_employees
+
+        projects = [
+            project for model_type in ('PAH', 'PPH', 'REF')
+            for project in Project.query.filter_by(status='unassigned', model_type=model_type).limit(2)
+        ]
+        project_ids = [project.id for project in projects]
+
+        def run(iteration):
+            with self.app.test_request_context():
+                for project_id in project_ids:
+                    get_suitable_employees(db.session.get(Project, project_id))
+            return 'ok'
+        return run
+
+    def _assign_project_page(self):
+        project_id = db.session.query(Project.id).filter(Project.is_unassigned).order_by(Project.id).limit(1).scalar()
+        if project_id is None:
+            return lambda iteration: 'no-project'
+        return self._get(f'/admin/assign-project/{project_id}')
+
+    def _auto_assign(self):
+        project_ids = [project_id for (project_id,) in db.session.query(Project.id).filter(
+            Project.status == 'unassigned',
+            Project.model_type.in_(['PAH', 'PPH', 'REF'])
+        ).order_by(Project.id).limit(self.iterations)]
+
+        def run(iteration):
+            if iteration >= len(project_ids):
+                return 'no-project'
+            return self.client.post(f'/api/auto-assign-project/{project_ids[iteration]}').status_code
+        return run
+
+    def benchmarks(self):
+        """Benchmark name -> callable, in run order (mutating benchmarks last)"""
+        return {
+            'admin.dashboard': self._get('/admin/dashboard'),
+            'admin.assign_project': self._assign_project_page(),
+            'admin.audit': self._get('/admin/audit?limit=1000'),
+            'get_suitable_employees': self._suitable_employees(),
+            'auto_assign_project': self._auto_assign(),
+            'import_projects': self._upload('/api/import-projects', self._projects_csv),
+            'import_skills': self._upload('/api/import-skills', self._skills_csv),
+            'import_vacations': self._upload('/api/import-vacations', self._vacations_csv),
+            'sync_database': lambda iteration: self.client.post('/api/sync-database').status_code,
+        }
+
+    def teardown(self, saved):
+        self.app.config['WTF_CSRF_ENABLED'], limiter.enabled = saved
+
+    def run(self, only=None):
+        writes_allowed = self.allow_writes or self.app.testing
+        refused = [name for name in only or () if name in MUTATING_BENCHMARKS]
+        if refused and not writes_allowed:
+            raise RuntimeError(f'{", ".join(refused)} write to the database; '
+                               'pass --allow-writes if it is a scratch database')
+
+        saved = self.setup()
+        try:
+            self.login()
+            results = {}
+            for name, func in self.benchmarks().items():
+                if only and name not in only:
+                    continue
+                if name in MUTATING_BENCHMARKS and not writes_allowed:
+                    self.echo(f'{name:<28} skipped: writes to the database (--allow-writes)')
+                    continue
+                results[name] = self.measure(name, func)
+            return results
+        finally:
+            self.teardown(saved)
+
+def dataset_counts():
+    """Row counts of the benchmarked tables"""
+    return {
+        model.__tablename__: db.session.query(func.count(model.id)).scalar()
+        for model in (User, Project, Assignment, SkillsMatrix, Vacation)
+    }
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def run_benchmarks(iterations=5, import_rows=500, only=None, password=None, allow_writes=False, echo=print):
+    """Run the benchmark suite and return a JSON-serializable report"""
+    counts = dataset_counts()
+    runner = BenchmarkRunner(iterations=iterations, import_rows=import_rows, password=password,
+                             allow_writes=allow_writes, echo=echo)
+    return {
+        'commit': current_commit(),
+        'timestamp': datetime.utcnow().isoformat(),
+        'database': db.engine.dialect.name,
+        'dataset': counts,
+        'benchmarks': runner.run(only=only),
+    }
+
+def compare_reports(baseline, current, threshold=10.0):
+    """Compare two reports; returns (lines, regressions) for median latency and query counts"""
+    lines, regressions = [], []
+    for name, result in current['benchmarks'].items():
+        previous = baseline.get('benchmarks', {}).get(name)
+        if previous is None:
+            lines.append(f'{name:<28} new')
+            continue
+
+        latency_change = (result['median_ms'] - previous['median_ms']) / previous['median_ms'] * 100 if previous['median_ms'] else 0
+        query_change = result['queries'] - previous['queries']
+        lines.append(f"{name:<28} median {previous['median_ms']:>10.2f} -> {result['median_ms']:>10.2f} ms "
+                     f"({latency_change:+.1f}%)  queries {previous['queries']} -> {result['queries']}")
+
+        if latency_change > threshold or query_change > 0:
+            regressions.append(name)
+    return lines, regressions
+
+# Listing benchmarks whose query count must not grow with the rows listed
+LISTING_BENCHMARKS = ('admin.dashboard', 'admin.assign_project', 'admin.audit', 'get_suitable_employees')
+
+def check_query_scaling(employees=20, projects=100, scale=3, echo=print):
+    """Query counts of the listing benchmarks on a small dataset and one `scale` times larger
+
+    Builds both datasets in the testing database (TEST_DATABASE_URL, by
+    default in-memory SQLite). Returns (lines, offenders), offenders being
+    the benchmarks that issued more queries on the larger dataset, i.e.
+    that query per row, or that failed on either, since a failed request's
+    query count says nothing about the page.
+    """
+    from app import create_app
+    from app.synthetic import DatasetGenerator
+
+    app = create_app('testing')
+    counts = []
+    with app.app_context():
+        db.create_all()
+        for round_number, multiplier in enumerate((1, scale - 1)):
+            # The second round adds to the first, making `scale` times the rows
+            DatasetGenerator(
+                employees=employees * multiplier,
+                admins=1,
+                projects=projects * multiplier,
+                unassigned_ratio=0.3,
+                prefix=f'qb{round_number}',
+                echo=lambda message: None
+            ).generate()
+            echo(f'Dataset: {dataset_counts()}')
+            runner = BenchmarkRunner(iterations=1, echo=echo)
+            counts.append(runner.run(only=LISTING_BENCHMARKS))
+        db.session.remove()
+        db.drop_all()
+
+    small, large = counts
+    lines, offenders = [], []
+    for name in LISTING_BENCHMARKS:
+        failed = small[name]['failed'] or large[name]['failed']
+        line = f"{name:<28} queries {small[name]['queries']} -> {large[name]['queries']}"
+        if failed:
+            line += f"  FAILED status {','.join(sorted(set(small[name]['status'] + large[name]['status'])))}"
+        lines.append(line)
+        if failed or large[name]['queries'] > small[name]['queries']:
+            offenders.append(name)
+    return lines, offenders
+
+def load_report(path):
+    with open(path) as report_file:
+        return json.load(report_file)
+
+def save_report(report, path):
+    with open(path, 'w') as report_file:
+        json.dump(report, report_file, indent=2)
@@ -0,0 +1,81 @@
+"""
+Capacity reservation for the Manufacturing Workload Management App
+
+Assigning a project checks that it is still unassigned and that the
+employee's open hours plus the project's estimate fit in hours_per_week,
+then inserts the assignment. Done naively, two admins (or two workers
+auto-assigning in parallel) can both pass the check before either commits.
+reserve_assignment() makes the check and the insert atomic per employee:
+
+- PostgreSQL locks the project row with SELECT ... FOR UPDATE and the
+  candidate employee rows with FOR UPDATE SKIP LOCKED, so an employee being
+  reserved by another transaction is passed over instead of waited for.
+  Assignment writes update the employee's open_hours in the same
+  transaction, so a locked row's available hours are current.
+- SQLite has no row locks; a no-op write to the project takes the database
+  write lock first, which serializes reservations.
+
+The caller commits, which releases the locks.
+"""
+
+from datetime import datetime
+from sqlalchemy import select, text
+from app import db
+from app.models import Assignment, Project, User
+
+class ReservationError(Exception):
+    """The project could not be reserved; the message is shown to the user"""
+
+def _lock_project(project_id):
+    if db.session.get_bind().dialect.name == 'sqlite':
+        db.session.execute(text('UPDATE projects SET id = id WHERE id = :id'), {'id': project_id})
+    # Refresh from the locked row; a concurrent assignment may have committed meanwhile
+    return db.session.get(Project, project_id, with_for_update=True, populate_existing=True)
+
+def _lock_candidates(candidate_ids, skip_locked):
+    """Available hours of the candidates this transaction could lock, by id"""
+    rows = db.session.execute(
+        select(User.id, User.available_hours)
+        .where(User.id.in_(candidate_ids))
+        .order_by(User.id)
+        .with_for_update(skip_locked=skip_locked)
+    )
+    return dict(rows.all())
+
+def reserve_assignment(project_id, candidate_ids, skip_locked=True):
+    """Assign a project to the first candidate, in the given order, with room for it
+
+    With skip_locked, candidates locked by a concurrent reservation are
+    skipped; pass False to wait for them, e.g. when an admin picked the
+    employee. Adds the assignment to the session without committing and
+    returns it; raises ReservationError when nobody can take the project.
+    """
+    project = _lock_project(project_id)
+    if project is None:
+        raise ReservationError('Project not found')
+    if project.status != 'unassigned' or Assignment.query.filter_by(project_id=project_id).first():
+        raise ReservationError('This project is already assigned to someone else.')
+
+    available = _lock_candidates(candidate_ids, skip_locked) if candidate_ids else {}
+    hours = project.estimated_hours
+
+    for user_id in candidate_ids:
+        if user_id in available and available[user_id] >= hours:
+            break
+    else:
+        if len(candidate_ids) == 1 and candidate_ids[0] in available:
+            remaining = max(0, available[candidate_ids[0]])
+            raise ReservationError(f'Employee has only {remaining:g} hours available, but the project needs {hours:g}.')
+        raise ReservationError('No suitable employee has enough available hours.')
+
+    assignment = Assignment(
+        project_id=project_id,
+        user_id=user_id,
+        status='not_started',
+        hours_remaining=hours,
+        original_hours=hours,
+        assigned_at=datetime.utcnow()
+    )
+    project.status = 'assigned'
+    db.session.add(assignment)
+    return assignment
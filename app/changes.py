@@ -0,0 +1,109 @@
+"""
+Committed change tracking for the Manufacturing Workload Management App
+
+Row changes to tracked models are collected at flush time and announced
+through the `changes_committed` signal once the transaction commits, so
+subscribers (caches, version counters, live updates) never act on data
+that is later rolled back. Subscribers must not emit SQL on the session.
+"""
+
+from blinker import Namespace
+from sqlalchemy import event, inspect
+from app import db
+from app.models import User, Project, Assignment, SkillsMatrix
+
+_signals = Namespace()
+changes_committed = _signals.signal('changes-committed')
+
+PENDING_CHANGES_KEY = 'pending_changes'
+
+def _previous_value(state, key):
+    """Value an attribute had before this flush, or its current value if unchanged"""
+    history = state.attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(state.obj(), key)
+
+def _describe_assignment(assignment, state):
+    return {
+        'user_id': assignment.user_id,
+        'previous_user_id': _previous_value(state, 'user_id'),
+        'project_id': assignment.project_id,
+        'status': assignment.status,
+        'previous_status': _previous_value(state, 'status'),
+        'hours_remaining': assignment.hours_remaining,
+        'previous_hours_remaining': _previous_value(state, 'hours_remaining'),
+    }
+
+def _describe_project(project, state):
+    return {
+        'status': project.status,
+        'previous_status': _previous_value(state, 'status'),
+        'priority': project.priority,
+        'deadline': project.deadline,
+        'previous_deadline': _previous_value(state, 'deadline'),
+    }
+
+def _describe_user(user, state):
+    return {
+        'role': user.role,
+        'is_active': user.is_active,
+    }
+
+def _describe_skill(skill, state):
+    return {
+        'user_id': skill.user_id,
+        'machine_type': skill.machine_type,
+    }
+
+# Tracked models and how their changes are described to subscribers
+TRACKED_MODELS = {
+    Assignment: _describe_assignment,
+    Project: _describe_project,
+    User: _describe_user,
+    SkillsMatrix: _describe_skill,
+}
+
+def _record_change(obj, op):
+    state = inspect(obj)
+    change = {
+        'model': obj.__tablename__,
+        'op': op,
+        'id': obj.id,
+    }
+    change.update(TRACKED_MODELS[type(obj)](obj, state))
+    return change
+
+@event.listens_for(db.session, 'after_flush')
+def collect_flushed_changes(session, flush_context):
+    pending = session.info.setdefault(PENDING_CHANGES_KEY, [])
+
+    for op, objects in (('insert', session.new), ('update', session.dirty), ('delete', session.deleted)):
+        for obj in objects:
+            if type(obj) not in TRACKED_MODELS:
+                continue
+            if op == 'update' and not session.is_modified(obj, include_collections=False):
+                continue
+            pending.append(_record_change(obj, op))
+
+@event.listens_for(db.session, 'after_commit')
+def announce_committed_changes(session):
+    changes = session.info.pop(PENDING_CHANGES_KEY, None)
+    if changes:
+        changes_committed.send(session, changes=changes)
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_pending_changes(session):
+    session.info.pop(PENDING_CHANGES_KEY, None)
+
+def record_changes(session, changes):
+    """Announce changes made with Core statements when the session commits
+
+    For writes that bypass the ORM flush; each change must have the shape
+    the tracked model's describer produces.
+    """
+    session.info.setdefault(PENDING_CHANGES_KEY, []).extend(changes)
+
+def changes_for(changes, model):
+    """Filter committed changes down to one table name"""
+    return [change for change in changes if change['model'] == model]
@@ -0,0 +1,185 @@
+"""
+Flask CLI commands for the Manufacturing Workload Management App
+"""
+
+import os
+import re
+import subprocess
+import sys
+import click
+from datetime import datetime
+from flask.cli import with_appcontext
+
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+def register_commands(app):
+    """Register CLI commands with the app"""
+    app.cli.add_command(import_times_command)
+    app.cli.add_command(generate_data_command)
+    app.cli.add_command(benchmark_command)
+    app.cli.add_command(reconcile_open_hours_command)
+    app.cli.add_command(query_budget_command)
+    app.cli.add_command(explain_hot_queries_command)
+
+@click.command('import-times')
+@click.option('--top', default=25, show_default=True, help='Number of modules to list.')
+@click.option('--budget-ms', type=float, default=None, help='Exit non-zero if the total exceeds this many milliseconds.')
+def import_times_command(top, budget_ms):
+    """Report per-module import time for create_app()."""
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'from app import create_app; create_app()'],
+        capture_output=True, text=True, cwd=project_root
+    )
+    if result.returncode != 0:
+        click.echo(result.stderr, err=True)
+        raise SystemExit(result.returncode)
+
+    modules = []
+    total_us = 0
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = int(match.group(1)), int(match.group(2)), match.group(3), match.group(4)
+        # Top-level imports (single space of indentation) add up to the total
+        if len(indent) == 1:
+            total_us += cumulative_us
+        modules.append((cumulative_us, self_us, name))
+
+    modules.sort(reverse=True)
+    click.echo(f'{"cumulative ms":>14} {"self ms":>9}  module')
+    for cumulative_us, self_us, name in modules[:top]:
+        click.echo(f'{cumulative_us / 1000:14.1f} {self_us / 1000:9.1f}  {name}')
+
+    total_ms = total_us / 1000
+    click.echo(f'\nTotal import time: {total_ms:.1f} ms')
+
+    if budget_ms is not None and total_ms > budget_ms:
+        click.echo(f'Import time exceeds budget of {budget_ms:.1f} ms', err=True)
+        raise SystemExit(1)
+
+@click.command('generate-data')
+@click.option('--employees', default=5000, show_default=True)
+@click.option('--admins', default=5, show_default=True)
+@click.option('--projects', default=200000, show_default=True)
+@click.option('--unassigned-ratio', default=0.1, show_default=True, help='Share of projects left unassigned; the rest get one assignment each.')
+@click.option('--max-vacations', default=4, show_default=True, help='Maximum vacations per employee.')
+@click.option('--seed', default=42, show_default=True, help='Random seed; same seed and start date give the same data.')
+@click.option('--start-date', default=None, help='Date the data is generated around (YYYY-MM-DD), default today.')
+@click.option('--prefix', default='syn', show_default=True, help='Prefix for usernames and project numbers.')
+@click.option('--batch-size', default=5000, show_default=True, help='Rows per bulk INSERT.')
+@with_appcontext
+def generate_data_command(employees, admins, projects, unassigned_ratio,
+                          max_vacations, seed, start_date, prefix, batch_size):
+    """Generate a synthetic load-testing dataset in the configured database."""
+    from app.synthetic import generate_dataset
+
+    generate_dataset(
+        employees=employees,
+        admins=admins,
+        projects=projects,
+        unassigned_ratio=unassigned_ratio,
+        max_vacations_per_employee=max_vacations,
+        seed=seed,
+        start_date=datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None,
+        prefix=prefix,
+        batch_size=batch_size,
+        echo=click.echo
+    )
+
+@click.command('benchmark')
+@click.option('--iterations', default=5, show_default=True, help='Runs per benchmark.')
+@click.option('--import-rows', default=500, show_default=True, help='Rows per generated import file.')
+@click.option('--only', multiple=True, help='Run only the named benchmark (repeatable).')
+@click.option('--password', default=None, help='Password of the first admin; defaults to the generate-data password.')
+@click.option('--output', default=None, help='Write the JSON report to this file.')
+@click.option('--compare', 'baseline', default=None, help='Compare against a previous JSON report.')
+@click.option('--threshold', default=10.0, show_default=True, help='Median latency increase (%) counted as a regression.')
+@click.option('--allow-writes', is_flag=True, help='Also run the benchmarks that commit rows; only on a scratch database.')
+@with_appcontext
+def benchmark_command(iterations, import_rows, only, password, output, baseline, threshold, allow_writes):
+    """Measure latency and query counts of the hot endpoints and services."""
+    from app.benchmarks import run_benchmarks, compare_reports, load_report, save_report
+
+    try:
+        report = run_benchmarks(iterations=iterations, import_rows=import_rows, only=only,
+                                password=password, allow_writes=allow_writes, echo=click.echo)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    if output:
+        save_report(report, output)
+        click.echo(f'Report written to {output}')
+
+    failed = [name for name, result in report['benchmarks'].items() if result['failed']]
+
+    if baseline:
+        lines, regressions = compare_reports(load_report(baseline), report, threshold=threshold)
+        click.echo('')
+        for line in lines:
+            click.echo(line)
+        if regressions:
+            click.echo(f'Regressions: {", ".join(regressions)}', err=True)
+            raise SystemExit(1)
+
+    if failed:
+        click.echo(f'Failed (non-200 status or exception): {", ".join(failed)}', err=True)
+        raise SystemExit(1)
+
+@click.command('query-budget')
+@click.option('--employees', default=20, show_default=True, help='Employees in the smaller dataset.')
+@click.option('--projects', default=100, show_default=True, help='Projects in the smaller dataset.')
+@click.option('--scale', default=3, show_default=True, help='Size of the larger dataset relative to the smaller.')
+def query_budget_command(employees, projects, scale):
+    """Fail if a listing page's query count grows with the number of rows."""
+    from app.benchmarks import check_query_scaling
+
+    lines, offenders = check_query_scaling(employees=employees, projects=projects, scale=scale, echo=click.echo)
+    click.echo('')
+    for line in lines:
+        click.echo(line)
+    if offenders:
+        click.echo(f'Query count scales with rows or the request failed: {", ".join(offenders)}', err=True)
+        raise SystemExit(1)
+
+@click.command('reconcile-open-hours')
+@click.option('--dry-run', is_flag=True, help='Only report drift; exit non-zero if any is found.')
+@with_appcontext
+def reconcile_open_hours_command(dry_run):
+    """Verify users' open hours totals against their assignments and repair drift."""
+    from app.open_hours import reconcile_open_hours
+
+    drift = reconcile_open_hours(repair=not dry_run)
+    for entry in drift:
+        click.echo(f"user {entry['user_id']}: hours {entry['stored_hours']:g} -> {entry['actual_hours']:g}, "
+                   f"assignments {entry['stored_count']} -> {entry['actual_count']}")
+
+    if not drift:
+        click.echo('Open hours totals are consistent')
+    elif dry_run:
+        click.echo(f'{len(drift)} users drifted', err=True)
+        raise SystemExit(1)
+    else:
+        click.echo(f'Repaired {len(drift)} users')
+
+@click.command('explain-hot-queries')
+@click.option('--verbose', is_flag=True, help='Print every query plan.')
+@with_appcontext
+def explain_hot_queries_command(verbose):
+    """Check that the hot queries' plans use their partial indexes."""
+    from app.query_plans import check_query_plans
+
+    try:
+        results, failures = check_query_plans()
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for name, result in results.items():
+        state = 'ok' if result['uses_index'] else 'MISSING'
+        used = ', '.join(result['indexes']) or 'no index'
+        click.echo(f"{name:<24} {state:<8} expects {result['index']}, uses {used}")
+        if verbose or not result['uses_index']:
+            click.echo(result['plan'])
+
+    if failures:
+        click.echo(f'Hot queries not using their index: {", ".join(failures)}', err=True)
+        raise SystemExit(1)
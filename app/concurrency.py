@@ -0,0 +1,36 @@
+"""
+Optimistic concurrency helpers for the Manufacturing Workload Management App
+
+Project and Assignment carry a version column (version_id_col), so an
+UPDATE of a row someone else changed since it was loaded matches no rows
+and the flush raises StaleDataError. run_with_retry() re-runs a unit of
+work against fresh state when that happens; conflicts that outlast the
+retries surface as 409 responses from the app's error handler.
+"""
+
+import random
+import time
+from flask import current_app
+from sqlalchemy.orm.exc import StaleDataError
+from app import db
+
+def run_with_retry(work, attempts=None):
+    """Call work() and commit, retrying after a rollback on version conflicts
+
+    work must (re)load the rows it changes, since the rollback expires them.
+    Returns work()'s result; re-raises StaleDataError after the last attempt.
+    """
+    attempts = attempts or current_app.config.get('CONFLICT_RETRY_ATTEMPTS', 3)
+    backoff = current_app.config.get('CONFLICT_RETRY_BACKOFF', 0.05)
+
+    for attempt in range(1, attempts + 1):
+        try:
+            result = work()
+            db.session.commit()
+            return result
+        except StaleDataError:
+            db.session.rollback()
+            if attempt == attempts:
+                raise
+            # Jittered exponential backoff so the competing writers spread out
+            time.sleep(random.uniform(0, backoff * 2 ** attempt))
@@ -0,0 +1,116 @@
+"""
+Employee efficiency lookup table for the Manufacturing Workload Management App
+
+Efficiencies are derived from the skills matrix once and kept in process
+memory, keyed by (user_id, machine_type). Committed skill changes
+invalidate the table through the changes_committed signal; the TTL bounds
+how long other worker processes can serve a stale table.
+
+Every invalidation bumps a generation counter, and a build only replaces
+the table if no invalidation happened while it ran, so a table built from
+data read before a commit is never kept.
+"""
+
+import threading
+import time
+from app import db
+from app.changes import changes_committed, changes_for
+
+# Multipliers applied on top of the stored efficiency factor
+SKILL_LEVEL_MULTIPLIERS = {
+    'primary': 1.0,
+    'secondary': 0.8
+}
+MAX_EFFICIENCY = 2.0
+DEFAULT_EFFICIENCY = 1.0
+
+def compute_efficiency(efficiency_factor, skill_level, years_experience):
+    """Apply skill level and experience multipliers to a base efficiency factor"""
+    efficiency = efficiency_factor * SKILL_LEVEL_MULTIPLIERS.get(skill_level, 1.0)
+
+    # Adjust based on experience
+    if years_experience >= 5:
+        efficiency *= 1.1
+    elif years_experience >= 2:
+        efficiency *= 1.05
+
+    return min(efficiency, MAX_EFFICIENCY)
+
+class EfficiencyTable:
+    """Process-local (user_id, machine_type) -> efficiency table"""
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._table = None
+        self._built_at = 0.0
+        self._generation = 0
+
+    def invalidate(self):
+        """Drop the table so the next lookup rebuilds it"""
+        with self._lock:
+            self._generation += 1
+            self._table = None
+
+    def _build(self):
+        from app.models import SkillsMatrix
+
+        rows = db.session.query(
+            SkillsMatrix.user_id,
+            SkillsMatrix.machine_type,
+            SkillsMatrix.efficiency_factor,
+            SkillsMatrix.skill_level,
+            SkillsMatrix.years_experience
+        ).all()
+
+        return {
+            (user_id, machine_type): compute_efficiency(factor, level, years)
+            for user_id, machine_type, factor, level, years in rows
+        }
+
+    def _current(self):
+        with self._lock:
+            if self._table is not None and time.monotonic() - self._built_at < self.ttl:
+                return self._table, self._generation
+            return None, self._generation
+
+    def get_table(self):
+        """Return the current table, rebuilding it if invalidated or expired"""
+        table, _ = self._current()
+        if table is not None:
+            return table
+
+        with self._build_lock:
+            # Another thread may have rebuilt while we waited for the lock
+            table, generation = self._current()
+            if table is not None:
+                return table
+
+            table = self._build()
+            with self._lock:
+                # Keep it only if nothing was invalidated during the build
+                if generation == self._generation:
+                    self._table = table
+                    self._built_at = time.monotonic()
+            return table
+
+    def lookup(self, user_id, machine_type, default=DEFAULT_EFFICIENCY):
+        """Efficiency for a single (user_id, machine_type) pair"""
+        return self.get_table().get((user_id, machine_type), default)
+
+    def lookup_many(self, pairs, default=DEFAULT_EFFICIENCY):
+        """Efficiencies for many (user_id, machine_type) pairs, in order"""
+        table = self.get_table()
+        return [table.get(pair, default) for pair in pairs]
+
+efficiency_table = EfficiencyTable()
+
+def invalidate_efficiency_table():
+    """Invalidate the process-local efficiency table"""
+    efficiency_table.invalidate()
+
+@changes_committed.connect
+def invalidate_changed_skills(sender, changes):
+    if changes_for(changes, 'skills_matrix'):
+        invalidate_efficiency_table()
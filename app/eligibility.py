@@ -0,0 +1,77 @@
+"""
+Team eligibility rules for the Manufacturing Workload Management App
+
+The business rules deciding which team works on which model type for which
+customer countries live here once. They are compiled into lookup tables at
+import time and can also be rendered as SQL expressions so candidate
+filtering happens in the query's WHERE clause.
+"""
+
+from sqlalchemy import false
+
+# Country classes, combinable as a bitmask
+COUNTRY_USA = 1
+COUNTRY_NON_USA = 2
+COUNTRY_ALL = COUNTRY_USA | COUNTRY_NON_USA
+
+# (team_id, model_type, country classes)
+TEAM_RULES = (
+    (1, 'PAH', COUNTRY_ALL),      # Team 1 - PAH for all countries
+    (2, 'PPH', COUNTRY_USA),      # Team 2 - PPH for USA only
+    (3, 'PPH', COUNTRY_NON_USA),  # Team 3 - PPH for non-USA
+    (4, 'REF', COUNTRY_USA),      # Team 4 - REF for USA only
+    (5, 'REF', COUNTRY_NON_USA),  # Team 5 - REF for non-USA
+)
+
+# Team used for model types without a dedicated team (APS, PSC)
+DEFAULT_TEAM = 1
+
+def _compile_eligibility(rules):
+    """Compile rules into team -> model_type -> country bitmask"""
+    table = {}
+    for team_id, model_type, countries in rules:
+        models = table.setdefault(team_id, {})
+        models[model_type] = models.get(model_type, 0) | countries
+    return table
+
+def _compile_teams_by_model(rules):
+    """Compile rules into (model_type, country class) -> eligible team ids"""
+    table = {}
+    for team_id, model_type, countries in rules:
+        for country_class_bit in (COUNTRY_USA, COUNTRY_NON_USA):
+            if countries & country_class_bit:
+                table.setdefault((model_type, country_class_bit), []).append(team_id)
+    return {key: tuple(teams) for key, teams in table.items()}
+
+ELIGIBILITY = _compile_eligibility(TEAM_RULES)
+TEAMS_BY_MODEL = _compile_teams_by_model(TEAM_RULES)
+
+def country_class(customer_country):
+    """Map a customer country to its country class bit"""
+    return COUNTRY_USA if (customer_country or '').upper() == 'USA' else COUNTRY_NON_USA
+
+def is_team_eligible(team_id, model_type, customer_country):
+    """Check if a team may work on a model type for a customer country"""
+    mask = ELIGIBILITY.get(team_id, {}).get((model_type or '').upper(), 0)
+    return bool(mask & country_class(customer_country))
+
+def eligible_teams(model_type, customer_country):
+    """Get the team ids eligible for a model type and customer country"""
+    return TEAMS_BY_MODEL.get(((model_type or '').upper(), country_class(customer_country)), ())
+
+def team_for_project(model_type, customer_country):
+    """Get the team responsible for a model type and customer country"""
+    teams = eligible_teams(model_type, customer_country)
+    return teams[0] if teams else DEFAULT_TEAM
+
+def eligible_team_clause(team_column, model_type, customer_country):
+    """SQL clause restricting a team id column to eligible teams for a project
+
+    The project's model type and country are classified in Python, with the
+    same case folding as is_team_eligible(), so the clause never compares
+    stored country strings and cannot disagree with the Python rules.
+    """
+    teams = eligible_teams(model_type, customer_country)
+    if not teams:
+        return false()
+    return team_column.in_(teams)
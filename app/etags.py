@@ -0,0 +1,89 @@
+"""
+Conditional GET support for the Manufacturing Workload Management App
+
+JSON endpoints derive their ETag from cheap version tokens kept in the
+shared cache. Tokens are replaced whenever committed changes touch the data
+behind a scope, so a matching If-None-Match can be answered with 304 before
+the view runs any query.
+"""
+
+import hashlib
+import uuid
+from datetime import date
+from functools import wraps
+from flask import request, make_response
+from app import cache
+from app.changes import changes_committed, changes_for
+
+PROJECTS_SCOPE = 'projects'
+
+def workload_scope(user_id):
+    return f'workload:{user_id}'
+
+def _version_key(scope):
+    return f'etag_version_{scope}'
+
+def bump_version(scope):
+    """Invalidate every ETag derived from a scope"""
+    # A fresh random token can never match an ETag handed out earlier, so
+    # concurrent bumps need no atomic increment
+    cache.set(_version_key(scope), uuid.uuid4().hex, timeout=0)
+
+def get_version(scope):
+    """Current version token for a scope, or None if the cache can't hold one"""
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, timeout=0)
+        version = cache.get(key)
+    return version
+
+def compute_etag(scopes, daily=False):
+    """ETag for a set of scopes, or None if any version is unavailable"""
+    parts = []
+    for scope in scopes:
+        version = get_version(scope)
+        if version is None:
+            return None
+        parts.append(f'{scope}={version}')
+    if daily:
+        parts.append(date.today().isoformat())
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+def conditional_get(*scopes, daily=False):
+    """Decorator answering If-None-Match from scope versions before the view runs
+
+    Scopes may be strings or callables returning a string, for scopes that
+    depend on the current user. Use daily=True for responses that also
+    depend on today's date.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            etag = compute_etag([scope() if callable(scope) else scope for scope in scopes], daily=daily)
+
+            if etag is not None and request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if etag is None or response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated_function
+    return decorator
+
+@changes_committed.connect
+def bump_changed_versions(sender, changes):
+    if changes_for(changes, 'projects'):
+        bump_version(PROJECTS_SCOPE)
+
+    user_ids = set()
+    for change in changes_for(changes, 'assignments'):
+        user_ids.add(change['user_id'])
+        user_ids.add(change['previous_user_id'])
+
+    for user_id in user_ids:
+        bump_version(workload_scope(user_id))
@@ -0,0 +1,336 @@
+"""
+Coalesced hours updates for the Manufacturing Workload Management App
+
+Employees nudge an assignment's remaining hours several times in a row.
+Each update is accepted immediately and parked in a pending map keyed by
+assignment, where a newer value replaces an older one. A background thread
+per process drains the map every HOURS_COALESCE_WINDOW seconds and writes
+the values in one transaction, so a burst of nudges becomes one UPDATE.
+With a redis store the map is shared, so the latest value wins across
+gunicorn workers too. Until then, views overlay the pending values on what
+they loaded (apply_pending, pending_open_hours_delta).
+
+A batch is written with one executemany UPDATE that re-checks the status,
+so a value drained just before the assignment was completed or cancelled
+never lands on it. The UPDATE bumps the row version like an ORM write,
+the employees' open totals are recounted, and the changes are announced
+to the changes_committed subscribers (caches, ETags, live updates). A
+failed batch is retried up to HOURS_COALESCE_MAX_ATTEMPTS flushes, then
+logged and dropped.
+"""
+
+import atexit
+import os
+import threading
+import time
+import weakref
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import bindparam, event, select
+from sqlalchemy.orm.attributes import set_committed_value
+from app import db
+from app.models import Assignment, OPEN_ASSIGNMENT_STATUSES
+from app.changes import record_changes
+from app.open_hours import recount_open_hours
+
+# Assignments in these states keep their hours; a late nudge must not reopen them
+CLOSED_STATUSES = ('completed', 'cancelled')
+
+DISCARD_ON_COMMIT_KEY = 'hours_updates_discard'
+
+_assignments = Assignment.__table__
+
+UPDATE_HOURS = _assignments.update().where(
+    _assignments.c.id == bindparam('assignment_id'),
+    _assignments.c.status.notin_(CLOSED_STATUSES)
+).values(
+    hours_remaining=bindparam('hours'),
+    last_status_change=bindparam('changed_at'),
+    version=_assignments.c.version + 1
+)
+
+class MemoryHoursStore:
+    """Pending values of this process only"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def put(self, assignment_id, hours):
+        with self._lock:
+            self._pending[assignment_id] = hours
+
+    def put_if_absent(self, values):
+        with self._lock:
+            for assignment_id, hours in values.items():
+                self._pending.setdefault(assignment_id, hours)
+
+    def get(self, assignment_id):
+        with self._lock:
+            return self._pending.get(assignment_id)
+
+    def get_many(self, assignment_ids):
+        with self._lock:
+            return {assignment_id: self._pending[assignment_id] for assignment_id in assignment_ids if assignment_id in self._pending}
+
+    def count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def discard(self, assignment_id):
+        with self._lock:
+            self._pending.pop(assignment_id, None)
+
+    def drain(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+class RedisHoursStore:
+    """Pending values in one redis hash shared by every worker"""
+
+    KEY = 'hours_updates:pending'
+
+    def __init__(self, url):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+
+    def put(self, assignment_id, hours):
+        self._redis.hset(self.KEY, assignment_id, hours)
+
+    def put_if_absent(self, values):
+        pipe = self._redis.pipeline(transaction=False)
+        for assignment_id, hours in values.items():
+            pipe.hsetnx(self.KEY, assignment_id, hours)
+        pipe.execute()
+
+    def get(self, assignment_id):
+        value = self._redis.hget(self.KEY, assignment_id)
+        return float(value) if value is not None else None
+
+    def get_many(self, assignment_ids):
+        if not assignment_ids:
+            return {}
+        values = self._redis.hmget(self.KEY, list(assignment_ids))
+        return {assignment_id: float(value) for assignment_id, value in zip(assignment_ids, values) if value is not None}
+
+    def count(self):
+        return self._redis.hlen(self.KEY)
+
+    def discard(self, assignment_id):
+        self._redis.hdel(self.KEY, assignment_id)
+
+    def drain(self):
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.hgetall(self.KEY)
+        pipe.delete(self.KEY)
+        pending, _ = pipe.execute()
+        return {int(assignment_id): float(hours) for assignment_id, hours in pending.items()}
+
+class HoursUpdates:
+    """Flask extension coalescing hours updates into batched writes
+
+    Each app keeps its own store and flush bookkeeping in app.extensions,
+    so a second app (e.g. the testing one `flask query-budget` creates)
+    never redirects another app's writes.
+    """
+
+    def __init__(self, app=None):
+        self._apps = weakref.WeakSet()
+        atexit.register(self._flush_apps)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        storage_url = app.config.get('HOURS_COALESCE_STORAGE_URL', 'memory://')
+        if storage_url.startswith('memory://'):
+            store = MemoryHoursStore()
+        elif storage_url.startswith(('redis://', 'rediss://')):
+            store = RedisHoursStore(storage_url)
+        else:
+            raise ValueError(f'Unsupported HOURS_COALESCE_STORAGE_URL: {storage_url}')
+        app.extensions['hours_updates'] = {
+            'store': store,
+            'lock': threading.Lock(),
+            'thread_pid': None,
+            'attempts': {},
+        }
+        self._apps.add(app)
+
+    @property
+    def state(self):
+        return current_app.extensions['hours_updates']
+
+    @property
+    def store(self):
+        return self.state['store']
+
+    @property
+    def window(self):
+        return current_app.config.get('HOURS_COALESCE_WINDOW', 1.0)
+
+    def submit(self, assignment_id, hours):
+        """Accept a new value; written within one window, or now if coalescing is off"""
+        if not self.window:
+            self._write({assignment_id: hours})
+            return
+        self.store.put(assignment_id, hours)
+        self._ensure_thread()
+
+    def pending_hours(self, assignment_id):
+        """Accepted value not yet written, or None"""
+        return self.store.get(assignment_id)
+
+    def apply_pending(self, assignments):
+        """Show accepted values not yet written on loaded assignments
+
+        The values are set as if loaded, so they are never flushed. Returns
+        the resulting change in the assignments' total hours.
+        """
+        pending = self.store.get_many([assignment.id for assignment in assignments])
+        delta = 0
+        for assignment in assignments:
+            hours = pending.get(assignment.id)
+            if hours is None or assignment.status in CLOSED_STATUSES:
+                continue
+            delta += hours - (assignment.hours_remaining or 0)
+            set_committed_value(assignment, 'hours_remaining', hours)
+        return delta
+
+    def pending_open_hours_delta(self, user_id, statuses):
+        """Change in an employee's hours in the given statuses once pending values are written"""
+        if not self.store.count():
+            return 0
+        rows = db.session.query(Assignment.id, Assignment.hours_remaining).filter(
+            Assignment.user_id == user_id,
+            Assignment.status.in_(statuses)
+        ).all()
+        pending = self.store.get_many([assignment_id for assignment_id, _ in rows])
+        return sum(pending[assignment_id] - (hours or 0) for assignment_id, hours in rows if assignment_id in pending)
+
+    def discard(self, assignment_id):
+        """Drop a pending value"""
+        self.store.discard(assignment_id)
+
+    def discard_on_commit(self, session, assignment_id):
+        """Drop a pending value once the session commits, e.g. when a status change sets the hours itself
+
+        Kept if the transaction rolls back, so a failed or retried change
+        does not lose the employee's value.
+        """
+        session.info.setdefault(DISCARD_ON_COMMIT_KEY, set()).add(assignment_id)
+
+    def _ensure_thread(self):
+        """Flush thread for this app and process; started lazily so preloaded apps fork cleanly"""
+        state = self.state
+        if state['thread_pid'] == os.getpid():
+            return
+        with state['lock']:
+            if state['thread_pid'] != os.getpid():
+                threading.Thread(target=self._run, args=(current_app._get_current_object(),),
+                                 name='hours-updates', daemon=True).start()
+                state['thread_pid'] = os.getpid()
+
+    def _run(self, app):
+        while True:
+            time.sleep(app.config.get('HOURS_COALESCE_WINDOW', 1.0))
+            with app.app_context():
+                self.flush()
+
+    def _flush_apps(self):
+        for app in list(self._apps):
+            with app.app_context():
+                self.flush()
+
+    def flush(self):
+        """Write every pending value of the current app now"""
+        pending = self.store.drain()
+        if pending:
+            self._write(pending)
+
+    def _write_batch(self, pending, changed_at):
+        rows = db.session.execute(
+            select(
+                _assignments.c.id, _assignments.c.user_id, _assignments.c.project_id,
+                _assignments.c.status, _assignments.c.hours_remaining
+            ).where(
+                _assignments.c.id.in_(list(pending)),
+                _assignments.c.status.notin_(CLOSED_STATUSES)
+            ).with_for_update()
+        ).all()
+        if not rows:
+            return
+
+        db.session.execute(UPDATE_HOURS, [
+            {'assignment_id': row.id, 'hours': pending[row.id], 'changed_at': changed_at} for row in rows
+        ])
+        recount_open_hours(sorted({row.user_id for row in rows if row.status in OPEN_ASSIGNMENT_STATUSES}))
+        record_changes(db.session, [{
+            'model': 'assignments',
+            'op': 'update',
+            'id': row.id,
+            'user_id': row.user_id,
+            'previous_user_id': row.user_id,
+            'project_id': row.project_id,
+            'status': row.status,
+            'previous_status': row.status,
+            'hours_remaining': pending[row.id],
+            'previous_hours_remaining': row.hours_remaining,
+        } for row in rows])
+
+    def _write(self, pending):
+        app = current_app._get_current_object()
+        state = self.state
+        batch_size = app.config.get('HOURS_COALESCE_BATCH_SIZE', 500)
+        ids = list(pending)
+        # A fresh app context gets its own session, apart from the calling request's
+        with app.app_context():
+            try:
+                changed_at = datetime.utcnow()
+                for start in range(0, len(ids), batch_size):
+                    self._write_batch({assignment_id: pending[assignment_id] for assignment_id in ids[start:start + batch_size]}, changed_at)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                if not self.window:
+                    raise
+                self._retry_later(pending, e)
+            else:
+                with state['lock']:
+                    for assignment_id in ids:
+                        state['attempts'].pop(assignment_id, None)
+            finally:
+                db.session.remove()
+
+    def _retry_later(self, pending, error):
+        """Requeue a failed batch, dropping values that failed too often"""
+        state = self.state
+        max_attempts = current_app.config.get('HOURS_COALESCE_MAX_ATTEMPTS', 3)
+        retry, dropped = {}, []
+        with state['lock']:
+            for assignment_id, hours in pending.items():
+                attempts = state['attempts'].get(assignment_id, 0) + 1
+                if attempts >= max_attempts:
+                    state['attempts'].pop(assignment_id, None)
+                    dropped.append(assignment_id)
+                else:
+                    state['attempts'][assignment_id] = attempts
+                    retry[assignment_id] = hours
+
+        # Newer values that arrived meanwhile win over the failed batch
+        if retry:
+            self.store.put_if_absent(retry)
+        current_app.logger.error(f'Hours update flush of {len(pending)} assignments failed: {error}')
+        if dropped:
+            current_app.logger.error(f'Dropped hours updates after {max_attempts} failed flushes for assignments {sorted(dropped)}')
+
+hours_updates = HoursUpdates()
+
+@event.listens_for(db.session, 'after_commit')
+def discard_committed_overrides(session):
+    for assignment_id in session.info.pop(DISCARD_ON_COMMIT_KEY, ()):
+        hours_updates.discard(assignment_id)
+
+@event.listens_for(db.session, 'after_rollback')
+def keep_overridden_values(session):
+    session.info.pop(DISCARD_ON_COMMIT_KEY, None)
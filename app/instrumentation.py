@@ -0,0 +1,131 @@
+"""
+Per-request query instrumentation for the Manufacturing Workload Management App
+
+For a sampled share of requests, every statement executed on the database
+engines is timed and attributed to the request. The totals are returned in
+a Server-Timing header, logged as one structured record, and compared with a
+per-endpoint query budget so N+1 patterns show up as warnings. Requests
+that are not sampled only pay for one g lookup per statement.
+"""
+
+import heapq
+import random
+import time
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+class QueryStats:
+    """Query count, total DB time and the slowest statements of one request"""
+
+    def __init__(self, keep_slowest=3):
+        self.count = 0
+        self.duration = 0.0
+        self.started = time.perf_counter()
+        self._keep_slowest = keep_slowest
+        self._slowest = []
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        entry = (duration, self.count, statement)
+        if len(self._slowest) < self._keep_slowest:
+            heapq.heappush(self._slowest, entry)
+        elif duration > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    @property
+    def slowest(self):
+        """Slowest statements, slowest first, as (milliseconds, statement)"""
+        return [(duration * 1000, statement) for duration, _, statement in sorted(self._slowest, reverse=True)]
+
+def _current_stats():
+    return g.get('_query_stats') if has_request_context() else None
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats() is not None:
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats()
+    started = conn.info.get('query_started')
+    if stats is not None and started:
+        stats.record(statement, time.perf_counter() - started.pop())
+
+def _handle_error(exception_context):
+    started = exception_context.connection.info.get('query_started') if exception_context.connection else None
+    if started:
+        started.pop()
+
+class RequestInstrumentation:
+    """Sampled per-request query counting, Server-Timing and query budgets"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(Engine, 'handle_error', _handle_error)
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.extensions['request_instrumentation'] = self
+
+    def _start(self):
+        sample_rate = current_app.config.get('QUERY_STATS_SAMPLE_RATE', 0.0)
+        if sample_rate and request.endpoint != 'static' and random.random() < sample_rate:
+            g._query_stats = QueryStats(current_app.config.get('QUERY_STATS_KEEP_SLOWEST', 3))
+
+    def query_budget(self, endpoint):
+        """Query budget for an endpoint, falling back to QUERY_BUDGET"""
+        return current_app.config.get('QUERY_BUDGETS', {}).get(endpoint, current_app.config.get('QUERY_BUDGET'))
+
+    def _finish(self, response):
+        stats = g.pop('_query_stats', None)
+        if stats is None:
+            return response
+
+        config = current_app.config
+        total_ms = (time.perf_counter() - stats.started) * 1000
+        db_ms = stats.duration * 1000
+
+        if config.get('QUERY_STATS_SERVER_TIMING', True):
+            response.headers.add(
+                'Server-Timing',
+                f'db;dur={db_ms:.1f};desc="{stats.count} queries", app;dur={total_ms:.1f}'
+            )
+
+        slow_threshold = config.get('SLOW_QUERY_THRESHOLD_MS', 100)
+        record = {
+            'event': 'request_queries',
+            'endpoint': request.endpoint,
+            'method': request.method,
+            'status': response.status_code,
+            'queries': stats.count,
+            'db_ms': round(db_ms, 1),
+            'total_ms': round(total_ms, 1),
+            'slowest': [
+                {'ms': round(duration, 1), 'statement': statement[:300]}
+                for duration, statement in stats.slowest
+            ],
+        }
+        logger = current_app.logger
+        logger.info(
+            f"{request.endpoint}: {stats.count} queries, {db_ms:.1f} ms in DB of {total_ms:.1f} ms",
+            extra={'query_stats': record}
+        )
+
+        for duration, statement in stats.slowest:
+            if duration >= slow_threshold:
+                logger.warning(f'Slow query on {request.endpoint} ({duration:.1f} ms): {statement[:300]}')
+
+        budget = self.query_budget(request.endpoint)
+        if budget is not None and stats.count > budget:
+            logger.warning(f'Query budget exceeded on {request.endpoint}: {stats.count} queries (budget {budget})')
+
+        return response
+
+request_instrumentation = RequestInstrumentation()
@@ -0,0 +1,36 @@
+"""
+Lazy imports for heavy optional dependencies
+
+Modules like pandas take a noticeable share of worker boot time but are
+only needed by the import/export endpoints. lazy_import() returns a proxy
+that performs the real import on first attribute access.
+"""
+
+import importlib
+import threading
+
+class LazyModule:
+    """Module proxy importing the real module on first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f'<LazyModule {self._name} ({state})>'
+
+def lazy_import(name):
+    """Return a proxy for module `name` that imports it when first used"""
+    return LazyModule(name)
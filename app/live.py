@@ -0,0 +1,197 @@
+"""
+Live update hub for the Manufacturing Workload Management App
+
+Committed assignment and project changes are published once to a fan-out
+hub and streamed to browsers over Server-Sent Events. The hub is an
+in-process queue for local development and redis pub/sub in production,
+where gunicorn workers do not share memory.
+
+Every open stream pins a gunicorn worker thread, so each process serves at
+most LIVE_MAX_STREAMS of them at a time; further browsers are turned away
+with a 503 and poll until a retry gets a slot, leaving the remaining
+threads to page requests.
+"""
+
+import json
+import queue
+import threading
+from datetime import date
+from flask import current_app, has_app_context
+from app.changes import changes_committed, changes_for
+
+ADMIN_CHANNEL = 'admin'
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+class LocalSubscription:
+    def __init__(self, hub, channels, maxsize):
+        self._hub = hub
+        self.channels = channels
+        self.queue = queue.Queue(maxsize=maxsize)
+
+    def get(self, timeout):
+        """Next message, or None if nothing arrived within timeout seconds"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._hub.unsubscribe(self)
+
+class LocalHub:
+    """In-process fan-out hub, only reaches subscribers in the same process"""
+
+    def __init__(self, maxsize=100):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(message)
+            except queue.Full:
+                # Slow client; drop rather than block the publishing request
+                pass
+
+    def subscribe(self, channels):
+        subscription = LocalSubscription(self, channels, self.maxsize)
+        with self._lock:
+            for channel in channels:
+                self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+class RedisSubscription:
+    def __init__(self, pubsub):
+        self._pubsub = pubsub
+
+    def get(self, timeout):
+        """Next message, or None if nothing arrived within timeout seconds"""
+        message = self._pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if message is None:
+            return None
+        return json.loads(message['data'])
+
+    def close(self):
+        self._pubsub.close()
+
+class RedisHub:
+    """Redis pub/sub fan-out hub, shared by every worker process"""
+
+    def __init__(self, url, prefix='live:'):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def publish(self, channel, message):
+        self._redis.publish(self.prefix + channel, json.dumps(message))
+
+    def subscribe(self, channels):
+        pubsub = self._redis.pubsub()
+        pubsub.subscribe(*[self.prefix + channel for channel in channels])
+        return RedisSubscription(pubsub)
+
+class LiveUpdates:
+    """Flask extension owning the live update hub"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('LIVE_UPDATES_BACKEND', 'local')
+        if backend == 'redis':
+            hub = RedisHub(app.config['LIVE_UPDATES_REDIS_URL'])
+        elif backend == 'local':
+            hub = LocalHub()
+        else:
+            raise ValueError(f'Unknown LIVE_UPDATES_BACKEND: {backend}')
+        app.extensions['live_updates'] = hub
+        app.extensions['live_update_streams'] = threading.BoundedSemaphore(app.config.get('LIVE_MAX_STREAMS', 3))
+
+    @property
+    def hub(self):
+        return current_app.extensions['live_updates']
+
+    def publish(self, channel, event, data):
+        try:
+            self.hub.publish(channel, {'event': event, 'data': data})
+        except Exception as e:
+            # Live updates are best effort; never fail the committing request
+            current_app.logger.warning(f'Live update publish failed: {e}')
+
+    def subscribe(self, channels):
+        return self.hub.subscribe(channels)
+
+    def acquire_stream(self):
+        """Claim a stream slot in this process without waiting; False if all are taken"""
+        return current_app.extensions['live_update_streams'].acquire(blocking=False)
+
+    def release_stream(self, app):
+        app.extensions['live_update_streams'].release()
+
+live_updates = LiveUpdates()
+
+def format_sse(event, data):
+    """Format one Server-Sent Events message"""
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+def _project_stat_flags(status, deadline):
+    """Which admin dashboard counters a project with this state contributes to"""
+    return {
+        'total_projects': 1,
+        'unassigned_projects': int(status == 'unassigned'),
+        'at_risk_projects': int(deadline is not None and deadline < date.today() and status != 'completed'),
+        'active_projects': int(status in ('assigned', 'in_progress')),
+    }
+
+def project_stat_delta(change):
+    """Dashboard counter deltas caused by one committed project change"""
+    after = _project_stat_flags(change['status'], change['deadline'])
+    before = _project_stat_flags(change['previous_status'], change['previous_deadline'])
+
+    if change['op'] == 'insert':
+        return after
+    if change['op'] == 'delete':
+        return {key: -value for key, value in before.items()}
+    return {key: after[key] - before[key] for key in after}
+
+@changes_committed.connect
+def publish_committed_changes(sender, changes):
+    if not has_app_context() or 'live_updates' not in current_app.extensions:
+        return
+
+    for change in changes_for(changes, 'assignments'):
+        data = {
+            'op': change['op'],
+            'assignment_id': change['id'],
+            'project_id': change['project_id'],
+            'status': change['status'],
+            'previous_status': change['previous_status'],
+            'hours_remaining': change['hours_remaining'],
+        }
+        live_updates.publish(user_channel(change['user_id']), 'assignment', data)
+        if change['previous_user_id'] != change['user_id']:
+            live_updates.publish(user_channel(change['previous_user_id']), 'assignment', data)
+
+    totals = {}
+    for change in changes_for(changes, 'projects'):
+        for key, value in project_stat_delta(change).items():
+            totals[key] = totals.get(key, 0) + value
+
+    # Browsers refetch the counters on this event; the deltas only tell them whether any moved
+    if any(totals.values()):
+        live_updates.publish(ADMIN_CHANNEL, 'dashboard_stats', totals)
@@ -0,0 +1,302 @@
+"""
+Prometheus metrics for the Manufacturing Workload Management App
+
+Each worker accumulates counters (request latency histograms, connection
+pool events, cache hits and misses, import throughput) in memory and
+flushes the deltas to the metrics store every METRICS_FLUSH_INTERVAL
+seconds. With a redis store the counters of all gunicorn workers are summed
+there, so /metrics returns the same totals whichever worker answers the
+scrape. Pool gauges are written per worker with a short expiry and summed.
+Scrapes need the METRICS_TOKEN bearer token; without one configured the
+endpoint answers 404.
+"""
+
+import hmac
+import os
+import re
+import socket
+import threading
+import time
+from flask import current_app, g, request, abort, Response, got_request_exception
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name -> (type, help); histogram series use the _bucket/_sum/_count suffixes
+METRICS = {
+    'http_request_duration_seconds': ('histogram', 'Request latency by endpoint'),
+    'http_requests_total': ('counter', 'Requests by endpoint, method and status'),
+    'db_pool_checkouts_total': ('counter', 'Connections checked out of the pool'),
+    'db_pool_connections_created_total': ('counter', 'New DBAPI connections opened by the pool'),
+    'db_pool_timeouts_total': ('counter', 'Requests that failed waiting for a pooled connection'),
+    'db_pool_size': ('gauge', 'Configured pool size'),
+    'db_pool_checked_out': ('gauge', 'Connections currently checked out'),
+    'db_pool_overflow': ('gauge', 'Connections currently open beyond pool_size'),
+    'cache_requests_total': ('counter', 'app.cache lookups by result (hit or miss)'),
+    'import_jobs_total': ('counter', 'Import file uploads processed'),
+    'import_rows_total': ('counter', 'Import rows by result (imported or error)'),
+    'import_duration_seconds_total': ('counter', 'Time spent processing import files'),
+    'audit_records_dropped_total': ('counter', 'Audit records discarded by reason (rejected by the database or buffer overflow)'),
+}
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def series(name, **labels):
+    """Exposition-format series name, e.g. cache_requests_total{result="hit"}"""
+    if not labels:
+        return name
+    return name + '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+LE_LABEL = re.compile(r',?le="([^"]+)"')
+
+def _sort_key(series_name):
+    """Order series by labels, with histogram buckets in increasing le order"""
+    match = LE_LABEL.search(series_name)
+    if not match:
+        return (series_name, 0.0)
+    return (LE_LABEL.sub('', series_name), float(match.group(1)))
+
+def _family(series_name):
+    name = series_name.split('{', 1)[0]
+    for suffix in ('_bucket', '_sum', '_count'):
+        if name.endswith(suffix) and METRICS.get(name[:-len(suffix)], ('',))[0] == 'histogram':
+            return name[:-len(suffix)]
+    return name
+
+class MemoryMetricsStore:
+    """In-process totals, only covering the worker answering the scrape"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+
+    def add_counters(self, deltas):
+        with self._lock:
+            for key, value in deltas.items():
+                self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauges(self, worker, gauges, expire):
+        with self._lock:
+            self._gauges = dict(gauges)
+
+    def read(self):
+        with self._lock:
+            return dict(self._counters), dict(self._gauges)
+
+class RedisMetricsStore:
+    """Redis hashes summed across every worker; a flush is one round trip"""
+
+    COUNTERS_KEY = 'metrics:counters'
+    GAUGES_PREFIX = 'metrics:gauges:'
+
+    def __init__(self, url):
+        import redis
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+
+    def add_counters(self, deltas):
+        pipe = self._redis.pipeline(transaction=False)
+        for key, value in deltas.items():
+            pipe.hincrbyfloat(self.COUNTERS_KEY, key, value)
+        pipe.execute()
+
+    def set_gauges(self, worker, gauges, expire):
+        if not gauges:
+            return
+        key = f'{self.GAUGES_PREFIX}{worker}'
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.delete(key)
+        pipe.hset(key, mapping=gauges)
+        pipe.expire(key, expire)
+        pipe.execute()
+
+    def read(self):
+        counters = {key: float(value) for key, value in self._redis.hgetall(self.COUNTERS_KEY).items()}
+        gauges = {}
+        for key in self._redis.scan_iter(f'{self.GAUGES_PREFIX}*'):
+            for name, value in self._redis.hgetall(key).items():
+                gauges[name] = gauges.get(name, 0) + float(value)
+        return counters, gauges
+
+class Metrics:
+    """Flask extension collecting metrics and serving them at /metrics"""
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_flush = time.monotonic()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        storage_url = app.config.get('METRICS_STORAGE_URL', 'memory://')
+        if storage_url.startswith('memory://'):
+            store = MemoryMetricsStore()
+        elif storage_url.startswith(('redis://', 'rediss://')):
+            store = RedisMetricsStore(storage_url)
+        else:
+            raise ValueError(f'Unsupported METRICS_STORAGE_URL: {storage_url}')
+        app.extensions['metrics'] = {'store': store, 'app': app}
+
+        app.before_request(self._start_timer)
+        app.after_request(self._record_request)
+        got_request_exception.connect(self._record_exception, app)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+        with app.app_context():
+            from app import db
+            for engine in db.engines.values():
+                event.listen(engine.pool, 'checkout', lambda *args: self.inc(series('db_pool_checkouts_total')))
+                event.listen(engine.pool, 'connect', lambda *args: self.inc(series('db_pool_connections_created_total')))
+
+    @property
+    def store(self):
+        return current_app.extensions['metrics']['store']
+
+    def inc(self, key, value=1):
+        """Add to a counter series in this worker's pending deltas"""
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + value
+
+    def inc_many(self, deltas):
+        with self._lock:
+            for key, value in deltas.items():
+                self._pending[key] = self._pending.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Record one histogram observation"""
+        with self._lock:
+            pending = self._pending
+            # Every bucket is written so a series always carries the full set
+            for bound in LATENCY_BUCKETS:
+                key = series(f'{name}_bucket', **labels, le=bound)
+                pending[key] = pending.get(key, 0) + (value <= bound)
+            key = series(f'{name}_bucket', **labels, le='+Inf')
+            pending[key] = pending.get(key, 0) + 1
+            key = series(f'{name}_sum', **labels)
+            pending[key] = pending.get(key, 0) + value
+            key = series(f'{name}_count', **labels)
+            pending[key] = pending.get(key, 0) + 1
+
+    def record_cache(self, hits, misses):
+        if hits:
+            self.inc(series('cache_requests_total', result='hit'), hits)
+        if misses:
+            self.inc(series('cache_requests_total', result='miss'), misses)
+
+    def record_import(self, importer, imported, errors, duration):
+        """Count one processed import file and its rows"""
+        self.inc(series('import_jobs_total', importer=importer))
+        self.inc(series('import_rows_total', importer=importer, result='imported'), imported)
+        self.inc(series('import_rows_total', importer=importer, result='error'), errors)
+        self.inc(series('import_duration_seconds_total', importer=importer), duration)
+
+    def _pool_gauges(self):
+        from app import db
+        gauges = {}
+        for bind, engine in db.engines.items():
+            pool = engine.pool
+            if not hasattr(pool, 'checkedout'):
+                continue
+            labels = {'bind': bind or 'default'}
+            gauges[series('db_pool_size', **labels)] = pool.size()
+            gauges[series('db_pool_checked_out', **labels)] = pool.checkedout()
+            gauges[series('db_pool_overflow', **labels)] = max(pool.overflow(), 0)
+        return gauges
+
+    def flush(self, force=False):
+        """Push pending deltas and pool gauges to the store if the interval has passed"""
+        interval = current_app.config.get('METRICS_FLUSH_INTERVAL', 5)
+        now = time.monotonic()
+        if not force and now - self._last_flush < interval:
+            return
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = now
+
+        try:
+            if pending:
+                self.store.add_counters(pending)
+            self.store.set_gauges(f'{socket.gethostname()}:{os.getpid()}', self._pool_gauges(), expire=3 * interval)
+        except Exception as e:
+            # Keep the deltas for the next flush rather than losing them
+            self.inc_many(pending)
+            current_app.logger.warning(f'Metrics flush failed: {e}')
+
+    def _start_timer(self):
+        g._metrics_started = time.perf_counter()
+
+    def _record_request(self, response):
+        started = g.pop('_metrics_started', None)
+        endpoint = request.endpoint or 'unmatched'
+        if started is not None and endpoint != 'metrics':
+            self.observe('http_request_duration_seconds', time.perf_counter() - started,
+                         endpoint=endpoint, method=request.method)
+            self.inc(series('http_requests_total', endpoint=endpoint, method=request.method,
+                            status=response.status_code))
+        self.flush()
+        return response
+
+    def _record_exception(self, sender, exception, **extra):
+        if isinstance(exception, PoolTimeoutError):
+            self.inc(series('db_pool_timeouts_total'))
+
+    def render(self):
+        """Exposition-format text of the aggregated metrics"""
+        self.flush(force=True)
+        counters, gauges = self.store.read()
+        values = {**counters, **gauges}
+
+        families = {}
+        for key in values:
+            families.setdefault(_family(key), []).append(key)
+
+        lines = []
+        for family in sorted(families):
+            metric_type, help_text = METRICS.get(family, ('untyped', ''))
+            lines.append(f'# HELP {family} {help_text}')
+            lines.append(f'# TYPE {family} {metric_type}')
+            for key in sorted(families[family], key=_sort_key):
+                value = values[key]
+                lines.append(f'{key} {int(value) if float(value).is_integer() else value}')
+        return '\n'.join(lines) + '\n'
+
+    def metrics_view(self):
+        # Per-endpoint and login failure counters are not public; without a token nobody may scrape
+        token = current_app.config.get('METRICS_TOKEN')
+        if not token:
+            abort(404)
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            abort(403)
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+class CacheStatsProxy:
+    """Wraps a Flask-Caching backend to count hits and misses of get/get_many"""
+
+    def __init__(self, backend, metrics):
+        self._backend = backend
+        self._metrics = metrics
+
+    def get(self, key):
+        value = self._backend.get(key)
+        self._metrics.record_cache(value is not None, value is None)
+        return value
+
+    def get_many(self, *keys):
+        values = self._backend.get_many(*keys)
+        hits = sum(value is not None for value in values)
+        self._metrics.record_cache(hits, len(values) - hits)
+        return values
+
+    def __getattr__(self, attr):
+        return getattr(self._backend, attr)
+
+def instrument_cache(app, cache, metrics):
+    """Count hits and misses of an initialized Flask-Caching instance"""
+    backends = app.extensions['cache']
+    if not isinstance(backends[cache], CacheStatsProxy):
+        backends[cache] = CacheStatsProxy(backends[cache], metrics)
+
+metrics = Metrics()
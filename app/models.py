@@ -1,9 +1,19 @@
 from datetime import datetime
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import Index, CheckConstraint, event
-from sqlalchemy.orm import validates
-from app import db, login_manager
+from sqlalchemy import Index, CheckConstraint, event, inspect, bindparam, text
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import validates, object_session
+from sqlalchemy.orm.attributes import set_committed_value
+from app import db
+from app.passwords import hash_password, verify_password, needs_rehash
+
+# Assignment statuses that count against an employee's weekly hours
+OPEN_ASSIGNMENT_STATUSES = ('not_started', 'in_progress')
+
+def _literal(value):
+    # Rendered into the SQL instead of bound: SQLite only uses a partial
+    # index when the query repeats the index's WHERE term with literal values
+    return bindparam(None, value, expanding=isinstance(value, (list, tuple)), literal_execute=True)
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -13,29 +23,32 @@ class User(UserMixin, db.Model):
     username = db.Column(db.String(80), unique=True, nullable=False, index=True)
     password_hash = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(20), default='employee', nullable=False)  # admin or employee
-    department_id = db.Column(db.Integer, nullable=False, index=True)
+    department_id = db.Column(db.Integer, nullable=False)
     team_id = db.Column(db.Integer, nullable=False, index=True)
     hours_per_week = db.Column(db.Float, default=40.0, nullable=False)
     is_active = db.Column(db.Boolean, default=True, nullable=False)
     last_login = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    # Totals over open assignments, maintained by the Assignment listeners
+    # below and checked by `flask reconcile-open-hours`
+    open_hours = db.Column(db.Float, default=0.0, server_default='0', nullable=False)
+    open_assignment_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
     
-    # Relationships with proper lazy loading and foreign key specifications
-    assignments = db.relationship('Assignment', backref='employee', lazy='dynamic', cascade='all, delete-orphan')
-    skills = db.relationship('SkillsMatrix', backref='employee', lazy='dynamic', cascade='all, delete-orphan')
+    # Relationships load on access or, in list views, eagerly through loader
+    # options (selectinload/joinedload) at the call site
+    assignments = db.relationship('Assignment', backref='employee', cascade='all, delete-orphan')
+    skills = db.relationship('SkillsMatrix', backref='employee', cascade='all, delete-orphan')
     
     # Specify foreign keys explicitly to avoid ambiguity
     vacations = db.relationship('Vacation', 
                                foreign_keys='Vacation.user_id',
                                backref='employee', 
-                               lazy='dynamic', 
                                cascade='all, delete-orphan')
     
     approved_vacations = db.relationship('Vacation', 
                                         foreign_keys='Vacation.approved_by',
-                                        backref='approver', 
-                                        lazy='dynamic')
+                                        backref='approver')
     
     # Constraints
     __table_args__ = (
@@ -63,53 +76,61 @@ class User(UserMixin, db.Model):
     def set_password(self, password):
         if len(password) < 8:
             raise ValueError('Password must be at least 8 characters long')
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        if not verify_password(self.password_hash, password):
+            return False
+        # Upgrade hashes made with outdated parameters; saved with the caller's commit
+        if needs_rehash(self.password_hash):
+            self.password_hash = hash_password(password)
+        return True
     
     @property
     def is_admin(self):
         return self.role == 'admin'
     
+    @hybrid_property
+    def available_hours(self):
+        """Weekly hours not taken by open assignments; also usable in queries"""
+        return max(0, self.hours_per_week - self.open_hours)
+    
+    @available_hours.expression
+    def available_hours(cls):
+        return cls.hours_per_week - cls.open_hours
+    
     def get_available_hours(self):
         """Calculate available hours for assignment"""
-        # Get currently assigned hours
-        assigned_hours = db.session.query(db.func.sum(Assignment.hours_remaining)).filter(
-            Assignment.user_id == self.id,
-            Assignment.status.in_(['not_started', 'in_progress'])
-        ).scalar() or 0
-        
         # Consider vacation days
         # Implementation depends on vacation calculation logic
-        return max(0, self.hours_per_week - assigned_hours)
+        return self.available_hours
     
     def __repr__(self):
         return f'<User {self.username}>'
 
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
-
 class Project(db.Model):
     __tablename__ = 'projects'
     
     id = db.Column(db.Integer, primary_key=True)
     project_number = db.Column(db.String(50), unique=True, nullable=False, index=True)
-    model_type = db.Column(db.String(20), nullable=False, index=True)  # PAH, PPH, REF, APS, PSC
+    model_type = db.Column(db.String(20), nullable=False)  # PAH, PPH, REF, APS, PSC
     customer_country = db.Column(db.String(50), nullable=False, index=True)
     difficulty_level = db.Column(db.Integer, nullable=False)  # 1-5 scale
     estimated_hours = db.Column(db.Float, nullable=False)
     assembly_start_date = db.Column(db.Date, nullable=False, index=True)
     deadline = db.Column(db.Date, nullable=False, index=True)
-    status = db.Column(db.String(20), default='unassigned', nullable=False, index=True)
+    status = db.Column(db.String(20), default='unassigned', nullable=False)
     requires_ref_first = db.Column(db.Boolean, default=False, nullable=False)
     priority = db.Column(db.String(20), default='normal', nullable=False)  # urgent, high, normal, low
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    version = db.Column(db.Integer, nullable=False, server_default='1')  # Optimistic locking counter
     
     # Relationships
-    assignments = db.relationship('Assignment', backref='project', lazy='dynamic', cascade='all, delete-orphan')
+    assignments = db.relationship('Assignment', backref='project', cascade='all, delete-orphan')
+    
+    # Concurrent updates of the same row raise StaleDataError instead of last-write-wins
+    __mapper_args__ = {'version_id_col': version}
     
     # Constraints
     __table_args__ = (
@@ -119,9 +140,12 @@ class Project(db.Model):
         CheckConstraint("model_type IN ('PAH', 'PPH', 'REF', 'APS', 'PSC')", name='valid_model_type'),
         CheckConstraint("status IN ('unassigned', 'assigned', 'in_progress', 'on_hold', 'completed', 'cancelled')", name='valid_status'),
         CheckConstraint("priority IN ('urgent', 'high', 'normal', 'low')", name='valid_priority'),
-        Index('idx_project_status_deadline', 'status', 'deadline'),
         Index('idx_project_model_country', 'model_type', 'customer_country'),
         Index('idx_project_priority_status', 'priority', 'status'),
+        # Unassigned projects by deadline; the assignment queue
+        Index('idx_project_unassigned_deadline', 'deadline',
+              postgresql_where=text("status = 'unassigned'"),
+              sqlite_where=text("status = 'unassigned'")),
     )
     
     @validates('project_number')
@@ -134,6 +158,14 @@ class Project(db.Model):
     def validate_customer_country(self, key, country):
         return country.upper()
     
+    @hybrid_property
+    def is_unassigned(self):
+        return self.status == 'unassigned'
+    
+    @is_unassigned.expression
+    def is_unassigned(cls):
+        return cls.status == _literal('unassigned')
+    
     @property
     def is_overdue(self):
         return self.deadline < datetime.now().date() and self.status not in ['completed', 'cancelled']
@@ -149,25 +181,34 @@ class Assignment(db.Model):
     __tablename__ = 'assignments'
     
     id = db.Column(db.Integer, primary_key=True)
-    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False, index=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
-    status = db.Column(db.String(20), default='not_started', nullable=False, index=True)
-    hours_remaining = db.Column(db.Float, nullable=False)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
+    # Previous values are loaded before being replaced, so the open hours
+    # listeners can always tell what an update took away
+    user_id = db.column_property(db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True), active_history=True)
+    status = db.column_property(db.Column(db.String(20), default='not_started', nullable=False), active_history=True)
+    hours_remaining = db.column_property(db.Column(db.Float, nullable=False), active_history=True)
     original_hours = db.Column(db.Float, nullable=False)  # Track original estimate
     hold_reason = db.Column(db.String(100))
     assigned_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     started_at = db.Column(db.DateTime)
     completed_at = db.Column(db.DateTime)
     last_status_change = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    version = db.Column(db.Integer, nullable=False, server_default='1')  # Optimistic locking counter
+    
+    __mapper_args__ = {'version_id_col': version}
     
     # Constraints
     __table_args__ = (
         CheckConstraint('hours_remaining >= 0', name='non_negative_hours'),
         CheckConstraint('original_hours > 0', name='positive_original_hours'),
         CheckConstraint("status IN ('not_started', 'in_progress', 'on_hold', 'completed', 'cancelled')", name='valid_assignment_status'),
-        Index('idx_assignment_status_user', 'status', 'user_id'),
         Index('idx_assignment_project_status', 'project_id', 'status'),
         db.UniqueConstraint('project_id', 'user_id', name='unique_project_assignment'),
+        # Open hours per employee without touching the table on PostgreSQL
+        Index('idx_assignment_open_user', 'user_id',
+              postgresql_include=['hours_remaining'],
+              postgresql_where=text("status IN ('not_started', 'in_progress')"),
+              sqlite_where=text("status IN ('not_started', 'in_progress')")),
     )
     
     @validates('hours_remaining')
@@ -176,6 +217,14 @@ class Assignment(db.Model):
             raise ValueError('Hours remaining cannot be negative')
         return hours
     
+    @hybrid_property
+    def is_open(self):
+        return self.status in OPEN_ASSIGNMENT_STATUSES
+    
+    @is_open.expression
+    def is_open(cls):
+        return cls.status.in_(_literal(list(OPEN_ASSIGNMENT_STATUSES)))
+    
     @property
     def progress_percentage(self):
         if self.original_hours == 0:
@@ -189,9 +238,9 @@ class SkillsMatrix(db.Model):
     __tablename__ = 'skills_matrix'
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
-    machine_type = db.Column(db.String(20), nullable=False, index=True)  # PAH, PPH, REF
-    skill_level = db.Column(db.String(20), nullable=False, index=True)  # primary, secondary
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    machine_type = db.Column(db.String(20), nullable=False)  # PAH, PPH, REF
+    skill_level = db.Column(db.String(20), nullable=False)  # primary, secondary
     efficiency_factor = db.Column(db.Float, default=1.0, nullable=False)
     years_experience = db.Column(db.Integer, default=0, nullable=False)
     last_updated = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -203,7 +252,6 @@ class SkillsMatrix(db.Model):
         CheckConstraint("machine_type IN ('PAH', 'PPH', 'REF')", name='valid_machine_type'),
         CheckConstraint("skill_level IN ('primary', 'secondary')", name='valid_skill_level'),
         Index('idx_skills_machine_level', 'machine_type', 'skill_level'),
-        Index('idx_skills_user_machine', 'user_id', 'machine_type'),
         db.UniqueConstraint('user_id', 'machine_type', name='unique_user_skill'),
     )
     
@@ -214,8 +262,8 @@ class Vacation(db.Model):
     __tablename__ = 'vacations'
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
-    start_date = db.Column(db.Date, nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    start_date = db.Column(db.Date, nullable=False)
     end_date = db.Column(db.Date, nullable=False, index=True)
     approved = db.Column(db.Boolean, default=False, nullable=False)
     vacation_type = db.Column(db.String(20), default='annual', nullable=False)  # annual, sick, personal
@@ -237,6 +285,42 @@ class Vacation(db.Model):
     def __repr__(self):
         return f'<Vacation {self.id}: User {self.user_id} ({self.start_date} - {self.end_date})>'
 
+class AuditLog(db.Model):
+    __tablename__ = 'audit_log'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)  # Acting user, if known
+    action = db.Column(db.String(50), nullable=False)
+    target_type = db.Column(db.String(30))
+    target_id = db.Column(db.Integer)
+    details = db.Column(db.JSON)
+    ip_address = db.Column(db.String(45))
+    request_id = db.Column(db.String(64))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Queries filter by user and/or action over a time range, newest first
+    __table_args__ = (
+        Index('idx_audit_user_created', 'user_id', 'created_at'),
+        Index('idx_audit_action_created', 'action', 'created_at'),
+        Index('idx_audit_created', 'created_at'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'action': self.action,
+            'target_type': self.target_type,
+            'target_id': self.target_id,
+            'details': self.details,
+            'ip_address': self.ip_address,
+            'request_id': self.request_id,
+            'created_at': self.created_at.isoformat(),
+        }
+    
+    def __repr__(self):
+        return f'<AuditLog {self.id}: {self.action} by {self.user_id}>'
+
 # Event listeners for automatic updates
 @event.listens_for(Assignment, 'before_update')
 def update_assignment_timestamp(mapper, connection, target):
@@ -251,4 +335,56 @@ def update_assignment_status_timestamps(mapper, connection, target):
 
 @event.listens_for(SkillsMatrix, 'before_update')
 def update_skills_timestamp(mapper, connection, target):
-    target.last_updated = datetime.utcnow() 
\ No newline at end of file
+    target.last_updated = datetime.utcnow()
+
+def _open_load(status, hours):
+    """(hours, count) an assignment in this state adds to its employee's totals"""
+    if status in OPEN_ASSIGNMENT_STATUSES:
+        return hours or 0, 1
+    return 0, 0
+
+def _previous_value(target, key):
+    history = inspect(target).attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(target, key)
+
+def _adjust_open_hours(connection, target, user_id, hours, count):
+    """Shift an employee's open totals in the flushing transaction"""
+    if user_id is None or not (hours or count):
+        return
+    users = User.__table__
+    connection.execute(
+        users.update().where(users.c.id == user_id).values(
+            open_hours=users.c.open_hours + hours,
+            open_assignment_count=users.c.open_assignment_count + count,
+            updated_at=users.c.updated_at,  # Bookkeeping, not a profile change
+        )
+    )
+    # Keep a loaded copy of the employee in step without refreshing it
+    session = object_session(target)
+    user = session.identity_map.get(session.identity_key(User, user_id)) if session else None
+    if user is not None:
+        for key, delta in (('open_hours', hours), ('open_assignment_count', count)):
+            if key in user.__dict__:
+                set_committed_value(user, key, user.__dict__[key] + delta)
+
+@event.listens_for(Assignment, 'after_insert')
+def add_open_hours(mapper, connection, target):
+    _adjust_open_hours(connection, target, target.user_id, *_open_load(target.status, target.hours_remaining))
+
+@event.listens_for(Assignment, 'after_delete')
+def remove_open_hours(mapper, connection, target):
+    hours, count = _open_load(_previous_value(target, 'status'), _previous_value(target, 'hours_remaining'))
+    _adjust_open_hours(connection, target, _previous_value(target, 'user_id'), -hours, -count)
+
+@event.listens_for(Assignment, 'after_update')
+def move_open_hours(mapper, connection, target):
+    previous_user_id = _previous_value(target, 'user_id')
+    previous_hours, previous_count = _open_load(_previous_value(target, 'status'), _previous_value(target, 'hours_remaining'))
+    hours, count = _open_load(target.status, target.hours_remaining)
+    if previous_user_id == target.user_id:
+        _adjust_open_hours(connection, target, target.user_id, hours - previous_hours, count - previous_count)
+    else:
+        _adjust_open_hours(connection, target, previous_user_id, -previous_hours, -previous_count)
+        _adjust_open_hours(connection, target, target.user_id, hours, count)
@@ -0,0 +1,79 @@
+"""
+Open hours reconciliation for the Manufacturing Workload Management App
+
+users.open_hours and users.open_assignment_count are denormalized totals
+over each employee's open assignments, kept in step by ORM listeners in
+app.models. Writes that bypass the ORM (Core bulk inserts, manual SQL,
+restores) can make them drift; reconcile_open_hours() recomputes the totals
+from the assignments table and repairs the users that disagree. Run it
+periodically with `flask reconcile-open-hours`.
+"""
+
+from flask import current_app
+from sqlalchemy import func, select, update
+from app import db
+from app.models import User, Assignment
+
+# Float sums of the same hours in a different order differ in the last bits
+HOURS_TOLERANCE = 0.001
+
+REPAIR_BATCH_SIZE = 500
+
+def open_hours_drift():
+    """Users whose stored totals disagree with their open assignments"""
+    actual = select(
+        Assignment.user_id,
+        func.sum(Assignment.hours_remaining).label('hours'),
+        func.count(Assignment.id).label('count')
+    ).where(
+        Assignment.is_open
+    ).group_by(Assignment.user_id).subquery()
+
+    rows = db.session.execute(
+        select(
+            User.id,
+            User.open_hours,
+            User.open_assignment_count,
+            func.coalesce(actual.c.hours, 0),
+            func.coalesce(actual.c.count, 0)
+        ).outerjoin(actual, actual.c.user_id == User.id)
+    )
+
+    drift = []
+    for user_id, stored_hours, stored_count, actual_hours, actual_count in rows:
+        if abs(stored_hours - actual_hours) > HOURS_TOLERANCE or stored_count != actual_count:
+            drift.append({
+                'user_id': user_id,
+                'stored_hours': stored_hours,
+                'actual_hours': actual_hours,
+                'stored_count': stored_count,
+                'actual_count': actual_count,
+            })
+    return drift
+
+def recount_open_hours(user_ids):
+    """Recompute the open totals of some users in the current transaction"""
+    users = User.__table__
+    # Lock first: once held, every assignment change committed before is
+    # visible and every later one waits, so the recount cannot lose a delta
+    db.session.execute(select(users.c.id).where(users.c.id.in_(user_ids)).with_for_update())
+
+    open_assignments = (Assignment.user_id == users.c.id, Assignment.is_open)
+    db.session.execute(
+        update(users).where(users.c.id.in_(user_ids)).values(
+            open_hours=select(func.coalesce(func.sum(Assignment.hours_remaining), 0)).where(*open_assignments).scalar_subquery(),
+            open_assignment_count=select(func.count(Assignment.id)).where(*open_assignments).scalar_subquery(),
+            updated_at=users.c.updated_at,
+        )
+    )
+
+def reconcile_open_hours(repair=True):
+    """Find drifted open totals and, unless repair is False, recompute them; returns the drift"""
+    drift = open_hours_drift()
+    if drift and repair:
+        user_ids = [entry['user_id'] for entry in drift]
+        for start in range(0, len(user_ids), REPAIR_BATCH_SIZE):
+            recount_open_hours(user_ids[start:start + REPAIR_BATCH_SIZE])
+            db.session.commit()
+        current_app.logger.warning(f'Repaired open hours of {len(drift)} users')
+    return drift
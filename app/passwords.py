@@ -0,0 +1,79 @@
+"""
+Password hashing service for the Manufacturing Workload Management App
+
+Hashing runs in a bounded thread pool, one per process, so a burst of
+logins queues for a fixed number of hashing slots. Under gunicorn's
+threaded workers every request thread could otherwise hash at once, and
+each scrypt hash at the default cost holds 32 MiB and a full core; the
+pool caps that at PASSWORD_HASH_WORKERS per process whatever --threads is.
+hashlib's scrypt and pbkdf2 release the GIL, so pool threads hash in
+parallel. A caller waits at most PASSWORD_HASH_TIMEOUT seconds for a slot
+and its result, then gets PasswordHashingBusy.
+
+The algorithm and cost come from the app config, and hashes made with
+older parameters are flagged for rehashing on the next login.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+DEFAULT_SALT_LENGTH = 16
+
+class PasswordHashingBusy(Exception):
+    """No hashing slot freed up, or the hash did not finish, within the timeout"""
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    """Pool for this process; created lazily so preloaded apps fork cleanly"""
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(
+                    max_workers=current_app.config.get('PASSWORD_HASH_WORKERS', 4),
+                    thread_name_prefix='password-hash'
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+def _run(func, *args):
+    timeout = current_app.config.get('PASSWORD_HASH_TIMEOUT', 10)
+    future = _get_executor().submit(func, *args)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        # Free the slot if the hash never started; a running one can't be stopped
+        future.cancel()
+        current_app.logger.warning(f'Password hashing timed out after {timeout}s; the hashing pool is saturated')
+        raise PasswordHashingBusy(f'Password hashing did not finish within {timeout}s') from None
+
+def _hash_settings():
+    return (
+        current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD),
+        current_app.config.get('PASSWORD_HASH_SALT_LENGTH', DEFAULT_SALT_LENGTH)
+    )
+
+def hash_password(password):
+    """Hash a password with the configured algorithm and cost"""
+    method, salt_length = _hash_settings()
+    return _run(generate_password_hash, password, method, salt_length)
+
+def verify_password(password_hash, password):
+    """Check a password against a stored hash"""
+    return _run(check_password_hash, password_hash, password)
+
+def needs_rehash(password_hash):
+    """Whether a stored hash was made with other than the configured parameters"""
+    method, salt_length = _hash_settings()
+    try:
+        stored_method, salt, _ = password_hash.split('$', 2)
+    except ValueError:
+        return True
+    return stored_method != method or len(salt) != salt_length
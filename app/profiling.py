@@ -0,0 +1,189 @@
+"""
+Request profiler for the Manufacturing Workload Management App
+
+Opt-in cProfile capture for a sampled share of requests
+(PROFILER_SAMPLE_RATE) or for admin requests sending the PROFILER_HEADER
+header. Profiles are kept in an in-memory ring buffer, or as .prof files in
+a directory shared by the workers, and listed under /admin/profiles.
+Requests that are not profiled only pay for a random() call and a header
+lookup.
+"""
+
+import cProfile
+import io
+import json
+import marshal
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from flask import current_app, g, request
+from flask_login import current_user
+
+class MemoryProfileStore:
+    """Ring buffer of the most recent profiles in this process"""
+
+    def __init__(self, size):
+        self._lock = threading.Lock()
+        self._size = size
+        self._profiles = OrderedDict()
+
+    def save(self, meta, raw):
+        with self._lock:
+            self._profiles[meta['id']] = (meta, raw)
+            while len(self._profiles) > self._size:
+                self._profiles.popitem(last=False)
+
+    def list(self):
+        with self._lock:
+            return [meta for meta, _ in reversed(self._profiles.values())]
+
+    def get(self, profile_id):
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+class FileProfileStore:
+    """Profiles written to a directory, keeping the newest `size` of them"""
+
+    def __init__(self, directory, size):
+        self._directory = directory
+        self._size = size
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, profile_id, extension):
+        return os.path.join(self._directory, f'{profile_id}.{extension}')
+
+    def save(self, meta, raw):
+        with open(self._path(meta['id'], 'prof'), 'wb') as prof_file:
+            prof_file.write(raw)
+        with open(self._path(meta['id'], 'json'), 'w') as meta_file:
+            json.dump(meta, meta_file)
+
+        for meta in self.list()[self._size:]:
+            for extension in ('json', 'prof'):
+                try:
+                    os.remove(self._path(meta['id'], extension))
+                except FileNotFoundError:
+                    pass
+
+    def list(self):
+        profiles = []
+        for name in os.listdir(self._directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self._directory, name)) as meta_file:
+                    profiles.append(json.load(meta_file))
+            except (OSError, ValueError):
+                continue
+        return sorted(profiles, key=lambda meta: meta['timestamp'], reverse=True)
+
+    def get(self, profile_id):
+        if not profile_id.isalnum():
+            return None
+        try:
+            with open(self._path(profile_id, 'json')) as meta_file:
+                meta = json.load(meta_file)
+            with open(self._path(profile_id, 'prof'), 'rb') as prof_file:
+                return meta, prof_file.read()
+        except FileNotFoundError:
+            return None
+
+def profile_summary(raw, sort='cumulative', limit=40):
+    """pstats text report of a stored profile"""
+    stats = pstats.Stats()
+    stats.stats = marshal.loads(raw)
+    stats.get_top_level_stats()
+    output = io.StringIO()
+    stats.stream = output
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return output.getvalue()
+
+class RequestProfiler:
+    """Flask extension capturing cProfile profiles of selected requests"""
+
+    def __init__(self, app=None):
+        # cProfile cannot run in two threads of one process at once on every
+        # Python version, so one request per process is profiled at a time
+        self._busy = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        storage_url = app.config.get('PROFILER_STORAGE_URL', 'memory://')
+        size = app.config.get('PROFILER_BUFFER_SIZE', 20)
+        if storage_url.startswith('memory://'):
+            store = MemoryProfileStore(size)
+        elif storage_url.startswith('file://'):
+            store = FileProfileStore(storage_url[len('file://'):], size)
+        else:
+            raise ValueError(f'Unsupported PROFILER_STORAGE_URL: {storage_url}')
+        app.extensions['request_profiler'] = store
+
+        app.before_request(self._start)
+        app.teardown_request(self._discard)
+        app.after_request(self._finish)
+
+    @property
+    def store(self):
+        return current_app.extensions['request_profiler']
+
+    def _reason(self):
+        """Why this request should be profiled, or None"""
+        config = current_app.config
+        header = config.get('PROFILER_HEADER', 'X-Profile')
+        if header in request.headers and current_user.is_authenticated and current_user.is_admin:
+            return 'header'
+        sample_rate = config.get('PROFILER_SAMPLE_RATE', 0.0)
+        if sample_rate and request.endpoint != 'static' and random.random() < sample_rate:
+            return 'sample'
+        return None
+
+    def _start(self):
+        reason = self._reason()
+        if reason is None or not self._busy.acquire(blocking=False):
+            return
+        profiler = cProfile.Profile()
+        g._profile = (profiler, reason, time.perf_counter())
+        profiler.enable()
+
+    def _finish(self, response):
+        profile = g.pop('_profile', None)
+        if profile is None:
+            return response
+        profiler, reason, started = profile
+        try:
+            profiler.disable()
+            duration_ms = (time.perf_counter() - started) * 1000
+
+            stats = pstats.Stats(profiler)
+            meta = {
+                'id': uuid.uuid4().hex[:16],
+                'timestamp': datetime.utcnow().isoformat(),
+                'endpoint': request.endpoint,
+                'method': request.method,
+                'path': request.full_path.rstrip('?'),
+                'status': response.status_code,
+                'duration_ms': round(duration_ms, 1),
+                'reason': reason,
+                'user_id': current_user.get_id() if current_user.is_authenticated else None,
+                'pid': os.getpid(),
+            }
+            self.store.save(meta, marshal.dumps(stats.stats))
+            response.headers['X-Profile-Id'] = meta['id']
+        finally:
+            self._busy.release()
+        return response
+
+    def _discard(self, exc):
+        # The request failed before after_request; drop its profile
+        profile = g.pop('_profile', None)
+        if profile is not None:
+            profile[0].disable()
+            self._busy.release()
+
+request_profiler = RequestProfiler()
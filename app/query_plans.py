@@ -0,0 +1,86 @@
+"""
+Query plan checks for the Manufacturing Workload Management App
+
+The hot queries are written against partial indexes: open assignments
+(idx_assignment_open_user) and unassigned projects by deadline
+(idx_project_unassigned_deadline). check_query_plans() EXPLAINs each of
+them on the configured database and reports any whose plan does not use
+its index, e.g. after a schema change or a rewrite of the filter that no
+longer implies the index's WHERE clause.
+
+PostgreSQL prefers sequential scans on small tables whatever the indexes,
+so sequential scans are disabled for the check: it verifies the index is
+usable, not that the planner picks it at the current table size.
+"""
+
+import json
+from sqlalchemy import func, select, text
+from app import db
+from app.models import Assignment, Project
+
+def hot_queries():
+    """Name -> (statement, index it must use)"""
+    return {
+        'open_hours_by_user': (
+            select(Assignment.user_id, func.sum(Assignment.hours_remaining))
+            .where(Assignment.is_open)
+            .group_by(Assignment.user_id),
+            'idx_assignment_open_user'
+        ),
+        'open_hours_of_user': (
+            select(func.sum(Assignment.hours_remaining))
+            .where(Assignment.user_id == 1, Assignment.is_open),
+            'idx_assignment_open_user'
+        ),
+        'unassigned_by_deadline': (
+            select(Project.id, Project.project_number)
+            .where(Project.is_unassigned)
+            .order_by(Project.deadline)
+            .limit(5),
+            'idx_project_unassigned_deadline'
+        ),
+    }
+
+def _postgresql_indexes(plan):
+    indexes = set()
+    if 'Index Name' in plan:
+        indexes.add(plan['Index Name'])
+    for child in plan.get('Plans', []):
+        indexes |= _postgresql_indexes(child)
+    return indexes
+
+def explain(statement):
+    """(plan text, index names used) for a statement on the current database
+
+    Raises ValueError on databases other than PostgreSQL and SQLite.
+    """
+    dialect = db.engine.dialect
+    # Values are rendered inline, as the partial index filters already are
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+
+    if dialect.name == 'postgresql':
+        with db.engine.connect() as connection:
+            with connection.begin():
+                connection.execute(text('SET LOCAL enable_seqscan = off'))
+                raw = connection.execute(text(f'EXPLAIN (FORMAT JSON) {sql}')).scalar()
+        plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]['Plan']
+        return json.dumps(plan, indent=2), _postgresql_indexes(plan)
+
+    if dialect.name == 'sqlite':
+        with db.engine.connect() as connection:
+            rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}').all()
+        details = [row[-1] for row in rows]
+        indexes = {detail.split(' INDEX ', 1)[1].split(' ', 1)[0] for detail in details if ' INDEX ' in detail}
+        return '\n'.join(details), indexes
+
+    raise ValueError(f'Query plan checks support PostgreSQL and SQLite; the configured database is {dialect.name}')
+
+def check_query_plans():
+    """EXPLAIN every hot query; returns (results, failures)"""
+    results, failures = {}, []
+    for name, (statement, index) in hot_queries().items():
+        plan, indexes = explain(statement)
+        results[name] = {'index': index, 'uses_index': index in indexes, 'indexes': sorted(indexes), 'plan': plan}
+        if index not in indexes:
+            failures.append(name)
+    return results, failures
@@ -1,10 +1,16 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, abort, Response
 from flask_login import login_required, current_user
 from functools import wraps
 from app import db
 from app.models import User, Project, Assignment, SkillsMatrix, Vacation
+from app.eligibility import eligible_team_clause, is_team_eligible
+from app.profiling import request_profiler, profile_summary
+from app.audit import audit_trail
+from app.capacity import reserve_assignment, ReservationError
 from datetime import datetime, date, timedelta
-from sqlalchemy import and_, or_, func
+from sqlalchemy import and_, or_, func, select
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.exc import StaleDataError
 
 bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -24,7 +30,7 @@ def dashboard():
     """Admin dashboard with key statistics and team workload"""
     # Get dashboard statistics
     total_projects = Project.query.count()
-    unassigned_projects = Project.query.filter_by(status='unassigned').count()
+    unassigned_projects = Project.query.filter(Project.is_unassigned).count()
     
     # Calculate at-risk projects (past deadline and not completed)
     at_risk_projects = Project.query.filter(
@@ -45,7 +51,7 @@ def dashboard():
         func.count(User.id).label('team_size')
     ).outerjoin(Assignment, and_(
         Assignment.user_id == User.id,
-        Assignment.status.in_(['not_started', 'in_progress'])
+        Assignment.is_open
     )).group_by(User.team_id).all()
     
     # Get recent activity (last 10 assignments)
@@ -55,8 +61,8 @@ def dashboard():
         User, Assignment.user_id == User.id
     ).order_by(Assignment.last_status_change.desc()).limit(10).all()
     
-    # Get projects needing assignment
-    unassigned_projects_list = Project.query.filter_by(status='unassigned').limit(5).all()
+    # Get projects needing assignment, most urgent deadline first
+    unassigned_projects_list = Project.query.filter(Project.is_unassigned).order_by(Project.deadline).limit(5).all()
     
     # Get projects at risk
     at_risk_projects_list = Project.query.filter(
@@ -82,8 +88,11 @@ def projects():
     status_filter = request.args.get('status', 'all')
     sort_by = request.args.get('sort', 'deadline')
     
-    # Base query
-    query = Project.query
+    # Base query; assignments and their employees come in two extra queries
+    # however many projects are listed
+    query = Project.query.options(
+        selectinload(Project.assignments).joinedload(Assignment.employee)
+    )
     
     # Apply status filter
     if status_filter != 'all':
@@ -102,10 +111,10 @@ def projects():
     # Get assignment info for each project
     project_assignments = {}
     for project in projects:
-        assignment = Assignment.query.filter_by(project_id=project.id).first()
-        if assignment:
+        if project.assignments:
+            assignment = project.assignments[0]
             project_assignments[project.id] = {
-                'employee': User.query.get(assignment.user_id),
+                'employee': assignment.employee,
                 'status': assignment.status,
                 'hours_remaining': assignment.hours_remaining
             }
@@ -141,26 +150,20 @@ def assign_project_submit():
     project = Project.query.get_or_404(project_id)
     employee = User.query.get_or_404(employee_id)
     
-    # Check if project is already assigned
-    existing_assignment = Assignment.query.filter_by(project_id=project_id).first()
-    if existing_assignment:
-        flash('This project is already assigned to someone else.', 'danger')
+    # Locks the project and employee, so concurrent assignments cannot
+    # double book either of them
+    try:
+        reserve_assignment(project_id, [employee_id], skip_locked=False)
+        db.session.commit()
+    except ReservationError as e:
+        db.session.rollback()
+        flash(str(e), 'danger')
+        return redirect(url_for('admin.projects'))
+    except StaleDataError:
+        # Another admin changed the project between our read and this write
+        db.session.rollback()
+        flash('This project was changed by someone else meanwhile. Please review it and try again.', 'warning')
         return redirect(url_for('admin.projects'))
-    
-    # Create assignment
-    assignment = Assignment(
-        project_id=project_id,
-        user_id=employee_id,
-        status='not_started',
-        hours_remaining=project.estimated_hours,
-        assigned_at=datetime.utcnow()
-    )
-    
-    # Update project status
-    project.status = 'assigned'
-    
-    db.session.add(assignment)
-    db.session.commit()
     
     flash(f'Project {project.project_number} assigned to {employee.username}', 'success')
     return redirect(url_for('admin.projects'))
@@ -170,16 +173,18 @@ def assign_project_submit():
 @admin_required
 def employees():
     """View all employees with their current workload"""
-    employees = User.query.filter_by(role='employee').all()
+    # Open assignments (with their projects) are loaded for all employees at
+    # once; the collection holds only the open ones on this page
+    employees = User.query.filter_by(role='employee').options(
+        selectinload(
+            User.assignments.and_(Assignment.is_open)
+        ).joinedload(Assignment.project)
+    ).all()
     
     # Get workload for each employee
     employee_workload = {}
     for employee in employees:
-        active_assignments = Assignment.query.filter_by(
-            user_id=employee.id
-        ).filter(
-            Assignment.status.in_(['not_started', 'in_progress'])
-        ).all()
+        active_assignments = employee.assignments
         
         total_hours = sum(a.hours_remaining or 0 for a in active_assignments)
         employee_workload[employee.id] = {
@@ -228,52 +233,98 @@ def reports():
                          behind_schedule=behind_schedule,
                          weekly_completions=weekly_completions)
 
+@bp.route('/profiles')
+@login_required
+@admin_required
+def profiles():
+    """Recently captured request profiles"""
+    return jsonify({'profiles': request_profiler.store.list()})
+
+@bp.route('/profiles/<profile_id>')
+@login_required
+@admin_required
+def profile_detail(profile_id):
+    """Text report of one profile; ?format=prof downloads it for snakeviz/pstats"""
+    profile = request_profiler.store.get(profile_id)
+    if profile is None:
+        abort(404)
+    meta, raw = profile
+
+    if request.args.get('format') == 'prof':
+        return Response(raw, mimetype='application/octet-stream', headers={
+            'Content-Disposition': f'attachment; filename={profile_id}.prof'
+        })
+
+    sort = request.args.get('sort', 'cumulative')
+    if sort not in ('cumulative', 'tottime', 'calls'):
+        sort = 'cumulative'
+    header = f"{meta['method']} {meta['path']} -> {meta['status']} in {meta['duration_ms']} ms ({meta['reason']})\n\n"
+    return Response(header + profile_summary(raw, sort=sort), mimetype='text/plain')
+
+@bp.route('/audit')
+@login_required
+@admin_required
+def audit():
+    """Audit trail filtered by user, action, target and time range (ISO dates)"""
+    def parse_time(value):
+        return datetime.fromisoformat(value) if value else None
+    
+    try:
+        start = parse_time(request.args.get('start'))
+        end = parse_time(request.args.get('end'))
+    except ValueError:
+        return jsonify({'error': 'start and end must be ISO dates or timestamps'}), 400
+    
+    records = audit_trail(
+        user_id=request.args.get('user_id', type=int),
+        start=start,
+        end=end,
+        action=request.args.get('action'),
+        target_type=request.args.get('target_type'),
+        target_id=request.args.get('target_id', type=int),
+        limit=min(request.args.get('limit', 100, type=int), 1000)
+    )
+    return jsonify({'records': [record.to_dict() for record in records]})
+
 def get_suitable_employees(project):
     """Find employees suitable for a project based on skills and availability"""
-    # Get employees with matching skills
-    suitable_skills = SkillsMatrix.query.filter_by(
-        machine_type=project.model_type
+    # Get eligible employees with matching skills; team geography constraints
+    # are applied in the query itself
+    suitable_skills = db.session.query(SkillsMatrix, User).join(
+        User, SkillsMatrix.user_id == User.id
+    ).filter(
+        SkillsMatrix.machine_type == project.model_type,
+        User.role == 'employee',
+        eligible_team_clause(User.team_id, project.model_type, project.customer_country)
     ).all()
     
-    suitable_employees = []
-    
-    for skill in suitable_skills:
-        employee = User.query.get(skill.user_id)
-        if not employee or employee.role != 'employee':
-            continue
-            
-        # Check if employee is on vacation
-        is_on_vacation = Vacation.query.filter(
-            Vacation.user_id == employee.id,
+    # Employees on approved vacation today, in one query
+    on_vacation = set(db.session.scalars(
+        select(Vacation.user_id).where(
+            Vacation.user_id.in_({employee.id for _, employee in suitable_skills}),
             Vacation.start_date <= date.today(),
             Vacation.end_date >= date.today(),
             Vacation.approved == True
-        ).first() is not None
+        )
+    )) if suitable_skills else set()
+    
+    suitable_employees = []
+    
+    for skill, employee in suitable_skills:
+        # Check if employee is on vacation
+        is_on_vacation = employee.id in on_vacation
         
         if is_on_vacation:
             continue
             
-        # Calculate current workload
-        current_hours = db.session.query(
-            func.sum(Assignment.hours_remaining)
-        ).filter_by(
-            user_id=employee.id
-        ).filter(
-            Assignment.status.in_(['not_started', 'in_progress'])
-        ).scalar() or 0
-        
-        # Check team geography constraints
-        can_work_on_project = check_team_geography_constraints(employee, project)
-        
-        if can_work_on_project:
-            suitable_employees.append({
-                'employee': employee,
-                'skill_level': skill.skill_level,
-                'efficiency_factor': skill.efficiency_factor,
-                'current_workload': current_hours,
-                'available_hours': max(0, employee.hours_per_week - current_hours),
-                'is_on_vacation': is_on_vacation
-            })
+        suitable_employees.append({
+            'employee': employee,
+            'skill_level': skill.skill_level,
+            'efficiency_factor': skill.efficiency_factor,
+            'current_workload': employee.open_hours,
+            'available_hours': employee.available_hours,
+            'is_on_vacation': is_on_vacation
+        })
     
     # Sort by skill level (primary first) and then by availability
     suitable_employees.sort(key=lambda x: (
@@ -285,31 +336,4 @@ def get_suitable_employees(project):
 
 def check_team_geography_constraints(employee, project):
     """Check if employee's team can work on this project based on geography constraints"""
-    # Team constraints based on the business rules
-    team_constraints = {
-        1: {'models': ['PAH'], 'countries': 'all'},  # PAH for all countries
-        2: {'models': ['PPH'], 'countries': ['USA']},  # PPH for USA only
-        3: {'models': ['PPH'], 'countries': 'non_USA'},  # PPH for non-USA
-        4: {'models': ['REF'], 'countries': ['USA']},  # REF for USA only
-        5: {'models': ['REF'], 'countries': 'non_USA'},  # REF for non-USA
-    }
-    
-    team_id = employee.team_id
-    if team_id not in team_constraints:
-        return False
-        
-    constraint = team_constraints[team_id]
-    
-    # Check model type
-    if project.model_type not in constraint['models']:
-        return False
-        
-    # Check geography
-    if constraint['countries'] == 'all':
-        return True
-    elif constraint['countries'] == 'non_USA':
-        return project.customer_country != 'USA'
-    elif isinstance(constraint['countries'], list):
-        return project.customer_country in constraint['countries']
-    
-    return False 
\ No newline at end of file
+    return is_team_eligible(employee.team_id, project.model_type, project.customer_country)
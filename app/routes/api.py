@@ -1,15 +1,28 @@
-from flask import Blueprint, jsonify, request, flash, current_app
+from flask import Blueprint, jsonify, request, flash, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
 from app import db
 from app.models import Project, Assignment, User, SkillsMatrix, Vacation
+from app.live import live_updates, user_channel, format_sse, ADMIN_CHANNEL
+from app.etags import conditional_get, PROJECTS_SCOPE
+from app.lazy_imports import lazy_import
+from app.metrics import metrics
+from app.concurrency import run_with_retry
+from app.capacity import reserve_assignment, ReservationError
+from app.utils import ASSIGNMENT_STATUSES, apply_status_change
 from datetime import datetime, timedelta, date
-import pandas as pd
+from sqlalchemy.orm.exc import StaleDataError
 import json
 from werkzeug.utils import secure_filename
 import os
+import time
+
+# pandas is only needed by the import endpoints; load it on first use
+pd = lazy_import('pandas')
 
 bp = Blueprint('api', __name__, url_prefix='/api')
 
+HOLD_REASON_LENGTH = Assignment.hold_reason.type.length
+
 @bp.route('/import-projects', methods=['POST'])
 @login_required
 def import_projects():
@@ -25,6 +38,7 @@ def import_projects():
         return jsonify({'error': 'No file selected'}), 400
     
     if file and allowed_file(file.filename):
+        started = time.perf_counter()
         try:
             # Read the file based on extension
             if file.filename.endswith('.csv'):
@@ -87,6 +101,7 @@ def import_projects():
                     continue
             
             db.session.commit()
+            metrics.record_import('projects', imported_count, len(errors), time.perf_counter() - started)
             
             return jsonify({
                 'success': True,
@@ -154,6 +169,7 @@ def import_skills():
         return jsonify({'error': 'No file selected'}), 400
     
     if file and allowed_file(file.filename):
+        started = time.perf_counter()
         try:
             # Read the file
             if file.filename.endswith('.csv'):
@@ -207,6 +223,7 @@ def import_skills():
                     continue
             
             db.session.commit()
+            metrics.record_import('skills', imported_count, len(errors), time.perf_counter() - started)
             
             return jsonify({
                 'success': True,
@@ -235,6 +252,7 @@ def import_vacations():
         return jsonify({'error': 'No file selected'}), 400
     
     if file and allowed_file(file.filename):
+        started = time.perf_counter()
         try:
             # Read the file
             if file.filename.endswith('.csv'):
@@ -277,6 +295,7 @@ def import_vacations():
                     continue
             
             db.session.commit()
+            metrics.record_import('vacations', imported_count, len(errors), time.perf_counter() - started)
             
             return jsonify({
                 'success': True,
@@ -292,6 +311,7 @@ def import_vacations():
 
 @bp.route('/dashboard-stats')
 @login_required
+@conditional_get(PROJECTS_SCOPE, daily=True)
 def dashboard_stats():
     """Get real-time dashboard statistics"""
     if not current_user.is_admin:
@@ -299,7 +319,7 @@ def dashboard_stats():
     
     # Calculate statistics
     total_projects = Project.query.count()
-    unassigned_projects = Project.query.filter_by(status='unassigned').count()
+    unassigned_projects = Project.query.filter(Project.is_unassigned).count()
     at_risk_projects = Project.query.filter(
         Project.deadline < date.today(),
         Project.status != 'completed'
@@ -316,6 +336,54 @@ def dashboard_stats():
         'last_updated': datetime.utcnow().isoformat()
     })
 
+@bp.route('/events')
+@login_required
+def events():
+    """Stream assignment and dashboard statistic changes as Server-Sent Events"""
+    channels = [user_channel(current_user.id)]
+    if current_user.is_admin:
+        channels.append(ADMIN_CHANNEL)
+    
+    if not live_updates.acquire_stream():
+        # Every stream slot in this worker is taken; the page keeps working without live updates
+        retry = current_app.config.get('LIVE_STREAMS_FULL_RETRY', 30)
+        return Response(f'retry: {retry * 1000}\n\n', status=503, mimetype='text/event-stream', headers={
+            'Retry-After': str(retry),
+            'Cache-Control': 'no-cache'
+        })
+    
+    stream_timeout = current_app.config.get('LIVE_STREAM_TIMEOUT', 55)
+    heartbeat_interval = current_app.config.get('LIVE_HEARTBEAT_INTERVAL', 15)
+    subscription = live_updates.subscribe(channels)
+    app = current_app._get_current_object()
+    
+    # Don't hold a pooled connection for the lifetime of the stream
+    db.session.remove()
+    
+    def stream():
+        yield 'retry: 3000\n\n'
+        deadline = time.monotonic() + stream_timeout
+        while time.monotonic() < deadline:
+            message = subscription.get(timeout=min(heartbeat_interval, max(0, deadline - time.monotonic())))
+            if message is None:
+                yield ': keepalive\n\n'
+            else:
+                yield format_sse(message['event'], message['data'])
+    
+    def close_stream():
+        # Runs when the server closes the response, even if the stream never started
+        try:
+            subscription.close()
+        finally:
+            live_updates.release_stream(app)
+    
+    response = Response(stream_with_context(stream()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    response.call_on_close(close_stream)
+    return response
+
 @bp.route('/auto-assign-project/<int:project_id>', methods=['POST'])
 @login_required
 def auto_assign_project(project_id):
@@ -336,23 +404,21 @@ def auto_assign_project(project_id):
     if not suitable_employees:
         return jsonify({'error': 'No suitable employees available'}), 400
     
-    # Assign to best employee (first in sorted list)
-    best_employee = suitable_employees[0]
-    employee = best_employee['employee']
-    
-    # Create assignment
-    assignment = Assignment(
-        project_id=project_id,
-        user_id=employee.id,
-        status='not_started',
-        hours_remaining=project.estimated_hours,
-        assigned_at=datetime.utcnow()
-    )
-    
-    project.status = 'assigned'
+    # Assign to the best candidate that still has room, skipping employees
+    # another worker is reserving right now
+    candidates = {entry['employee'].id: entry for entry in suitable_employees}
+    try:
+        assignment = reserve_assignment(project_id, list(candidates))
+        db.session.commit()
+    except ReservationError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({'error': 'Project was changed concurrently, please retry'}), 409
     
-    db.session.add(assignment)
-    db.session.commit()
+    best_employee = candidates[assignment.user_id]
+    employee = best_employee['employee']
     
     return jsonify({
         'success': True,
@@ -361,6 +427,86 @@ def auto_assign_project(project_id):
         'available_hours': best_employee['available_hours']
     })
 
+@bp.route('/assignments/bulk-status', methods=['POST'])
+@login_required
+def bulk_update_status():
+    """Apply a list of status changes in one transaction with per-item results
+    
+    Body: {"changes": [{"assignment_id", "status", "hours_remaining", "hold_reason"}, ...]}.
+    Employees may only change their own assignments; admins may change any.
+    """
+    data = request.get_json(silent=True) or {}
+    changes = data.get('changes')
+    if not isinstance(changes, list) or not changes:
+        return jsonify({'error': 'changes must be a non-empty list'}), 400
+    
+    max_items = current_app.config.get('BULK_STATUS_MAX_ITEMS', 200)
+    if len(changes) > max_items:
+        return jsonify({'error': f'At most {max_items} changes per request'}), 400
+    
+    def apply_changes():
+        # Loads every referenced assignment and its project up front (two
+        # queries); re-run from scratch if a concurrent update wins a row
+        assignment_ids = {change.get('assignment_id') for change in changes if isinstance(change, dict)}
+        assignment_ids = {assignment_id for assignment_id in assignment_ids if isinstance(assignment_id, int)}
+        assignments = {
+            assignment.id: assignment
+            for assignment in Assignment.query.filter(Assignment.id.in_(assignment_ids))
+        } if assignment_ids else {}
+        project_ids = {assignment.project_id for assignment in assignments.values()}
+        if project_ids:
+            Project.query.filter(Project.id.in_(project_ids)).all()
+        
+        results = []
+        applied = 0
+        for index, change in enumerate(changes):
+            if not isinstance(change, dict):
+                results.append({'index': index, 'success': False, 'error': 'Invalid change'})
+                continue
+            
+            assignment_id = change.get('assignment_id')
+            result = {'index': index, 'assignment_id': assignment_id}
+            assignment = assignments.get(assignment_id)
+            new_status = change.get('status')
+            hours_remaining = change.get('hours_remaining')
+            hold_reason = change.get('hold_reason') or ''
+            
+            if assignment is None:
+                result.update(success=False, error='Assignment not found')
+            elif not current_user.is_admin and assignment.user_id != current_user.id:
+                result.update(success=False, error='Unauthorized')
+            elif new_status not in ASSIGNMENT_STATUSES:
+                result.update(success=False, error='Invalid status')
+            elif hours_remaining is not None and (isinstance(hours_remaining, bool)
+                                                  or not isinstance(hours_remaining, (int, float))
+                                                  or hours_remaining < 0):
+                result.update(success=False, error='Invalid hours value')
+            elif not isinstance(hold_reason, str) or len(hold_reason) > HOLD_REASON_LENGTH:
+                result.update(success=False, error=f'hold_reason must be text of at most {HOLD_REASON_LENGTH} characters')
+            else:
+                message, _ = apply_status_change(assignment, new_status, hold_reason, hours_remaining)
+                result.update(success=True, status=assignment.status,
+                              hours_remaining=assignment.hours_remaining, message=message)
+                applied += 1
+            results.append(result)
+        return results, applied
+    
+    try:
+        results, applied = run_with_retry(apply_changes)
+    except StaleDataError:
+        return jsonify({'error': 'Conflict: assignments were changed concurrently, no changes were applied'}), 409
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception('Bulk status update failed')
+        return jsonify({'error': 'Update failed, no changes were applied'}), 500
+    
+    return jsonify({
+        'success': applied == len(changes),
+        'applied': applied,
+        'failed': len(changes) - applied,
+        'results': results
+    })
+
 def allowed_file(filename):
     """Check if file extension is allowed"""
     ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls'}
@@ -1,10 +1,12 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, session
 from flask_login import login_user, logout_user, current_user, login_required
-from app import db, limiter, cache
+from app import db, limiter
+from app.throttle import login_throttle
+from app.audit import audit_writer
 from app.models import User
+from app.passwords import PasswordHashingBusy
 from app.forms import LoginForm, RegistrationForm
 from datetime import datetime, timedelta
-import hashlib
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -17,24 +19,33 @@ def login():
     
     form = LoginForm()
     if form.validate_on_submit():
-        # Check for failed login attempts
-        failed_attempts_key = f"failed_login_attempts_{request.remote_addr}"
-        failed_attempts = cache.get(failed_attempts_key) or 0
+        # Count the attempt against the IP and account before checking the password
+        throttle_status = login_throttle.reserve(request.remote_addr, form.email.data)
         
-        if failed_attempts >= 5:
+        if throttle_status.blocked:
             flash('Too many failed login attempts. Please try again later.', 'danger')
             return render_template('auth/login.html', title='Sign In', form=form)
         
         user = User.query.filter_by(email=form.email.data.lower()).first()
         
-        if user and user.check_password(form.password.data) and user.is_active:
-            # Clear failed attempts on successful login
-            cache.delete(failed_attempts_key)
+        try:
+            password_ok = bool(user) and user.check_password(form.password.data)
+        except PasswordHashingBusy:
+            # Not the user's fault; don't count it as a failed attempt
+            login_throttle.release(throttle_status)
+            db.session.rollback()
+            flash('Sign-in is busy right now. Please try again in a moment.', 'warning')
+            return render_template('auth/login.html', title='Sign In', form=form), 503
+        
+        if password_ok and user.is_active:
+            # Hand back the attempt and clear the account's failed attempts
+            login_throttle.record_success(throttle_status)
             
             login_user(user, remember=form.remember_me.data)
             
             # Log successful login
             current_app.logger.info(f'User {user.username} logged in successfully from {request.remote_addr}')
+            audit_writer.record('login', user_id=user.id)
             
             # Update last login
             user.last_login = datetime.utcnow()
@@ -48,11 +59,10 @@ def login():
             flash(f'Welcome back, {user.username}!', 'success')
             return redirect(next_page)
         else:
-            # Increment failed attempts
-            cache.set(failed_attempts_key, failed_attempts + 1, timeout=300)  # 5 minutes
-            
-            # Log failed login attempt
+            # The reserved attempt stays counted as a failure; log it
             current_app.logger.warning(f'Failed login attempt for {form.email.data} from {request.remote_addr}')
+            audit_writer.record('login_failed', user_id=user.id if user else None,
+                                details={'email': form.email.data.lower()})
             
             flash('Invalid email or password', 'danger')
     
@@ -66,6 +76,7 @@ def logout():
     
     # Log logout
     current_app.logger.info(f'User {username} logged out')
+    audit_writer.record('logout', user_id=current_user.id)
     
     # Clear session data
     session.clear()
@@ -109,6 +120,10 @@ def register():
             flash('Registration successful! You can now log in.', 'success')
             return redirect(url_for('auth.login'))
             
+        except PasswordHashingBusy:
+            db.session.rollback()
+            flash('Registration is busy right now. Please try again in a moment.', 'warning')
+            return render_template('auth/register.html', title='Register', form=form), 503
         except Exception as e:
             db.session.rollback()
             current_app.logger.error(f'Registration error: {str(e)}')
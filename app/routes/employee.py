@@ -1,102 +1,72 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, abort
 from flask_login import login_required, current_user
 from app import db
 from app.models import Assignment, Project, User
-from datetime import datetime
+from app.workload import load_employee_workload, get_employee_workload_summary, OPEN_STATUSES
+from app.etags import conditional_get, workload_scope, bump_version
+from app.hours import hours_updates, CLOSED_STATUSES
+from app.utils import ASSIGNMENT_STATUSES, apply_status_change
+from app.concurrency import run_with_retry
+from sqlalchemy.orm.exc import StaleDataError
 
 bp = Blueprint('employee', __name__, url_prefix='/employee')
 
+HOLD_REASONS = [
+    'Waiting for REF team feedback',
+    'Waiting for electrical team feedback',
+    'Moving to work on urgent project',
+    'Waiting for parts/materials',
+    'Technical issue needs resolution',
+    'Waiting for customer clarification',
+    'Other'
+]
+
 @bp.route('/dashboard')
 @login_required
 def dashboard():
     """Employee dashboard showing current assignments and work status"""
-    # Get employee's current assignments
-    assignments = db.session.query(Assignment, Project).join(
-        Project, Assignment.project_id == Project.id
-    ).filter(
-        Assignment.user_id == current_user.id,
-        Assignment.status.in_(['not_started', 'in_progress', 'on_hold'])
-    ).order_by(Project.deadline.asc()).all()
-    
-    # Get completed assignments (last 5)
-    completed_assignments = db.session.query(Assignment, Project).join(
-        Project, Assignment.project_id == Project.id
-    ).filter(
-        Assignment.user_id == current_user.id,
-        Assignment.status == 'completed'
-    ).order_by(Assignment.completed_at.desc()).limit(5).all()
-    
-    # Calculate total remaining hours
-    total_remaining_hours = sum(
-        assignment.hours_remaining or 0 
-        for assignment, project in assignments
-    )
-    
-    # Get workload summary
-    workload_summary = {
-        'total_assignments': len(assignments),
-        'total_hours': total_remaining_hours,
-        'not_started': len([a for a, p in assignments if a.status == 'not_started']),
-        'in_progress': len([a for a, p in assignments if a.status == 'in_progress']),
-        'on_hold': len([a for a, p in assignments if a.status == 'on_hold']),
-        'completed_this_week': len(completed_assignments)
-    }
+    workload = load_employee_workload(current_user.id)
+    
+    # Show hours accepted but not yet written
+    pending_delta = hours_updates.apply_pending([assignment for assignment, _ in workload['assignments']])
+    summary = dict(workload['summary'], total_hours=workload['summary']['total_hours'] + pending_delta)
     
     return render_template('employee/dashboard.html',
-                         assignments=assignments,
-                         completed_assignments=completed_assignments,
-                         workload_summary=workload_summary)
+                         assignments=workload['assignments'],
+                         completed_assignments=workload['completed_assignments'],
+                         workload_summary=summary)
 
 @bp.route('/update-status/<int:assignment_id>', methods=['POST'])
 @login_required
 def update_status(assignment_id):
     """Update assignment status with optional hold reason"""
-    assignment = Assignment.query.get_or_404(assignment_id)
-    
-    # Verify this assignment belongs to the current user
-    if assignment.user_id != current_user.id:
-        flash('You can only update your own assignments.', 'danger')
-        return redirect(url_for('employee.dashboard'))
-    
     new_status = request.form.get('status')
     hold_reason = request.form.get('hold_reason', '')
     hours_remaining = request.form.get('hours_remaining', type=float)
     
-    if new_status not in ['not_started', 'in_progress', 'on_hold', 'completed']:
+    if new_status not in ASSIGNMENT_STATUSES:
         flash('Invalid status.', 'danger')
         return redirect(url_for('employee.dashboard'))
     
-    # Update assignment
-    old_status = assignment.status
-    assignment.status = new_status
-    assignment.last_status_change = datetime.utcnow()
-    
-    # Handle specific status changes
-    if new_status == 'in_progress' and old_status != 'in_progress':
-        assignment.started_at = datetime.utcnow()
-        flash('Work started on project.', 'success')
-        
-    elif new_status == 'completed':
-        assignment.completed_at = datetime.utcnow()
-        assignment.hours_remaining = 0
-        # Update project status if this was the only assignment
-        project = Project.query.get(assignment.project_id)
-        project.status = 'completed'
-        flash('Project marked as completed!', 'success')
-        
-    elif new_status == 'on_hold':
-        assignment.hold_reason = hold_reason
-        flash(f'Work put on hold: {hold_reason}', 'info')
-        
-    elif new_status == 'in_progress' and old_status == 'on_hold':
-        assignment.hold_reason = None
-        flash('Work resumed.', 'success')
-    
-    # Update hours remaining if provided
-    if hours_remaining is not None and hours_remaining >= 0:
-        assignment.hours_remaining = hours_remaining
-    
-    db.session.commit()
+    def change_status():
+        # Reloaded and re-checked on every attempt; the conflict may have been a reassignment
+        assignment = db.session.get(Assignment, assignment_id)
+        if assignment is None:
+            abort(404)
+        if assignment.user_id != current_user.id:
+            abort(403)
+        if assignment.status in CLOSED_STATUSES:
+            abort(409, f'This assignment is already {assignment.status}.')
+        return apply_status_change(assignment, new_status, hold_reason, hours_remaining)
+    
+    try:
+        message, category = run_with_retry(change_status)
+    except StaleDataError:
+        flash('This assignment was changed by someone else. Please review it and try again.', 'warning')
+        return redirect(url_for('employee.dashboard'))
+    
+    if message:
+        flash(message, category)
     
     return redirect(url_for('employee.dashboard'))
 
@@ -112,6 +82,7 @@ def view_assignment(assignment_id):
         return redirect(url_for('employee.dashboard'))
     
     project = Project.query.get(assignment.project_id)
+    hours_updates.apply_pending([assignment])
     
     # Calculate time spent vs remaining
     time_spent = (project.estimated_hours or 0) - (assignment.hours_remaining or 0)
@@ -124,22 +95,28 @@ def view_assignment(assignment_id):
 @bp.route('/update-hours/<int:assignment_id>', methods=['POST'])
 @login_required
 def update_hours(assignment_id):
-    """Update remaining hours for an assignment"""
-    assignment = Assignment.query.get_or_404(assignment_id)
+    """Accept new remaining hours; rapid successive updates are coalesced into one write"""
+    row = db.session.query(Assignment.user_id, Assignment.status).filter_by(id=assignment_id).first()
+    if row is None:
+        abort(404)
+    owner_id, status = row
     
     # Verify this assignment belongs to the current user
-    if assignment.user_id != current_user.id:
+    if owner_id != current_user.id:
         return jsonify({'error': 'Unauthorized'}), 403
     
+    # The batched write skips closed assignments; say so instead of dropping the value
+    if status in CLOSED_STATUSES:
+        return jsonify({'error': f'Assignment is {status}; its hours can no longer change'}), 409
+    
     hours_remaining = request.form.get('hours_remaining', type=float)
     
     if hours_remaining is None or hours_remaining < 0:
         return jsonify({'error': 'Invalid hours value'}), 400
     
-    assignment.hours_remaining = hours_remaining
-    assignment.last_status_change = datetime.utcnow()
-    
-    db.session.commit()
+    hours_updates.submit(assignment_id, hours_remaining)
+    # Polled summaries include pending values, so they change now
+    bump_version(workload_scope(owner_id))
     
     return jsonify({
         'success': True,
@@ -151,36 +128,24 @@ def update_hours(assignment_id):
 @login_required
 def get_hold_reasons():
     """Get list of available hold reasons"""
-    hold_reasons = [
-        'Waiting for REF team feedback',
-        'Waiting for electrical team feedback',
-        'Moving to work on urgent project',
-        'Waiting for parts/materials',
-        'Technical issue needs resolution',
-        'Waiting for customer clarification',
-        'Other'
-    ]
-    return jsonify(hold_reasons)
+    # Static list, so the ETag is derived from the content itself
+    response = jsonify(HOLD_REASONS)
+    response.add_etag()
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
 
 @bp.route('/workload-summary')
 @login_required
+@conditional_get(lambda: workload_scope(current_user.id))
 def workload_summary():
     """Get current workload summary for AJAX updates"""
-    # Get current assignments
-    assignments = Assignment.query.filter_by(
-        user_id=current_user.id
-    ).filter(
-        Assignment.status.in_(['not_started', 'in_progress', 'on_hold'])
-    ).all()
-    
-    total_hours = sum(a.hours_remaining or 0 for a in assignments)
-    
-    summary = {
-        'total_assignments': len(assignments),
-        'total_hours': total_hours,
-        'not_started': len([a for a in assignments if a.status == 'not_started']),
-        'in_progress': len([a for a in assignments if a.status == 'in_progress']),
-        'on_hold': len([a for a in assignments if a.status == 'on_hold'])
-    }
-    
-    return jsonify(summary) 
\ No newline at end of file
+    summary = get_employee_workload_summary(current_user.id)
+    pending_delta = hours_updates.pending_open_hours_delta(current_user.id, OPEN_STATUSES)
+    
+    return jsonify({
+        'total_assignments': summary['total_assignments'],
+        'total_hours': summary['total_hours'] + pending_delta,
+        'not_started': summary['not_started'],
+        'in_progress': summary['in_progress'],
+        'on_hold': summary['on_hold']
+    })
@@ -0,0 +1,75 @@
+"""
+Schema version gate for the Manufacturing Workload Management App
+
+Compares the Alembic revision stamped in the database with the head
+revision of the migration scripts. Both are read at most once per process
+and cached; nothing here runs during app construction. Migrations are only
+applied from an explicit startup step (railway_init.py or flask db upgrade).
+"""
+
+import threading
+from alembic.config import Config as AlembicConfig
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from flask import current_app
+from app import db
+
+class SchemaGate:
+    """Cached comparison of database and migration head revisions"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['schema_gate'] = {'lock': threading.Lock()}
+
+    @property
+    def _state(self):
+        return current_app.extensions['schema_gate']
+
+    def _cached(self, key, loader):
+        state = self._state
+        if key not in state:
+            with state['lock']:
+                if key not in state:
+                    state[key] = loader()
+        return state[key]
+
+    def head_revision(self):
+        """Head revision of the migration scripts (read from files, no DB access)"""
+        def load():
+            config = AlembicConfig()
+            config.set_main_option('script_location', current_app.extensions['migrate'].directory)
+            return ScriptDirectory.from_config(config).get_current_head()
+        return self._cached('head_revision', load)
+
+    def database_revision(self):
+        """Revision stamped in the alembic_version table, or None if unstamped"""
+        def load():
+            with db.engine.connect() as connection:
+                return MigrationContext.configure(connection).get_current_revision()
+        return self._cached('database_revision', load)
+
+    def is_current(self):
+        """Whether the database is at the migration head"""
+        return self.database_revision() == self.head_revision()
+
+    def refresh(self):
+        """Forget cached revisions, e.g. after running migrations"""
+        state = self._state
+        with state['lock']:
+            state.pop('head_revision', None)
+            state.pop('database_revision', None)
+
+    def upgrade(self):
+        """Apply pending migrations if the database is behind; returns True if it ran"""
+        from flask_migrate import upgrade
+
+        if self.is_current():
+            return False
+        upgrade()
+        self.refresh()
+        return True
+
+schema_gate = SchemaGate()
@@ -182,6 +182,56 @@ function getCookie(name) {
     return cookieValue;
 }
 
+// Live updates over Server-Sent Events. The browser reconnects by itself
+// after a dropped stream, but not after an error response such as the 503
+// sent when the server has no free stream slot, so retry those here.
+// Whenever no stream is open, options.poll runs every options.pollInterval
+// instead. Events published while disconnected are lost, so options.onOpen
+// runs on every (re)connect to resync whatever the events keep up to date.
+function connectLiveUpdates(listeners, options = {}) {
+    const retryDelay = options.retryDelay || 30000;
+    const pollInterval = options.pollInterval || 300000;
+    let pollTimer = null;
+
+    function startPolling() {
+        if (options.poll && pollTimer === null) {
+            pollTimer = setInterval(options.poll, pollInterval);
+        }
+    }
+
+    function stopPolling() {
+        if (pollTimer !== null) {
+            clearInterval(pollTimer);
+            pollTimer = null;
+        }
+    }
+
+    function connect() {
+        const source = new EventSource('/api/events');
+        Object.keys(listeners).forEach(function(event) {
+            source.addEventListener(event, listeners[event]);
+        });
+        source.onopen = function() {
+            stopPolling();
+            if (options.onOpen) {
+                options.onOpen();
+            }
+        };
+        source.onerror = function() {
+            startPolling();
+            if (source.readyState === EventSource.CLOSED) {
+                const jitter = Math.random() * retryDelay / 2;
+                setTimeout(connect, retryDelay + jitter);
+            }
+        };
+    }
+
+    startPolling();
+    if (window.EventSource) {
+        connect();
+    }
+}
+
 // Error handling
 window.addEventListener('error', function(e) {
     console.error('JavaScript error:', e.error);
@@ -0,0 +1,169 @@
+"""
+Structured logging pipeline for the Manufacturing Workload Management App
+
+Request threads only put log records on an in-memory queue. A background
+QueueListener thread in each process formats them as JSON lines and writes
+them to stdout or a file, so file I/O never runs on the request path.
+Records carry the request's correlation id, which is taken from an incoming
+X-Request-ID header when it is a short token (anything else is replaced by a
+generated id) and is echoed in the response, and the id of the user the
+session belongs to. Both are captured once per request;
+the filter only reads them from g, so logging never loads a user.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import uuid
+import weakref
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
+from flask import g, has_request_context, request, session
+from flask.logging import default_handler
+from flask_login import user_logged_in, user_logged_out
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+# Client ids are only trusted if they fit AuditLog.request_id and are safe to echo
+REQUEST_ID_PATTERN = re.compile(r'[A-Za-z0-9._-]{1,64}')
+
+# Attributes every LogRecord has; anything else was passed via extra=
+STANDARD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_pipelines = weakref.WeakSet()
+_traceback_formatter = logging.Formatter()
+
+class RequestContextFilter(logging.Filter):
+    """Attach request fields while the record is still on the request thread"""
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.endpoint = request.endpoint
+            record.method = request.method
+            record.path = request.path
+            record.remote_addr = request.remote_addr
+            record.user_id = g.get('log_user_id')
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including request fields and extra= values"""
+
+    def format(self, record):
+        data = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': f'{record.module}:{record.lineno}',
+            'pid': record.process,
+        }
+        for key, value in vars(record).items():
+            if key not in STANDARD_ATTRIBUTES and key not in data:
+                data[key] = value
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        return json.dumps(data, default=str)
+
+class PipelineHandler(QueueHandler):
+    """Queue handler feeding a per-process background listener thread"""
+
+    def __init__(self, *handlers):
+        super().__init__(queue.SimpleQueue())
+        self._handlers = handlers
+        self._listener = None
+        self.addFilter(RequestContextFilter())
+        _pipelines.add(self)
+        self.start()
+
+    def start(self):
+        self._listener = QueueListener(self.queue, *self._handlers, respect_handler_level=True)
+        self._listener.start()
+
+    def stop(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+    def _restart_in_child(self):
+        # Threads do not survive fork (gunicorn --preload); the child gets a
+        # fresh queue and its own listener
+        self.queue = queue.SimpleQueue()
+        self._listener = None
+        self.start()
+
+    def prepare(self, record):
+        """Render the message and traceback here; the listener only serializes"""
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _traceback_formatter.formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def close(self):
+        self.stop()
+        super().close()
+
+def _restart_pipelines():
+    for pipeline in list(_pipelines):
+        pipeline._restart_in_child()
+
+def _stop_pipelines():
+    for pipeline in list(_pipelines):
+        pipeline.stop()
+
+os.register_at_fork(after_in_child=_restart_pipelines)
+atexit.register(_stop_pipelines)
+
+def assign_request_id():
+    request_id = request.headers.get(REQUEST_ID_HEADER, '')
+    g.request_id = request_id if REQUEST_ID_PATTERN.fullmatch(request_id) else uuid.uuid4().hex
+    # The id Flask-Login keeps in the signed session cookie; reading it loads nothing
+    g.log_user_id = session.get('_user_id')
+
+@user_logged_in.connect
+def capture_logged_in_user(sender, user):
+    g.log_user_id = user.get_id()
+
+@user_logged_out.connect
+def forget_logged_out_user(sender, user):
+    g.log_user_id = None
+
+def echo_request_id(response):
+    request_id = g.get('request_id')
+    if request_id:
+        response.headers[REQUEST_ID_HEADER] = request_id
+    return response
+
+def configure_logging_pipeline(app):
+    """Send app.logger through the queue to stdout or logs/LOG_FILE as JSON"""
+    app.before_request(assign_request_id)
+    app.after_request(echo_request_id)
+
+    if app.debug or app.testing:
+        return
+
+    if app.config.get('LOG_TO_STDOUT'):
+        output = logging.StreamHandler(sys.stdout)
+    else:
+        os.makedirs('logs', exist_ok=True)
+        # Every worker appends to the same file; rotation is left to logrotate,
+        # which WatchedFileHandler follows by reopening the file
+        output = WatchedFileHandler(os.path.join('logs', app.config.get('LOG_FILE', 'manufacturing_app.log')))
+    output.setFormatter(JsonFormatter())
+
+    log_level = getattr(logging, app.config.get('LOG_LEVEL', 'INFO'))
+    pipeline = PipelineHandler(output)
+    pipeline.setLevel(log_level)
+    app.logger.addHandler(pipeline)
+    # Flask's stderr handler would write synchronously alongside the pipeline
+    app.logger.removeHandler(default_handler)
+    app.logger.setLevel(log_level)
+    app.logger.info('Manufacturing App startup')
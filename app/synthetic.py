@@ -0,0 +1,307 @@
+"""
+Synthetic dataset generator for the Manufacturing Workload Management App
+
+Produces production-scale volumes of employees, skills, vacations, projects
+and assignments with bulk Core inserts. Output is deterministic for a given
+seed and start date, follows the team/model/country rules from
+app.eligibility, and works against both SQLite and PostgreSQL.
+
+Like the app, each assigned project gets exactly one assignment and its
+status follows that assignment's. Open assignments are only given to
+employees with room for them, so nobody's open hours exceed their
+hours_per_week; work that fits nowhere is generated as completed.
+"""
+
+import random
+import time
+from datetime import date, datetime, timedelta
+from sqlalchemy import func, insert, text
+from app import db
+from app.models import User, Project, Assignment, SkillsMatrix, Vacation, OPEN_ASSIGNMENT_STATUSES
+from app.eligibility import TEAM_RULES, eligible_teams, team_for_project
+from app.efficiency import invalidate_efficiency_table
+from app.open_hours import reconcile_open_hours
+from app.passwords import hash_password
+from app.utils import determine_ref_dependency
+
+# Department of each team (SM Design: teams 1-3, REF Design: teams 4-5)
+TEAM_DEPARTMENTS = {1: 1, 2: 1, 3: 1, 4: 2, 5: 2}
+
+MODEL_WEIGHTS = {'PAH': 35, 'PPH': 30, 'REF': 25, 'APS': 5, 'PSC': 5}
+COUNTRIES = ['USA', 'GERMANY', 'FRANCE', 'JAPAN', 'MEXICO', 'CANADA', 'BRAZIL', 'INDIA']
+COUNTRY_WEIGHTS = [40, 12, 10, 10, 8, 8, 6, 6]
+PRIORITY_WEIGHTS = {'urgent': 5, 'high': 20, 'normal': 60, 'low': 15}
+ASSIGNMENT_STATUS_WEIGHTS = {'not_started': 25, 'in_progress': 20, 'on_hold': 5, 'completed': 45, 'cancelled': 5}
+PROJECT_STATUS_BY_ASSIGNMENT = {
+    'not_started': 'assigned',
+    'in_progress': 'in_progress',
+    'on_hold': 'on_hold',
+    'completed': 'completed',
+    'cancelled': 'cancelled',
+}
+# Eligible employees tried for an open assignment before it is generated as completed
+CAPACITY_ATTEMPTS = 8
+VACATION_TYPE_WEIGHTS = {'annual': 70, 'sick': 15, 'personal': 10, 'emergency': 5}
+HOLD_REASONS = [
+    'Waiting for REF team feedback',
+    'Waiting for parts/materials',
+    'Technical issue needs resolution',
+]
+
+class DatasetGenerator:
+    """Generate and bulk insert one synthetic dataset"""
+
+    def __init__(self, employees=5000, admins=5, projects=200000, unassigned_ratio=0.1, max_vacations_per_employee=4, secondary_skill_ratio=0.3,
+                 seed=42, start_date=None, prefix='syn', batch_size=5000, echo=print):
+        self.employees = employees
+        self.admins = admins
+        self.projects = projects
+        self.unassigned_ratio = unassigned_ratio
+        self.max_vacations_per_employee = max_vacations_per_employee
+        self.secondary_skill_ratio = secondary_skill_ratio
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.echo = echo
+        self.rng = random.Random(seed)
+        self.today = start_date or date.today()
+        self.now = datetime.combine(self.today, datetime.min.time())
+        self.employees_by_team = {}
+        self.free_hours = {}
+        self.admin_ids = []
+
+    def _choice(self, weights):
+        return self.rng.choices(list(weights), weights=list(weights.values()))[0]
+
+    def _next_id(self, model):
+        return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+    def _insert(self, model, rows):
+        for start in range(0, len(rows), self.batch_size):
+            db.session.execute(insert(model.__table__), rows[start:start + self.batch_size])
+
+    def _sync_sequence(self, model):
+        """Move a PostgreSQL id sequence past explicitly inserted ids"""
+        if db.engine.dialect.name != 'postgresql':
+            return
+        table = model.__tablename__
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"
+        ))
+
+    def generate(self):
+        """Generate the whole dataset; returns row counts per table"""
+        started = time.perf_counter()
+        counts = {}
+        counts['users'] = self.generate_users()
+        counts['skills_matrix'] = self.generate_skills()
+        counts['vacations'] = self.generate_vacations()
+        counts['projects'], counts['assignments'] = self.generate_projects_and_assignments()
+
+        for model in (User, SkillsMatrix, Vacation, Project, Assignment):
+            self._sync_sequence(model)
+        db.session.commit()
+
+        # Core inserts bypass the ORM listeners that normally maintain these
+        invalidate_efficiency_table()
+        reconcile_open_hours()
+
+        self.echo(f'Generated dataset in {time.perf_counter() - started:.1f}s: {counts}')
+        return counts
+
+    def generate_users(self):
+        # Every generated account shares one hash; hashing thousands is needlessly slow
+        password_hash = hash_password(f'{self.prefix}-password')
+        teams = sorted(TEAM_DEPARTMENTS)
+        next_id = self._next_id(User)
+        rows = []
+
+        for index in range(self.admins + self.employees):
+            user_id = next_id + index
+            is_admin = index < self.admins
+            team_id = teams[index % len(teams)]
+            username = f'{self.prefix}_{"admin" if is_admin else "emp"}_{index:06d}'
+            hours_per_week = self.rng.choice([32.0, 36.0, 40.0, 40.0, 40.0, 45.0])
+            rows.append({
+                'id': user_id,
+                'email': f'{username}@synthetic.example.com',
+                'username': username,
+                'password_hash': password_hash,
+                'role': 'admin' if is_admin else 'employee',
+                'department_id': TEAM_DEPARTMENTS[team_id],
+                'team_id': team_id,
+                'hours_per_week': hours_per_week,
+                'is_active': self.rng.random() > 0.02,
+                'last_login': self.now - timedelta(minutes=self.rng.randint(0, 60 * 24 * 30)),
+                'created_at': self.now - timedelta(days=self.rng.randint(30, 2000)),
+                'updated_at': self.now,
+            })
+            if is_admin:
+                self.admin_ids.append(user_id)
+            else:
+                self.employees_by_team.setdefault(team_id, []).append(user_id)
+                self.free_hours[user_id] = hours_per_week
+
+        self._insert(User, rows)
+        self.echo(f'Inserted {len(rows)} users')
+        return len(rows)
+
+    def generate_skills(self):
+        team_models = {team_id: model_type for team_id, model_type, _ in TEAM_RULES}
+        machine_types = sorted(set(team_models.values()))
+        rows = []
+
+        for team_id, user_ids in self.employees_by_team.items():
+            for user_id in user_ids:
+                years = min(int(self.rng.expovariate(1 / 5)), 30)
+                rows.append({
+                    'user_id': user_id,
+                    'machine_type': team_models[team_id],
+                    'skill_level': 'primary',
+                    'efficiency_factor': round(min(max(self.rng.gauss(1.1, 0.15), 0.5), 2.0), 2),
+                    'years_experience': years,
+                    'last_updated': self.now,
+                })
+                if self.rng.random() < self.secondary_skill_ratio:
+                    other = self.rng.choice([m for m in machine_types if m != team_models[team_id]])
+                    rows.append({
+                        'user_id': user_id,
+                        'machine_type': other,
+                        'skill_level': 'secondary',
+                        'efficiency_factor': round(min(max(self.rng.gauss(0.9, 0.15), 0.5), 2.0), 2),
+                        'years_experience': self.rng.randint(0, max(years, 1)),
+                        'last_updated': self.now,
+                    })
+
+        self._insert(SkillsMatrix, rows)
+        self.echo(f'Inserted {len(rows)} skills')
+        return len(rows)
+
+    def generate_vacations(self):
+        rows = []
+        for user_ids in self.employees_by_team.values():
+            for user_id in user_ids:
+                for _ in range(self.rng.randint(0, self.max_vacations_per_employee)):
+                    start_date = self.today + timedelta(days=self.rng.randint(-180, 180))
+                    approved = self.rng.random() < 0.8
+                    rows.append({
+                        'user_id': user_id,
+                        'start_date': start_date,
+                        'end_date': start_date + timedelta(days=self.rng.randint(0, 14)),
+                        'approved': approved,
+                        'vacation_type': self._choice(VACATION_TYPE_WEIGHTS),
+                        'approved_by': self.rng.choice(self.admin_ids) if approved and self.admin_ids else None,
+                        'created_at': self.now - timedelta(days=self.rng.randint(0, 365)),
+                    })
+
+        self._insert(Vacation, rows)
+        self.echo(f'Inserted {len(rows)} vacations')
+        return len(rows)
+
+    def _project_row(self, project_id, index):
+        model_type = self._choice(MODEL_WEIGHTS)
+        country = self.rng.choices(COUNTRIES, weights=COUNTRY_WEIGHTS)[0]
+        assembly_start_date = self.today + timedelta(days=self.rng.randint(-365, 120))
+        return {
+            'id': project_id,
+            'project_number': f'{self.prefix.upper()}-{index:08d}',
+            'model_type': model_type,
+            'customer_country': country,
+            'difficulty_level': self.rng.randint(1, 5),
+            'estimated_hours': float(self.rng.randint(8, 160)),
+            'assembly_start_date': assembly_start_date,
+            'deadline': assembly_start_date + timedelta(days=self.rng.randint(7, 60)),
+            'status': 'unassigned',
+            'requires_ref_first': determine_ref_dependency(model_type, country),
+            'priority': self._choice(PRIORITY_WEIGHTS),
+            'created_at': self.now - timedelta(days=self.rng.randint(0, 400)),
+            'updated_at': self.now,
+        }
+
+    def _hours_remaining(self, status, original_hours):
+        if status == 'completed':
+            return 0.0
+        if status == 'not_started':
+            return original_hours
+        return round(original_hours * self.rng.random(), 1)
+
+    def _assignment_row(self, project, user_id, status, hours_remaining):
+        assigned_at = datetime.combine(project['assembly_start_date'], datetime.min.time()) - timedelta(days=self.rng.randint(1, 30))
+        started_at = assigned_at + timedelta(hours=self.rng.randint(1, 72)) if status != 'not_started' else None
+        completed_at = started_at + timedelta(hours=self.rng.randint(8, 400)) if status == 'completed' else None
+
+        return {
+            'project_id': project['id'],
+            'user_id': user_id,
+            'status': status,
+            'hours_remaining': hours_remaining,
+            'original_hours': project['estimated_hours'],
+            'hold_reason': self.rng.choice(HOLD_REASONS) if status == 'on_hold' else None,
+            'assigned_at': assigned_at,
+            'started_at': started_at,
+            'completed_at': completed_at,
+            'last_status_change': completed_at or started_at or assigned_at,
+        }
+
+    def _candidates(self, project):
+        teams = eligible_teams(project['model_type'], project['customer_country'])
+        if not teams:
+            teams = (team_for_project(project['model_type'], project['customer_country']),)
+        return [user_id for team_id in teams for user_id in self.employees_by_team.get(team_id, [])]
+
+    def _assign(self, project):
+        """The project's one assignment row, or None if no employee is eligible"""
+        candidates = self._candidates(project)
+        if not candidates:
+            return None
+
+        status = self._choice(ASSIGNMENT_STATUS_WEIGHTS)
+        hours_remaining = self._hours_remaining(status, project['estimated_hours'])
+        user_id = None
+        if status in OPEN_ASSIGNMENT_STATUSES:
+            for candidate in self.rng.sample(candidates, min(CAPACITY_ATTEMPTS, len(candidates))):
+                if self.free_hours[candidate] >= hours_remaining:
+                    user_id = candidate
+                    self.free_hours[candidate] -= hours_remaining
+                    break
+            else:
+                # Nobody tried has room for more open work
+                status, hours_remaining = 'completed', 0.0
+        if user_id is None:
+            user_id = self.rng.choice(candidates)
+
+        project['status'] = PROJECT_STATUS_BY_ASSIGNMENT[status]
+        return self._assignment_row(project, user_id, status, hours_remaining)
+
+    def generate_projects_and_assignments(self):
+        next_project_id = self._next_id(Project)
+        assigned_projects = round(self.projects * (1 - self.unassigned_ratio))
+        project_count = assignment_count = 0
+        projects, assignments = [], []
+
+        for index in range(self.projects):
+            project = self._project_row(next_project_id + index, index)
+            if index < assigned_projects:
+                assignment = self._assign(project)
+                if assignment is not None:
+                    assignments.append(assignment)
+            projects.append(project)
+
+            if len(projects) >= self.batch_size:
+                self._insert(Project, projects)
+                self._insert(Assignment, assignments)
+                project_count += len(projects)
+                assignment_count += len(assignments)
+                projects, assignments = [], []
+                self.echo(f'Inserted {project_count} projects, {assignment_count} assignments')
+
+        if projects:
+            self._insert(Project, projects)
+            self._insert(Assignment, assignments)
+            project_count += len(projects)
+            assignment_count += len(assignments)
+            self.echo(f'Inserted {project_count} projects, {assignment_count} assignments')
+        return project_count, assignment_count
+
+def generate_dataset(**options):
+    """Generate a synthetic dataset; see DatasetGenerator for the options"""
+    return DatasetGenerator(**options).generate()
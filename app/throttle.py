@@ -0,0 +1,186 @@
+"""
+Failed login throttle for the Manufacturing Workload Management App
+
+Login attempts are counted per client IP and per account with sliding
+window counters: each key keeps fixed-window buckets, and the previous
+bucket is weighted by how much of it still overlaps the window. Redis is
+used when configured so every worker shares the counts; memory:// keeps
+them in process for local development.
+
+An attempt is reserved before the password is checked: one atomic step
+increments both counters and returns them, and the attempt is refused if
+the new count exceeds the limit. A parallel burst therefore sees its own
+attempts and cannot get more guesses than the limit. Reservations that
+turn out not to be failures (a successful login, a refused or aborted
+attempt) are handed back afterwards.
+"""
+
+import hashlib
+import threading
+import time
+from collections import namedtuple
+from flask import current_app
+
+# keys: the (ip, account) buckets the attempt was counted in; previous_keys:
+# the buckets before those
+ThrottleStatus = namedtuple('ThrottleStatus', ['blocked', 'keys', 'previous_keys'])
+
+class MemoryThrottleStore:
+    """In-process counters, only shared by threads of one worker"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def _prune(self, now):
+        expired = [key for key, (_, expires_at) in self._counters.items() if expires_at <= now]
+        for key in expired:
+            del self._counters[key]
+
+    def _get(self, key, now):
+        count, expires_at = self._counters.get(key, (0, 0))
+        return count if expires_at > now else 0
+
+    def incr_many(self, keys, expire, read_keys=()):
+        """Increment keys and return their new counts followed by the counts of read_keys"""
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            counts = []
+            for key in keys:
+                count = self._get(key, now) + 1
+                self._counters[key] = (count, now + expire)
+                counts.append(count)
+            return counts + [self._get(key, now) for key in read_keys]
+
+    def decr_many(self, keys, delete_keys=()):
+        """Decrement keys that are still counting, never below zero, and delete delete_keys"""
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                count, expires_at = self._counters.get(key, (0, 0))
+                if expires_at > now and count > 0:
+                    self._counters[key] = (count - 1, expires_at)
+            for key in delete_keys:
+                self._counters.pop(key, None)
+
+class RedisThrottleStore:
+    """Redis counters shared by every worker; each call is one round trip"""
+
+    # Decrement only existing positive counters, so an expired key isn't recreated
+    # at -1; the keys after the first ARGV[1] are deleted
+    DECR_SCRIPT = """
+    local decrements = tonumber(ARGV[1])
+    for index, key in ipairs(KEYS) do
+        if index <= decrements then
+            local count = tonumber(redis.call('GET', key) or '0')
+            if count > 0 then
+                redis.call('DECR', key)
+            end
+        else
+            redis.call('DEL', key)
+        end
+    end
+    """
+
+    def __init__(self, url):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self._decr = self._redis.register_script(self.DECR_SCRIPT)
+
+    def incr_many(self, keys, expire, read_keys=()):
+        """Increment keys and return their new counts followed by the counts of read_keys"""
+        pipe = self._redis.pipeline(transaction=True)
+        for key in keys:
+            pipe.incr(key)
+            pipe.expire(key, expire)
+        if read_keys:
+            pipe.mget(read_keys)
+        results = pipe.execute()
+        counts = [int(value) for value in results[0:2 * len(keys):2]]
+        if read_keys:
+            counts += [int(value or 0) for value in results[-1]]
+        return counts
+
+    def decr_many(self, keys, delete_keys=()):
+        """Decrement keys that are still counting, never below zero, and delete delete_keys"""
+        self._decr(keys=list(keys) + list(delete_keys), args=[len(keys)])
+
+class LoginThrottle:
+    """Flask extension tracking login attempts by IP and account"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        storage_url = app.config.get('LOGIN_THROTTLE_STORAGE_URL', 'memory://')
+        if storage_url.startswith('memory://'):
+            store = MemoryThrottleStore()
+        elif storage_url.startswith(('redis://', 'rediss://')):
+            store = RedisThrottleStore(storage_url)
+        else:
+            raise ValueError(f'Unsupported LOGIN_THROTTLE_STORAGE_URL: {storage_url}')
+        app.extensions['login_throttle'] = store
+
+    @property
+    def store(self):
+        return current_app.extensions['login_throttle']
+
+    @property
+    def window(self):
+        return current_app.config.get('LOGIN_THROTTLE_WINDOW', 300)
+
+    def _keys(self, scope, identifier, now):
+        """Keys for the current and previous bucket of one counter"""
+        bucket = int(now // self.window)
+        base = f'login_failures:{scope}:{identifier}'
+        return f'{base}:{bucket}', f'{base}:{bucket - 1}'
+
+    def _subjects(self, ip, account):
+        account_id = hashlib.sha256(account.lower().encode()).hexdigest()[:32]
+        return [
+            ('ip', ip, current_app.config.get('LOGIN_THROTTLE_MAX_PER_IP', 5)),
+            ('account', account_id, current_app.config.get('LOGIN_THROTTLE_MAX_PER_ACCOUNT', 5)),
+        ]
+
+    def reserve(self, ip, account):
+        """Count a login attempt against the IP and the account before the password is checked
+
+        The attempt stays counted as a failure unless handed back with
+        release() or record_success(). Blocked attempts are handed back here.
+        """
+        now = time.time()
+        subjects = self._subjects(ip, account)
+        current_keys, previous_keys = zip(*(self._keys(scope, identifier, now) for scope, identifier, _ in subjects))
+        # Buckets must outlive the window they are weighted into
+        counts = self.store.incr_many(list(current_keys), 2 * self.window, list(previous_keys))
+
+        # Weight the previous bucket by its remaining overlap with the window
+        overlap = 1 - (now % self.window) / self.window
+        blocked = False
+        for index, (_, _, limit) in enumerate(subjects):
+            current, previous = counts[index], counts[len(subjects) + index]
+            blocked = blocked or current + previous * overlap > limit
+
+        status = ThrottleStatus(blocked, current_keys, previous_keys)
+        if blocked:
+            # Refused before any password check; don't extend the block with it
+            self.release(status)
+        return status
+
+    def release(self, status):
+        """Hand back a reserved attempt that was not a failed login"""
+        self.store.decr_many(list(status.keys))
+
+    def record_success(self, status):
+        """Hand back a successful attempt and clear the account's failures
+
+        The IP counter only gets this attempt back: failures from the same
+        IP against other accounts keep counting toward its limit.
+        """
+        ip_key, account_key = status.keys
+        # One round trip, like the reservation
+        self.store.decr_many([ip_key], delete_keys=[account_key, status.previous_keys[1]])
+
+login_throttle = LoginThrottle()
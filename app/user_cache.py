@@ -0,0 +1,135 @@
+"""
+User session cache for the Manufacturing Workload Management App
+
+Flask-Login loads the current user on every authenticated request. The
+columns it needs (everything except the password hash) are kept in a
+process-local LRU with a short TTL, backed by the shared cache, and turned
+back into a session-attached User without issuing a query.
+
+Both tiers tag their entries with a per-user version token kept in the
+shared cache, and every load compares the tag with the current token.
+Committed changes to a user replace the token, so every process stops
+serving its local copy at once; a deactivated or demoted user is never
+served from a stale entry. Without a token (no shared cache) nothing is
+cached.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from flask import current_app
+from sqlalchemy.orm import make_transient_to_detached
+from app import db, cache
+from app.models import User
+from app.changes import changes_committed, changes_for
+
+# Columns never cached; the open totals change with every assignment write
+EXCLUDED_COLUMNS = {'password_hash', 'open_hours', 'open_assignment_count'}
+
+def _cache_key(user_id):
+    return f'user_session_{user_id}'
+
+def _version_key(user_id):
+    return f'user_session_version_{user_id}'
+
+def _current_version(user_id):
+    """Version token the cached copies of a user must carry, or None"""
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, timeout=0)
+        version = cache.get(key)
+    return version
+
+class LocalLRU:
+    """Small thread-safe LRU with a per-entry TTL"""
+
+    def __init__(self, maxsize=1024, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+_local_users = LocalLRU()
+
+def _cached_columns():
+    return [column.key for column in User.__table__.columns if column.key not in EXCLUDED_COLUMNS]
+
+def _user_fields(user):
+    return {key: getattr(user, key) for key in _cached_columns()}
+
+def _user_from_fields(fields):
+    """Rebuild a session-attached User from cached fields without a query"""
+    user = User(**fields)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+def load_user(user_id):
+    """Flask-Login user loader backed by the user session cache"""
+    user_id = int(user_id)
+    key = _cache_key(user_id)
+
+    version = _current_version(user_id)
+
+    if version is not None:
+        entry = _local_users.get(key)
+        if entry is None or entry[0] != version:
+            entry = cache.get(key)
+            if entry is not None and entry[0] == version:
+                _local_users.set(key, entry)
+        if entry is not None and entry[0] == version:
+            return _user_from_fields(entry[1])
+
+    # Read the version before the row: a change committed in between
+    # replaces it, so the copy cached below is never served
+    user = db.session.get(User, user_id)
+    if user is not None and version is not None:
+        entry = (version, _user_fields(user))
+        _local_users.set(key, entry)
+        cache.set(key, entry, timeout=current_app.config.get('USER_CACHE_TIMEOUT', 300))
+    return user
+
+def configure_user_cache(app):
+    """Apply user cache settings from the app config"""
+    _local_users.maxsize = app.config.get('USER_CACHE_LOCAL_SIZE', 1024)
+    _local_users.ttl = app.config.get('USER_CACHE_LOCAL_TTL', 30)
+
+def invalidate_user(user_id):
+    """Drop a user from both cache tiers in every process"""
+    key = _cache_key(user_id)
+    cache.set(_version_key(user_id), uuid.uuid4().hex, timeout=0)
+    _local_users.delete(key)
+    cache.delete(key)
+
+@changes_committed.connect
+def invalidate_changed_users(sender, changes):
+    for change in changes_for(changes, 'users'):
+        invalidate_user(change['id'])
@@ -8,6 +8,9 @@ from flask import flash, redirect, url_for, current_app
 from flask_login import current_user
 from app import db, cache
 from app.models import User, Project, Assignment, SkillsMatrix, Vacation
+from app.efficiency import efficiency_table
+from app.eligibility import team_for_project
+from app.hours import hours_updates
 from sqlalchemy import and_, or_, func
 import re
 
@@ -38,18 +41,7 @@ def determine_ref_dependency(model_type, customer_country):
 
 def get_team_for_project(model_type, customer_country):
     """Get appropriate team ID for a project based on model type and country"""
-    model_type = model_type.upper()
-    country = customer_country.upper()
-    
-    team_mapping = {
-        'PAH': 1,  # Team 1 - All countries
-        'PPH': 2 if country == 'USA' else 3,  # Team 2 (USA) or Team 3 (Non-USA)
-        'REF': 4 if country == 'USA' else 5,  # Team 4 (USA) or Team 5 (Non-USA)
-        'APS': 1,  # Default to Team 1
-        'PSC': 1   # Default to Team 1
-    }
-    
-    return team_mapping.get(model_type, 1)
+    return team_for_project(model_type, customer_country)
 
 def find_best_employee_for_assignment(project):
     """Find the best employee for a project assignment based on skills and availability"""
@@ -58,7 +50,7 @@ def find_best_employee_for_assignment(project):
     required_team = get_team_for_project(project.model_type, project.customer_country)
     
     # Query employees with required skills
-    primary_skilled_employees = db.session.query(User).join(SkillsMatrix).filter(
+    candidates = db.session.query(User).join(SkillsMatrix).filter(
         and_(
             User.is_active == True,
             User.role == 'employee',
@@ -66,42 +58,29 @@ def find_best_employee_for_assignment(project):
             SkillsMatrix.skill_level == 'primary',
             User.team_id == required_team
         )
-    ).all()
+    )
     
     # If no primary skilled employees, look for secondary skilled
-    if not primary_skilled_employees:
-        secondary_skilled_employees = db.session.query(User).join(SkillsMatrix).filter(
+    if not db.session.query(candidates.exists()).scalar():
+        candidates = db.session.query(User).join(SkillsMatrix).filter(
             and_(
                 User.is_active == True,
                 User.role == 'employee',
                 SkillsMatrix.machine_type == project.model_type,
                 SkillsMatrix.skill_level == 'secondary'
             )
-        ).all()
-        
-        if secondary_skilled_employees:
-            primary_skilled_employees = secondary_skilled_employees
-    
-    if not primary_skilled_employees:
-        return None
-    
-    # Find employee with most available hours
-    best_employee = None
-    max_available_hours = 0
-    
-    for employee in primary_skilled_employees:
-        available_hours = employee.get_available_hours()
-        if available_hours > max_available_hours:
-            max_available_hours = available_hours
-            best_employee = employee
+        )
     
-    return best_employee if max_available_hours >= project.estimated_hours else None
+    # Employee with most available hours, if that is enough for the project
+    return candidates.filter(
+        User.available_hours >= project.estimated_hours
+    ).order_by(User.available_hours.desc(), User.id).first()
 
 def get_dashboard_statistics():
     """Get dashboard statistics for admin"""
     stats = {
         'total_projects': Project.query.count(),
-        'unassigned_projects': Project.query.filter_by(status='unassigned').count(),
+        'unassigned_projects': Project.query.filter(Project.is_unassigned).count(),
         'active_projects': Project.query.filter(
             Project.status.in_(['assigned', 'in_progress'])
         ).count(),
@@ -125,7 +104,7 @@ def get_team_workload_summary():
         func.sum(Assignment.hours_remaining).label('total_hours')
     ).outerjoin(Assignment, and_(
         Assignment.user_id == User.id,
-        Assignment.status.in_(['not_started', 'in_progress'])
+        Assignment.is_open
     )).filter(
         User.is_active == True,
         User.role == 'employee'
@@ -229,6 +208,52 @@ def validate_project_assignment(project_id, user_id):
     
     return True, "Assignment is valid"
 
+# Statuses employees may set on their own assignments
+ASSIGNMENT_STATUSES = ['not_started', 'in_progress', 'on_hold', 'completed']
+
+def apply_status_change(assignment, new_status, hold_reason='', hours_remaining=None):
+    """Apply a status change to an assignment in the current session (not committed)
+    
+    Returns the (message, category) to show the user, message being None when
+    there is nothing to report.
+    """
+    message, category = None, None
+    
+    # Update assignment
+    old_status = assignment.status
+    assignment.status = new_status
+    assignment.last_status_change = datetime.utcnow()
+    
+    # Handle specific status changes
+    if new_status == 'in_progress' and old_status != 'in_progress':
+        assignment.started_at = datetime.utcnow()
+        message, category = 'Work started on project.', 'success'
+        
+    elif new_status == 'completed':
+        assignment.completed_at = datetime.utcnow()
+        assignment.hours_remaining = 0
+        # Update project status if this was the only assignment
+        project = db.session.get(Project, assignment.project_id)
+        project.status = 'completed'
+        message, category = 'Project marked as completed!', 'success'
+        
+    elif new_status == 'on_hold':
+        assignment.hold_reason = hold_reason
+        message, category = f'Work put on hold: {hold_reason}', 'info'
+        
+    elif new_status == 'in_progress' and old_status == 'on_hold':
+        assignment.hold_reason = None
+        message, category = 'Work resumed.', 'success'
+    
+    # This change sets the hours itself; drop any coalesced update still pending once it commits
+    hours_updates.discard_on_commit(db.session, assignment.id)
+    
+    # Update hours remaining if provided
+    if hours_remaining is not None and hours_remaining >= 0:
+        assignment.hours_remaining = hours_remaining
+    
+    return message, category
+
 def get_projects_at_risk():
     """Get projects that are at risk of missing deadlines"""
     at_risk_projects = Project.query.filter(
@@ -259,32 +284,13 @@ def get_skills_matrix_summary():
 
 def calculate_project_efficiency(project, assignment):
     """Calculate project efficiency based on employee skills"""
-    skill = SkillsMatrix.query.filter(
-        and_(
-            SkillsMatrix.user_id == assignment.user_id,
-            SkillsMatrix.machine_type == project.model_type
-        )
-    ).first()
-    
-    if not skill:
-        return 1.0
-    
-    # Base efficiency factor
-    efficiency = skill.efficiency_factor
-    
-    # Adjust based on skill level
-    if skill.skill_level == 'primary':
-        efficiency *= 1.0
-    elif skill.skill_level == 'secondary':
-        efficiency *= 0.8
-    
-    # Adjust based on experience
-    if skill.years_experience >= 5:
-        efficiency *= 1.1
-    elif skill.years_experience >= 2:
-        efficiency *= 1.05
-    
-    return min(efficiency, 2.0)  # Cap at 2.0
+    return efficiency_table.lookup(assignment.user_id, project.model_type)
+
+def calculate_assignment_efficiencies(pairs):
+    """Calculate efficiencies for many (project, assignment) pairs at once"""
+    return efficiency_table.lookup_many(
+        (assignment.user_id, project.model_type) for project, assignment in pairs
+    )
 
 def sanitize_filename(filename):
     """Sanitize filename for secure file uploads"""
@@ -301,18 +307,22 @@ def sanitize_filename(filename):
     
     return filename
 
-def log_user_activity(user_id, action, details=None):
-    """Log user activity for auditing"""
-    current_app.logger.info(f"User {user_id} performed action: {action}")
-    if details:
-        current_app.logger.info(f"Details: {details}")
+def log_user_activity(user_id, action, details=None, target_type=None, target_id=None):
+    """Log user activity and add it to the audit trail"""
+    from app.audit import audit_writer
+    
+    current_app.logger.info(
+        f"User {user_id} performed action: {action}",
+        extra={'activity_user_id': user_id, 'action': action, 'details': details}
+    )
+    audit_writer.record(action, user_id=user_id, target_type=target_type, target_id=target_id, details=details)
 
 def get_vacation_conflicts(user_id, start_date, end_date):
     """Check for vacation conflicts with existing assignments"""
     conflicts = Assignment.query.join(Project).filter(
         and_(
             Assignment.user_id == user_id,
-            Assignment.status.in_(['not_started', 'in_progress']),
+            Assignment.is_open,
             Project.deadline >= start_date,
             Project.assembly_start_date <= end_date
         )
@@ -0,0 +1,100 @@
+"""
+Employee workload service for the Manufacturing Workload Management App
+
+Active assignments, recent completions and per-status totals for one
+employee are loaded with a single windowed query. The summary is cached per
+user for a short time and invalidated when that user's assignments change.
+"""
+
+from flask import current_app
+from sqlalchemy import func, or_, case
+from app import db, cache
+from app.models import Assignment, Project
+from app.changes import changes_committed, changes_for
+
+OPEN_STATUSES = ('not_started', 'in_progress', 'on_hold')
+RECENT_COMPLETED_LIMIT = 5
+
+def _summary_cache_key(user_id):
+    return f'employee_workload_summary_{user_id}'
+
+def load_employee_workload(user_id, completed_limit=RECENT_COMPLETED_LIMIT):
+    """Get active assignments, recent completions and summary for an employee"""
+    ranked = db.session.query(
+        Assignment.id.label('assignment_id'),
+        func.row_number().over(
+            partition_by=Assignment.status,
+            order_by=(Assignment.completed_at.desc(), Assignment.id.desc())
+        ).label('status_rank'),
+        func.count(Assignment.id).over(partition_by=Assignment.status).label('status_count'),
+        func.sum(Assignment.hours_remaining).over(partition_by=Assignment.status).label('status_hours')
+    ).filter(
+        Assignment.user_id == user_id,
+        Assignment.status.in_(OPEN_STATUSES + ('completed',))
+    ).subquery()
+
+    rows = db.session.query(
+        Assignment, Project, ranked.c.status_count, ranked.c.status_hours
+    ).join(
+        ranked, ranked.c.assignment_id == Assignment.id
+    ).join(
+        Project, Assignment.project_id == Project.id
+    ).filter(
+        or_(Assignment.status != 'completed', ranked.c.status_rank <= completed_limit)
+    ).order_by(
+        # Open assignments first by deadline, then completions newest first
+        case((Assignment.status == 'completed', ranked.c.status_rank), else_=0),
+        Project.deadline.asc()
+    ).all()
+
+    assignments = []
+    completed_assignments = []
+    status_counts = {}
+    status_hours = {}
+
+    for assignment, project, count, hours in rows:
+        if assignment.status == 'completed':
+            completed_assignments.append((assignment, project))
+        else:
+            assignments.append((assignment, project))
+        status_counts[assignment.status] = count
+        status_hours[assignment.status] = hours or 0
+
+    summary = {
+        'total_assignments': sum(status_counts.get(status, 0) for status in OPEN_STATUSES),
+        'total_hours': sum(status_hours.get(status, 0) for status in OPEN_STATUSES),
+        'not_started': status_counts.get('not_started', 0),
+        'in_progress': status_counts.get('in_progress', 0),
+        'on_hold': status_counts.get('on_hold', 0),
+        'completed_this_week': len(completed_assignments)
+    }
+
+    cache.set(_summary_cache_key(user_id), summary,
+              timeout=current_app.config.get('WORKLOAD_CACHE_TIMEOUT', 60))
+
+    return {
+        'assignments': assignments,
+        'completed_assignments': completed_assignments,
+        'summary': summary
+    }
+
+def get_employee_workload_summary(user_id):
+    """Get the workload summary for an employee, from cache when possible"""
+    summary = cache.get(_summary_cache_key(user_id))
+    if summary is None:
+        summary = load_employee_workload(user_id)['summary']
+    return summary
+
+def invalidate_employee_workload(user_id):
+    """Drop the cached workload summary for an employee"""
+    cache.delete(_summary_cache_key(user_id))
+
+@changes_committed.connect
+def invalidate_changed_workloads(sender, changes):
+    user_ids = set()
+    for change in changes_for(changes, 'assignments'):
+        user_ids.add(change['user_id'])
+        user_ids.add(change['previous_user_id'])
+
+    for user_id in user_ids:
+        invalidate_employee_workload(user_id)
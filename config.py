@@ -8,9 +8,15 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     SECURITY_PASSWORD_SALT = os.environ.get('SECURITY_PASSWORD_SALT') or 'dev-salt-change-in-production'
     
+    # Password hashing (werkzeug method string; existing hashes are upgraded on login)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_SALT_LENGTH = 16
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 4))  # Concurrent hashes per process
+    PASSWORD_HASH_TIMEOUT = 10  # Seconds to wait for a hashing slot and result
+    
     # Database - Base configuration (SQLite compatible)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_RECORD_QUERIES = True
+    SQLALCHEMY_RECORD_QUERIES = False  # Per-request query stats come from app.instrumentation
     SQLALCHEMY_ENGINE_OPTIONS = {
         'pool_pre_ping': True,
         'pool_recycle': 3600,  # 1 hour
@@ -38,11 +44,21 @@ class Config:
     CACHE_TYPE = os.environ.get('CACHE_TYPE', 'simple')
     CACHE_DEFAULT_TIMEOUT = 300  # 5 minutes
     CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    USER_CACHE_TIMEOUT = int(os.environ.get('USER_CACHE_TIMEOUT', 300))  # Shared tier for the current user
+    USER_CACHE_LOCAL_TTL = int(os.environ.get('USER_CACHE_LOCAL_TTL', 30))  # Per-process tier, checked against a shared version on every hit
+    USER_CACHE_LOCAL_SIZE = 1024
+    WORKLOAD_CACHE_TIMEOUT = int(os.environ.get('WORKLOAD_CACHE_TIMEOUT', 60))  # Per-employee workload summary
     
     # Rate Limiting
     RATELIMIT_STORAGE_URL = os.environ.get('RATELIMIT_STORAGE_URL', 'redis://localhost:6379/1')
     RATELIMIT_DEFAULT = "1000 per hour"
     
+    # Failed login throttle (sliding window per IP and per account)
+    LOGIN_THROTTLE_STORAGE_URL = os.environ.get('LOGIN_THROTTLE_STORAGE_URL', 'memory://')
+    LOGIN_THROTTLE_WINDOW = 300  # 5 minutes
+    LOGIN_THROTTLE_MAX_PER_IP = int(os.environ.get('LOGIN_THROTTLE_MAX_PER_IP', 5))
+    LOGIN_THROTTLE_MAX_PER_ACCOUNT = int(os.environ.get('LOGIN_THROTTLE_MAX_PER_ACCOUNT', 5))
+    
     # Security Headers
     TALISMAN_FORCE_HTTPS = os.environ.get('TALISMAN_FORCE_HTTPS', 'False').lower() == 'true'
     TALISMAN_CSP = {
@@ -53,14 +69,62 @@ class Config:
         'font-src': "'self' https://cdn.jsdelivr.net",
     }
     
+    # Live updates (Server-Sent Events)
+    LIVE_UPDATES_BACKEND = os.environ.get('LIVE_UPDATES_BACKEND', 'local')  # local or redis
+    LIVE_UPDATES_REDIS_URL = os.environ.get('LIVE_UPDATES_REDIS_URL', 'redis://localhost:6379/4')
+    LIVE_STREAM_TIMEOUT = 55  # Seconds before a stream closes and the browser reconnects
+    LIVE_HEARTBEAT_INTERVAL = 15  # Seconds between keepalive comments
+    # Open streams per worker process; each pins a gunicorn thread, so keep this
+    # well below --threads or the streams starve ordinary requests
+    LIVE_MAX_STREAMS = int(os.environ.get('LIVE_MAX_STREAMS', 3))
+    LIVE_STREAMS_FULL_RETRY = 30  # Seconds a browser turned away waits before reconnecting
+    
     # Application Settings
     LANGUAGES = ['en', 'es', 'fr']
     POSTS_PER_PAGE = 25
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file upload
     
+    # Query instrumentation (Server-Timing header, structured log line, budget warnings)
+    QUERY_STATS_SAMPLE_RATE = float(os.environ.get('QUERY_STATS_SAMPLE_RATE', 1.0))  # Share of requests instrumented
+    QUERY_STATS_KEEP_SLOWEST = 3
+    QUERY_STATS_SERVER_TIMING = True
+    QUERY_BUDGET = int(os.environ.get('QUERY_BUDGET', 50))  # Queries per request before warning
+    QUERY_BUDGETS = {}  # Per-endpoint overrides, e.g. {'admin.reports': 100}
+    SLOW_QUERY_THRESHOLD_MS = int(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 100))
+    
+    # Coalesced hours updates (latest value per assignment wins within a window)
+    HOURS_COALESCE_STORAGE_URL = os.environ.get('HOURS_COALESCE_STORAGE_URL', 'memory://')
+    HOURS_COALESCE_WINDOW = float(os.environ.get('HOURS_COALESCE_WINDOW', 1.0))  # Seconds; 0 writes immediately
+    HOURS_COALESCE_BATCH_SIZE = 500  # Assignments per batched UPDATE when flushing
+    HOURS_COALESCE_MAX_ATTEMPTS = 3  # Flushes a value may fail before it is dropped
+    BULK_STATUS_MAX_ITEMS = 200  # Changes accepted per bulk status request
+    
+    # Optimistic locking (version columns on projects and assignments)
+    CONFLICT_RETRY_ATTEMPTS = 3  # Attempts of a retried update before answering 409
+    CONFLICT_RETRY_BACKOFF = 0.05  # Seconds; doubled per attempt, with jitter
+    
+    # Audit trail (buffered, bulk inserted into audit_log by a background thread)
+    AUDIT_ENABLED = True
+    AUDIT_ASYNC = True
+    AUDIT_BATCH_SIZE = 100  # Records that trigger an early flush
+    AUDIT_FLUSH_INTERVAL = 2  # Seconds between flushes
+    AUDIT_MAX_BUFFER = 10000  # Records kept in memory while the database is unavailable
+    
+    # Prometheus metrics at /metrics (redis sums the counters of all workers)
+    METRICS_STORAGE_URL = os.environ.get('METRICS_STORAGE_URL', 'memory://')
+    METRICS_FLUSH_INTERVAL = 5  # Seconds between pushes of a worker's counters
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # Bearer token required to scrape; /metrics is off without it
+    
+    # Request profiler (cProfile), viewable under /admin/profiles
+    PROFILER_SAMPLE_RATE = float(os.environ.get('PROFILER_SAMPLE_RATE', 0.0))  # Off unless set
+    PROFILER_HEADER = 'X-Profile'  # Admin requests sending this header are always profiled
+    PROFILER_STORAGE_URL = os.environ.get('PROFILER_STORAGE_URL', 'memory://')  # or file:///path shared by workers
+    PROFILER_BUFFER_SIZE = 20  # Profiles kept
+    
     # Logging
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
-    LOG_FILE = os.environ.get('LOG_FILE', 'manufacturing_app.log')
+    LOG_FILE = os.environ.get('LOG_FILE', 'manufacturing_app.log')  # Under logs/, JSON lines
+    LOG_TO_STDOUT = os.environ.get('LOG_TO_STDOUT', 'False').lower() == 'true'
     
     # Background Tasks
     CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/2')
@@ -86,12 +150,14 @@ class TestingConfig(Config):
     SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL') or 'sqlite:///'
     WTF_CSRF_ENABLED = False
     CACHE_TYPE = 'null'  # Disable caching in tests
+    AUDIT_ASYNC = False  # Write audit records immediately so tests can read them
+    HOURS_COALESCE_WINDOW = 0
     
-    # SQLite-specific engine options for testing
+    # SQLite-specific engine options for testing; no pool_timeout, which the
+    # StaticPool used for in-memory databases rejects
     SQLALCHEMY_ENGINE_OPTIONS = {
         'pool_pre_ping': True,
         'pool_recycle': 3600,
-        'pool_timeout': 30,
     }
     
 class ProductionConfig(Config):
@@ -108,6 +174,13 @@ class ProductionConfig(Config):
     CACHE_TYPE = 'redis'
     CACHE_REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
     RATELIMIT_STORAGE_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/1')
+    LOGIN_THROTTLE_STORAGE_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/1')
+    LIVE_UPDATES_BACKEND = os.environ.get('LIVE_UPDATES_BACKEND', 'redis')
+    LIVE_UPDATES_REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/4')
+    QUERY_STATS_SAMPLE_RATE = float(os.environ.get('QUERY_STATS_SAMPLE_RATE', 0.05))
+    METRICS_STORAGE_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/5')
+    LOG_TO_STDOUT = os.environ.get('LOG_TO_STDOUT', 'True').lower() == 'true'  # Railway collects stdout
+    HOURS_COALESCE_STORAGE_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/6')
     
     # PostgreSQL-specific engine options for production
     SQLALCHEMY_ENGINE_OPTIONS = {
@@ -0,0 +1,45 @@
+"""Add audit_log table for batched user activity records
+
+Revision ID: 4d2e8a1f9c3b
+Revises: b996c6b7b0c7
+Create Date: 2026-10-19 10:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d2e8a1f9c3b'
+down_revision = 'b996c6b7b0c7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('audit_log',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('action', sa.String(length=50), nullable=False),
+    sa.Column('target_type', sa.String(length=30), nullable=True),
+    sa.Column('target_id', sa.Integer(), nullable=True),
+    sa.Column('details', sa.JSON(), nullable=True),
+    sa.Column('ip_address', sa.String(length=45), nullable=True),
+    sa.Column('request_id', sa.String(length=64), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('audit_log', schema=None) as batch_op:
+        batch_op.create_index('idx_audit_user_created', ['user_id', 'created_at'], unique=False)
+        batch_op.create_index('idx_audit_action_created', ['action', 'created_at'], unique=False)
+        batch_op.create_index('idx_audit_created', ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('audit_log', schema=None) as batch_op:
+        batch_op.drop_index('idx_audit_created')
+        batch_op.drop_index('idx_audit_action_created')
+        batch_op.drop_index('idx_audit_user_created')
+
+    op.drop_table('audit_log')
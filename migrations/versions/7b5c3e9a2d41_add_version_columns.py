@@ -0,0 +1,32 @@
+"""Add version columns for optimistic locking of projects and assignments
+
+Revision ID: 7b5c3e9a2d41
+Revises: 4d2e8a1f9c3b
+Create Date: 2026-10-19 10:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b5c3e9a2d41'
+down_revision = '4d2e8a1f9c3b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('projects', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+    with op.batch_alter_table('assignments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('assignments', schema=None) as batch_op:
+        batch_op.drop_column('version')
+
+    with op.batch_alter_table('projects', schema=None) as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,41 @@
+"""Add denormalized open hours totals to users
+
+Revision ID: 9e4f1c7a3b58
+Revises: 7b5c3e9a2d41
+Create Date: 2026-10-19 12:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4f1c7a3b58'
+down_revision = '7b5c3e9a2d41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('open_hours', sa.Float(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('open_assignment_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill from the open assignments (statuses not_started and in_progress)
+    op.execute("""
+        UPDATE users SET
+            open_hours = (
+                SELECT COALESCE(SUM(hours_remaining), 0) FROM assignments
+                WHERE assignments.user_id = users.id AND assignments.status IN ('not_started', 'in_progress')
+            ),
+            open_assignment_count = (
+                SELECT COUNT(*) FROM assignments
+                WHERE assignments.user_id = users.id AND assignments.status IN ('not_started', 'in_progress')
+            )
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('open_assignment_count')
+        batch_op.drop_column('open_hours')
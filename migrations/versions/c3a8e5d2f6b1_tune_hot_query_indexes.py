@@ -0,0 +1,64 @@
+"""Add partial indexes for open assignments and unassigned projects, drop redundant indexes
+
+Revision ID: c3a8e5d2f6b1
+Revises: 9e4f1c7a3b58
+Create Date: 2026-10-19 14:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a8e5d2f6b1'
+down_revision = '9e4f1c7a3b58'
+branch_labels = None
+depends_on = None
+
+OPEN_ASSIGNMENTS = "status IN ('not_started', 'in_progress')"
+UNASSIGNED_PROJECTS = "status = 'unassigned'"
+
+# Indexes whose columns lead a composite index or unique constraint on the
+# same table, or that are too unselective to be used; each costs a write per
+# row on every insert and import. (name, table, columns)
+REDUNDANT_INDEXES = [
+    ('ix_projects_status', 'projects', ['status']),  # six values only
+    ('idx_project_status_deadline', 'projects', ['status', 'deadline']),  # idx_project_unassigned_deadline
+    ('ix_projects_model_type', 'projects', ['model_type']),  # idx_project_model_country
+    ('ix_assignments_status', 'assignments', ['status']),  # five values only
+    ('idx_assignment_status_user', 'assignments', ['status', 'user_id']),  # idx_assignment_open_user
+    ('ix_assignments_project_id', 'assignments', ['project_id']),  # unique_project_assignment
+    ('ix_skills_matrix_machine_type', 'skills_matrix', ['machine_type']),  # idx_skills_machine_level
+    ('ix_skills_matrix_skill_level', 'skills_matrix', ['skill_level']),  # two values only
+    ('ix_skills_matrix_user_id', 'skills_matrix', ['user_id']),  # unique_user_skill
+    ('idx_skills_user_machine', 'skills_matrix', ['user_id', 'machine_type']),  # unique_user_skill
+    ('ix_users_department_id', 'users', ['department_id']),  # idx_user_department_team
+    ('ix_vacations_user_id', 'vacations', ['user_id']),  # idx_vacation_user_approved
+    ('ix_vacations_start_date', 'vacations', ['start_date']),  # idx_vacation_dates
+]
+
+
+def upgrade():
+    op.create_index(
+        'idx_assignment_open_user', 'assignments', ['user_id'],
+        postgresql_include=['hours_remaining'],
+        postgresql_where=sa.text(OPEN_ASSIGNMENTS),
+        sqlite_where=sa.text(OPEN_ASSIGNMENTS)
+    )
+    op.create_index(
+        'idx_project_unassigned_deadline', 'projects', ['deadline'],
+        postgresql_where=sa.text(UNASSIGNED_PROJECTS),
+        sqlite_where=sa.text(UNASSIGNED_PROJECTS)
+    )
+
+    # Databases built with create_all() may lack some of these
+    for name, table, _ in REDUNDANT_INDEXES:
+        op.drop_index(name, table_name=table, if_exists=True)
+
+
+def downgrade():
+    for name, table, columns in reversed(REDUNDANT_INDEXES):
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+    op.drop_index('idx_project_unassigned_deadline', table_name='projects')
+    op.drop_index('idx_assignment_open_user', table_name='assignments')
@@ -6,6 +6,8 @@ This script sets up the database schema and creates initial data for Railway dep
 
 import os
 import sys
+import json
+import hashlib
 from datetime import datetime, date, timedelta
 
 # Add the current directory to Python path
@@ -21,357 +23,192 @@ def safe_database_operation(operation_name, operation_func):
         print(f"⚠️  {operation_name} failed: {e}")
         return False
 
-def add_missing_columns():
-    """Add missing columns to existing tables"""
-    from app import create_app, db
+# Columns older deployments may lack, with the DDL used to add them.
+# Changing this spec changes the schema fingerprint and re-runs the diff.
+EXPECTED_COLUMNS = {
+    'users': {
+        'is_active': 'BOOLEAN DEFAULT TRUE NOT NULL',
+        'last_login': 'TIMESTAMP',
+        'updated_at': 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL',
+        'open_hours': 'FLOAT DEFAULT 0 NOT NULL',
+        'open_assignment_count': 'INTEGER DEFAULT 0 NOT NULL',
+    },
+    'projects': {
+        'priority': "VARCHAR(20) DEFAULT 'normal' NOT NULL",
+        'created_at': 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL',
+        'updated_at': 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL',
+        'version': 'INTEGER DEFAULT 1 NOT NULL',
+    },
+    'assignments': {
+        'status': "VARCHAR(20) DEFAULT 'not_started' NOT NULL",
+        'original_hours': 'FLOAT NOT NULL DEFAULT 0.0',
+        'hold_reason': 'VARCHAR(100)',
+        'assigned_at': 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP',
+        'started_at': 'TIMESTAMP',
+        'completed_at': 'TIMESTAMP',
+        'last_status_change': 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP',
+        'version': 'INTEGER DEFAULT 1 NOT NULL',
+    },
+    'skills_matrix': {
+        'user_id': 'INTEGER NOT NULL DEFAULT 1',
+        'machine_type': "VARCHAR(20) DEFAULT 'PAH' NOT NULL",
+        'skill_level': "VARCHAR(20) DEFAULT 'primary' NOT NULL",
+        'efficiency_factor': 'FLOAT DEFAULT 1.0 NOT NULL',
+        'years_experience': 'INTEGER NOT NULL DEFAULT 0',
+        'last_updated': 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL',
+    },
+    'vacations': {
+        'user_id': 'INTEGER NOT NULL DEFAULT 1',
+        'start_date': 'DATE NOT NULL DEFAULT CURRENT_DATE',
+        'end_date': 'DATE NOT NULL DEFAULT CURRENT_DATE',
+        'approved': 'BOOLEAN DEFAULT FALSE NOT NULL',
+        'vacation_type': "VARCHAR(20) DEFAULT 'annual' NOT NULL",
+        'approved_by': 'INTEGER',
+        'created_at': 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL',
+    },
+}
+
+# Statements to run after a column has been added. Each column's follow-ups
+# run in their own transaction once every column add has committed, so a
+# failing follow-up can't undo the schema repair.
+COLUMN_FOLLOW_UPS = {
+    ('projects', 'priority'): [
+        # Bring stray values in line first, or the constraint can't be added
+        "UPDATE projects SET priority = 'normal' WHERE priority IS NULL OR priority NOT IN ('urgent', 'high', 'normal', 'low')",
+        "ALTER TABLE projects ADD CONSTRAINT valid_priority CHECK (priority IN ('urgent', 'high', 'normal', 'low'))",
+    ],
+    ('assignments', 'original_hours'): [
+        'UPDATE assignments SET original_hours = hours_remaining WHERE original_hours = 0.0',
+    ],
+}
+
+STATE_TABLE = 'railway_init_state'
+FINGERPRINT_KEY = 'schema_fingerprint'
+
+def schema_fingerprint(head_revision):
+    """Fingerprint of the schema this code expects, computed without the database"""
+    spec = json.dumps({'head': head_revision, 'columns': EXPECTED_COLUMNS}, sort_keys=True)
+    return hashlib.sha256(spec.encode()).hexdigest()
+
+def read_stored_fingerprint():
+    """Fingerprint stored by the last successful run, or None"""
+    from app import db
     from sqlalchemy import text
     
     try:
-        # Commit any pending transactions and start fresh
-        db.session.commit()
-        
-        # Check if tables exist first
-        tables_to_check = ['users', 'projects', 'assignments']
-        for table in tables_to_check:
-            result = db.session.execute(text(f"""
-                SELECT EXISTS (
-                    SELECT FROM information_schema.tables 
-                    WHERE table_name = '{table}'
-                )
-            """))
-            if not result.fetchone()[0]:
-                print(f"⚠️  Table '{table}' does not exist, skipping column checks")
+        return db.session.execute(
+            text(f"SELECT value FROM {STATE_TABLE} WHERE key = :key"),
+            {'key': FINGERPRINT_KEY}
+        ).scalar()
+    except Exception:
+        # State table doesn't exist yet
+        db.session.rollback()
+        return None
+
+def store_fingerprint(fingerprint):
+    """Record a successful run so identical deploys can skip initialization"""
+    from app import db
+    from sqlalchemy import text
+    
+    db.session.execute(text(f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} (key VARCHAR(50) PRIMARY KEY, value VARCHAR(255) NOT NULL)"))
+    db.session.execute(text(f"DELETE FROM {STATE_TABLE} WHERE key = :key"), {'key': FINGERPRINT_KEY})
+    db.session.execute(
+        text(f"INSERT INTO {STATE_TABLE} (key, value) VALUES (:key, :value)"),
+        {'key': FINGERPRINT_KEY, 'value': fingerprint}
+    )
+    db.session.commit()
+
+def introspect_columns():
+    """Existing columns of the tracked tables as {table: set(columns)}"""
+    from app import db
+    from sqlalchemy import text, inspect
+    
+    tables = list(EXPECTED_COLUMNS)
+    existing = {}
+    
+    if db.engine.dialect.name == 'postgresql':
+        # One round trip for every tracked table
+        rows = db.session.execute(text("""
+            SELECT table_name, column_name
+            FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = ANY(:tables)
+        """), {'tables': tables})
+        for table_name, column_name in rows:
+            existing.setdefault(table_name, set()).add(column_name)
+    else:
+        inspector = inspect(db.engine)
+        for table_name in tables:
+            if inspector.has_table(table_name):
+                existing[table_name] = {column['name'] for column in inspector.get_columns(table_name)}
+    
+    return existing
+
+def plan_missing_columns(existing):
+    """(DDL adding every expected column missing from an existing table, follow-up groups)"""
+    statements = []
+    follow_ups = []
+    for table_name, columns in EXPECTED_COLUMNS.items():
+        if table_name not in existing:
+            print(f"⚠️  Table '{table_name}' does not exist, skipping column checks")
+            continue
+        for column_name, definition in columns.items():
+            if column_name in existing[table_name]:
                 continue
-        
-        # Check and add missing columns to users table
-        print("📝 Checking users table columns...")
-        
-        # Check if is_active column exists in users table
-        result = db.session.execute(text("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'users' AND column_name = 'is_active'
-        """))
-        
-        if not result.fetchone():
-            print("📝 Adding missing is_active column to users table...")
-            db.session.execute(text("""
-                ALTER TABLE users 
-                ADD COLUMN is_active BOOLEAN DEFAULT TRUE NOT NULL
-            """))
-            db.session.commit()
-            print("✅ Added is_active column")
-        
-        # Check if last_login column exists
-        result = db.session.execute(text("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'users' AND column_name = 'last_login'
-        """))
-        
-        if not result.fetchone():
-            print("📝 Adding missing last_login column to users table...")
-            db.session.execute(text("""
-                ALTER TABLE users 
-                ADD COLUMN last_login TIMESTAMP
-            """))
-            db.session.commit()
-            print("✅ Added last_login column")
-        
-        # Check if updated_at column exists
-        result = db.session.execute(text("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'users' AND column_name = 'updated_at'
-        """))
-        
-        if not result.fetchone():
-            print("📝 Adding missing updated_at column to users table...")
-            db.session.execute(text("""
-                ALTER TABLE users 
-                ADD COLUMN updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
-            """))
-            db.session.commit()
-            print("✅ Added updated_at column")
-        
-        # Check and add missing columns to projects table
-        print("📝 Checking projects table columns...")
-        
-        # Check if priority column exists in projects table
-        result = db.session.execute(text("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'projects' AND column_name = 'priority'
-        """))
-        
-        if not result.fetchone():
-            print("📝 Adding missing priority column to projects table...")
-            db.session.execute(text("""
-                ALTER TABLE projects 
-                ADD COLUMN priority VARCHAR(20) DEFAULT 'normal' NOT NULL
-            """))
-            db.session.commit()
-            print("✅ Added priority column")
-            
-            # Add the constraint for priority column
-            try:
-                db.session.execute(text("""
-                    ALTER TABLE projects 
-                    ADD CONSTRAINT valid_priority 
-                    CHECK (priority IN ('urgent', 'high', 'normal', 'low'))
-                """))
-                db.session.commit()
-                print("✅ Added priority constraint")
-            except Exception as constraint_error:
-                print(f"⚠️  Priority constraint may already exist: {constraint_error}")
-                db.session.rollback()
-        
-        # Check if created_at column exists in projects table
-        result = db.session.execute(text("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'projects' AND column_name = 'created_at'
-        """))
-        
-        if not result.fetchone():
-            print("📝 Adding missing created_at column to projects table...")
-            db.session.execute(text("""
-                ALTER TABLE projects 
-                ADD COLUMN created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
-            """))
-            db.session.commit()
-            print("✅ Added created_at column")
-        
-        # Check if updated_at column exists in projects table
-        result = db.session.execute(text("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'projects' AND column_name = 'updated_at'
-        """))
-        
-        if not result.fetchone():
-            print("📝 Adding missing updated_at column to projects table...")
-            db.session.execute(text("""
-                ALTER TABLE projects 
-                ADD COLUMN updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
-            """))
-            db.session.commit()
-            print("✅ Added updated_at column")
-        
-        # Check and add missing columns to assignments table
-        print("📝 Checking assignments table columns...")
-        
-        # Check if original_hours column exists in assignments table
-        result = db.session.execute(text("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'assignments' AND column_name = 'original_hours'
-        """))
-        
-        if not result.fetchone():
-            print("📝 Adding missing original_hours column to assignments table...")
-            db.session.execute(text("""
-                ALTER TABLE assignments 
-                ADD COLUMN original_hours FLOAT NOT NULL DEFAULT 0.0
-            """))
-            db.session.commit()
-            print("✅ Added original_hours column")
-            
-            # Update existing assignments to have original_hours = hours_remaining
-            print("📝 Updating existing assignments with original_hours values...")
-            db.session.execute(text("""
-                UPDATE assignments 
-                SET original_hours = hours_remaining 
-                WHERE original_hours = 0.0
-            """))
-            db.session.commit()
-            print("✅ Updated existing assignments with original_hours")
-        
-        # Check for any other missing columns in assignments table
-        expected_assignment_columns = [
-            'id', 'project_id', 'user_id', 'status', 'hours_remaining', 'original_hours',
-            'hold_reason', 'assigned_at', 'started_at', 'completed_at', 'last_status_change'
-        ]
-        
-        result = db.session.execute(text("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'assignments'
-            ORDER BY column_name
-        """))
-        
-        existing_columns = [row[0] for row in result.fetchall()]
-        missing_columns = set(expected_assignment_columns) - set(existing_columns)
-        
-        if missing_columns:
-            print(f"⚠️  Missing columns in assignments table: {missing_columns}")
-            # Add any other missing columns with appropriate defaults
-            for column in missing_columns:
-                if column in ['hold_reason']:
-                    db.session.execute(text(f"""
-                        ALTER TABLE assignments 
-                        ADD COLUMN {column} VARCHAR(100)
-                    """))
-                elif column in ['assigned_at', 'started_at', 'completed_at', 'last_status_change']:
-                    default_value = "DEFAULT CURRENT_TIMESTAMP" if column in ['assigned_at', 'last_status_change'] else ""
-                    db.session.execute(text(f"""
-                        ALTER TABLE assignments 
-                        ADD COLUMN {column} TIMESTAMP {default_value}
-                    """))
-                elif column == 'status':
-                    db.session.execute(text(f"""
-                        ALTER TABLE assignments 
-                        ADD COLUMN {column} VARCHAR(20) DEFAULT 'not_started' NOT NULL
-                    """))
-                
-                db.session.commit()
-                print(f"✅ Added missing column: {column}")
-        
-        # Check and add missing columns to skills_matrix table
-        print("📝 Checking skills_matrix table columns...")
-        
-        # Check if years_experience column exists in skills_matrix table
-        result = db.session.execute(text("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'skills_matrix' AND column_name = 'years_experience'
-        """))
-        
-        if not result.fetchone():
-            print("📝 Adding missing years_experience column to skills_matrix table...")
-            db.session.execute(text("""
-                ALTER TABLE skills_matrix 
-                ADD COLUMN years_experience INTEGER NOT NULL DEFAULT 0
-            """))
-            db.session.commit()
-            print("✅ Added years_experience column")
-        
-        # Check if last_updated column exists in skills_matrix table
-        result = db.session.execute(text("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'skills_matrix' AND column_name = 'last_updated'
-        """))
-        
-        if not result.fetchone():
-            print("📝 Adding missing last_updated column to skills_matrix table...")
-            db.session.execute(text("""
-                ALTER TABLE skills_matrix 
-                ADD COLUMN last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
-            """))
+            statements.append(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {definition}")
+            if (table_name, column_name) in COLUMN_FOLLOW_UPS:
+                follow_ups.append((f"{table_name}.{column_name}", COLUMN_FOLLOW_UPS[(table_name, column_name)]))
+    return statements, follow_ups
+
+def run_follow_ups(follow_ups):
+    """Run each column's follow-up statements in their own transaction; False if any failed"""
+    from app import db
+    from sqlalchemy import text
+    
+    all_applied = True
+    for column, statements in follow_ups:
+        try:
+            for statement in statements:
+                print(f"📝 {statement}")
+                db.session.execute(text(statement))
             db.session.commit()
-            print("✅ Added last_updated column")
-        
-        # Check for any other missing columns in skills_matrix table
-        expected_skills_columns = [
-            'id', 'user_id', 'machine_type', 'skill_level', 'efficiency_factor', 
-            'years_experience', 'last_updated'
-        ]
-        
-        result = db.session.execute(text("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'skills_matrix'
-            ORDER BY column_name
-        """))
-        
-        existing_skills_columns = [row[0] for row in result.fetchall()]
-        missing_skills_columns = set(expected_skills_columns) - set(existing_skills_columns)
-        
-        if missing_skills_columns:
-            print(f"⚠️  Missing columns in skills_matrix table: {missing_skills_columns}")
-            # Add any other missing columns with appropriate defaults
-            for column in missing_skills_columns:
-                if column == 'efficiency_factor':
-                    db.session.execute(text(f"""
-                        ALTER TABLE skills_matrix 
-                        ADD COLUMN {column} FLOAT DEFAULT 1.0 NOT NULL
-                    """))
-                elif column in ['machine_type', 'skill_level']:
-                    default_value = "'primary'" if column == 'skill_level' else "'PAH'"
-                    db.session.execute(text(f"""
-                        ALTER TABLE skills_matrix 
-                        ADD COLUMN {column} VARCHAR(20) DEFAULT {default_value} NOT NULL
-                    """))
-                elif column == 'user_id':
-                    db.session.execute(text(f"""
-                        ALTER TABLE skills_matrix 
-                        ADD COLUMN {column} INTEGER NOT NULL DEFAULT 1
-                    """))
-                
-                db.session.commit()
-                print(f"✅ Added missing column: {column}")
-            
-        # Check and add missing columns to vacations table
-        print("📝 Checking vacations table columns...")
-        
-        # Check for missing columns in vacations table
-        expected_vacation_columns = [
-            'id', 'user_id', 'start_date', 'end_date', 'approved', 
-            'vacation_type', 'approved_by', 'created_at'
-        ]
-        
-        result = db.session.execute(text("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'vacations'
-            ORDER BY column_name
-        """))
-        
-        existing_vacation_columns = [row[0] for row in result.fetchall()]
-        missing_vacation_columns = set(expected_vacation_columns) - set(existing_vacation_columns)
+        except Exception as e:
+            db.session.rollback()
+            # The column itself is in place; only its follow-ups need applying by hand
+            print(f"⚠️  Follow-up for {column} failed, apply it manually: {e}")
+            all_applied = False
+    return all_applied
+
+def add_missing_columns():
+    """Add missing columns to existing tables in a single transaction, then run their follow-ups"""
+    from app import db
+    from sqlalchemy import text
+    
+    try:
+        statements, follow_ups = plan_missing_columns(introspect_columns())
+        if not statements:
+            print("✅ No missing columns")
+            return True
+        
+        for statement in statements:
+            print(f"📝 {statement}")
+            db.session.execute(text(statement))
+        db.session.commit()
+        print(f"✅ Added {len(statements)} missing columns")
         
-        if missing_vacation_columns:
-            print(f"⚠️  Missing columns in vacations table: {missing_vacation_columns}")
-            # Add any missing columns with appropriate defaults
-            for column in missing_vacation_columns:
-                if column == 'approved':
-                    db.session.execute(text(f"""
-                        ALTER TABLE vacations 
-                        ADD COLUMN {column} BOOLEAN DEFAULT FALSE NOT NULL
-                    """))
-                elif column in ['start_date', 'end_date']:
-                    db.session.execute(text(f"""
-                        ALTER TABLE vacations 
-                        ADD COLUMN {column} DATE NOT NULL DEFAULT CURRENT_DATE
-                    """))
-                elif column == 'created_at':
-                    db.session.execute(text(f"""
-                        ALTER TABLE vacations 
-                        ADD COLUMN {column} TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
-                    """))
-                elif column in ['vacation_type']:
-                    db.session.execute(text(f"""
-                        ALTER TABLE vacations 
-                        ADD COLUMN {column} VARCHAR(50) DEFAULT 'vacation' NOT NULL
-                    """))
-                elif column in ['approved_by']:
-                    db.session.execute(text(f"""
-                        ALTER TABLE vacations 
-                        ADD COLUMN {column} INTEGER
-                    """))
-                elif column == 'user_id':
-                    db.session.execute(text(f"""
-                        ALTER TABLE vacations 
-                        ADD COLUMN {column} INTEGER NOT NULL DEFAULT 1
-                    """))
-                
-                db.session.commit()
-                print(f"✅ Added missing column: {column}")
-            
     except Exception as e:
         print(f"⚠️  Error adding missing columns: {e}")
         db.session.rollback()
         return False
     
-    return True
+    return run_follow_ups(follow_ups)
 
 def init_railway_database():
     """Initialize the Railway PostgreSQL database with schema and seed data"""
     
     from app import create_app, db
     from app.models import User, Project, Assignment, SkillsMatrix, Vacation
-    from flask_migrate import upgrade, init, migrate, stamp
+    from app.schema import schema_gate
+    from flask_migrate import stamp
     from sqlalchemy import text
     
     app = create_app()
@@ -387,11 +224,21 @@ def init_railway_database():
             print(f"❌ Database connection failed: {conn_error}")
             return False
         
-        # Try to upgrade database using migrations
-        migration_success = safe_database_operation(
-            "Database migrations", 
-            lambda: upgrade()
-        )
+        # Skip everything when this code's schema was already applied
+        fingerprint = schema_fingerprint(schema_gate.head_revision())
+        if read_stored_fingerprint() == fingerprint:
+            print("✅ Schema fingerprint unchanged, skipping initialization")
+            return True
+        
+        # Apply migrations only when the stamped revision is behind head
+        if schema_gate.is_current():
+            print(f"✅ Database schema at head revision {schema_gate.head_revision()}, skipping migrations")
+            migration_success = True
+        else:
+            migration_success = safe_database_operation(
+                "Database migrations", 
+                lambda: schema_gate.upgrade()
+            )
         
         # If migration failed, try alternative approaches
         if not migration_success:
@@ -406,40 +253,26 @@ def init_railway_database():
                 "Database migration stamp",
                 lambda: stamp()
             )
+            schema_gate.refresh()
         
-        # Always try to add missing columns (this handles partial migrations)
+        # Add missing columns (this handles partial migrations)
         print("📝 Checking for missing columns...")
-        if not add_missing_columns():
+        schema_complete = add_missing_columns()
+        if not schema_complete:
             print("⚠️  Some column additions failed, but continuing...")
         
-        # Test if we can now query the models
-        models_to_test = [
-            ("User", User),
-            ("Project", Project),
-            ("Assignment", Assignment),
-            ("SkillsMatrix", SkillsMatrix),
-            ("Vacation", Vacation)
-        ]
-        
-        for model_name, model_class in models_to_test:
-            try:
-                # Start fresh transaction for each model test
-                db.session.rollback()
-                model_class.query.count()
-                print(f"✅ {model_name} model query test passed")
-            except Exception as query_error:
-                print(f"❌ {model_name} model query failed: {query_error}")
-                db.session.rollback()  # Rollback failed transaction
-                # Don't return here, continue with other models
-        
-        # Fresh transaction for admin user check
-        db.session.rollback()
+        # Columns added above start at zero; bring the denormalized totals in line
+        if schema_complete:
+            from app.open_hours import reconcile_open_hours
+            safe_database_operation("Open hours reconciliation", lambda: reconcile_open_hours())
         
         # Check if admin user already exists
         try:
             admin = User.query.filter_by(username='admin').first()
             if admin:
                 print("⚠️  Admin user already exists, skipping seed data creation")
+                if schema_complete:
+                    safe_database_operation("Schema fingerprint", lambda: store_fingerprint(fingerprint))
                 print("🎉 Railway database initialization completed successfully!")
                 return True
         except Exception as admin_check_error:
@@ -593,6 +426,9 @@ def init_railway_database():
             print(f"⚠️  Could not create sample projects: {project_error}")
             db.session.rollback()
         
+        if schema_complete:
+            safe_database_operation("Schema fingerprint", lambda: store_fingerprint(fingerprint))
+        
         print("🎉 Railway database initialization completed successfully!")
         print("\n📋 Login credentials:")
         print("   Admin: admin@manufacturing.com / admin123")
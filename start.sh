@@ -9,4 +9,6 @@ python railway_init.py
 
 # Start the application
 echo "🌐 Starting Gunicorn server..."
-exec gunicorn run:app --bind 0.0.0.0:$PORT --workers 4 --timeout 120 --preload 
\ No newline at end of file
+# Threaded workers so open live-update streams (/api/events) do not pin a whole worker;
+# LIVE_MAX_STREAMS caps the threads per worker that streams may hold
+exec gunicorn run:app --bind 0.0.0.0:$PORT --workers 4 --threads 8 --timeout 120 --preload 
\ No newline at end of file